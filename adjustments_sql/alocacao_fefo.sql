@@ -0,0 +1,33 @@
+-- Alocação dos itens de pedido aos lotes do estoque (FEFO: primeiro a vencer, primeiro a sair)
+-- Cada linha de tb_alocacao_estoque diz quanto de um item de pedido saiu de qual lote (tb_estoque).
+-- A alocação (models/alocacao_fefo.py) grava as linhas e desconta tb_estoque.quantidade_disponivel
+-- na mesma transação; o saldo por produto (saldo_estoque.sql) acompanha pelos triggers de tb_estoque.
+-- Rodar depois do create_tables.sql (pode ser reexecutado).
+
+CREATE TABLE IF NOT EXISTS tb_alocacao_estoque (
+    id_alocacao SERIAL PRIMARY KEY,
+    id_item_pedido INTEGER NOT NULL REFERENCES tb_item_pedido(id_item_pedido) ON DELETE CASCADE,
+    id_estoque INTEGER NOT NULL REFERENCES tb_estoque(id_estoque) ON DELETE CASCADE,
+    quantidade INTEGER NOT NULL CHECK (quantidade > 0),
+    alocado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Quanto de cada item já foi alocado (itens pendentes) e o que saiu de cada lote
+CREATE INDEX IF NOT EXISTS idx_alocacao_item_pedido ON tb_alocacao_estoque (id_item_pedido);
+CREATE INDEX IF NOT EXISTS idx_alocacao_estoque ON tb_alocacao_estoque (id_estoque);
+
+-- Lotes disponíveis de um produto em ordem de validade (carga das filas FEFO)
+CREATE INDEX IF NOT EXISTS idx_produto_entrada_produto_validade
+    ON tb_produto_entrada (id_produto, validade);
+
+-- Nenhuma baixa deixa o lote negativo (NOT VALID: não confere as linhas já existentes)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ck_estoque_quantidade_nao_negativa') THEN
+        ALTER TABLE tb_estoque
+            ADD CONSTRAINT ck_estoque_quantidade_nao_negativa CHECK (quantidade_disponivel >= 0) NOT VALID;
+    END IF;
+END;
+$$;
+
+ANALYZE tb_produto_entrada;
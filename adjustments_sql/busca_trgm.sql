@@ -0,0 +1,27 @@
+-- Busca por nome / CNPJ / e-mail nas telas de cadastro (fornecedores, produtos, clientes)
+-- Índices GIN de trigramas atendem ILIKE '%termo%' e o operador de similaridade por palavra (<%)
+-- sem varrer a tabela. Rodar depois do create_tables.sql (pode ser reexecutado).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Fornecedores
+CREATE INDEX IF NOT EXISTS idx_fornecedor_nome_trgm ON tb_fornecedor USING gin (nome_fornecedor gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_fornecedor_cnpj_trgm ON tb_fornecedor USING gin (cnpj_fornecedor gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_fornecedor_email_trgm ON tb_fornecedor USING gin (email_fornecedor gin_trgm_ops);
+-- CNPJ digitado sem pontuação
+CREATE INDEX IF NOT EXISTS idx_fornecedor_cnpj_digitos_trgm
+    ON tb_fornecedor USING gin (regexp_replace(cnpj_fornecedor, '\D', '', 'g') gin_trgm_ops);
+
+-- Produtos
+CREATE INDEX IF NOT EXISTS idx_produto_nome_trgm ON tb_produto USING gin (nome_produto gin_trgm_ops);
+
+-- Clientes
+CREATE INDEX IF NOT EXISTS idx_cliente_nome_trgm ON tb_cliente USING gin (nome_cliente gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_cliente_cnpj_trgm ON tb_cliente USING gin (cnpj_cliente gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_cliente_email_trgm ON tb_cliente USING gin (email_cliente gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_cliente_cnpj_digitos_trgm
+    ON tb_cliente USING gin (regexp_replace(cnpj_cliente, '\D', '', 'g') gin_trgm_ops);
+
+ANALYZE tb_fornecedor;
+ANALYZE tb_produto;
+ANALYZE tb_cliente;
@@ -0,0 +1,46 @@
+-- Marca de atualização (watermark) para a carga incremental do dashboard
+-- Pedidos, itens e pagamentos ganham `atualizado_em`, preenchido por trigger em toda
+-- inserção/alteração. O dashboard busca só as linhas com atualizado_em posterior à última carga.
+-- Rodar depois do create_tables.sql (pode ser reexecutado).
+
+-- Linhas existentes recebem o instante da migração (entram todas na próxima carga completa)
+ALTER TABLE tb_pedido ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE tb_item_pedido ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE tb_pagamento ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now();
+
+
+-- Sempre grava o instante da transação (ignora valores informados no INSERT/UPDATE)
+CREATE OR REPLACE FUNCTION fn_tg_atualizado_em()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.atualizado_em := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tg_pedido_atualizado_em ON tb_pedido;
+CREATE TRIGGER tg_pedido_atualizado_em
+    BEFORE INSERT OR UPDATE ON tb_pedido
+    FOR EACH ROW EXECUTE FUNCTION fn_tg_atualizado_em();
+
+DROP TRIGGER IF EXISTS tg_item_pedido_atualizado_em ON tb_item_pedido;
+CREATE TRIGGER tg_item_pedido_atualizado_em
+    BEFORE INSERT OR UPDATE ON tb_item_pedido
+    FOR EACH ROW EXECUTE FUNCTION fn_tg_atualizado_em();
+
+DROP TRIGGER IF EXISTS tg_pagamento_atualizado_em ON tb_pagamento;
+CREATE TRIGGER tg_pagamento_atualizado_em
+    BEFORE INSERT OR UPDATE ON tb_pagamento
+    FOR EACH ROW EXECUTE FUNCTION fn_tg_atualizado_em();
+
+
+-- A consulta do delta filtra por atualizado_em; o índice evita ler a tabela toda
+CREATE INDEX IF NOT EXISTS idx_pedido_atualizado_em ON tb_pedido (atualizado_em);
+CREATE INDEX IF NOT EXISTS idx_item_pedido_atualizado_em ON tb_item_pedido (atualizado_em);
+CREATE INDEX IF NOT EXISTS idx_pagamento_atualizado_em ON tb_pagamento (atualizado_em);
+-- Pedido alterado -> pagamentos do pedido (a FK não cria índice no lado referenciador)
+CREATE INDEX IF NOT EXISTS idx_pagamento_pedido ON tb_pagamento (id_pedido);
+
+ANALYZE tb_pedido;
+ANALYZE tb_item_pedido;
+ANALYZE tb_pagamento;
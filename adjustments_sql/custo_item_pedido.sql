@@ -0,0 +1,79 @@
+-- Custo unitário gravado no item de pedido no momento da venda
+-- O lucro do item deixa de depender do preco_compra atual de tb_produto
+-- (que muda com o tempo) e passa a ser uma coluna gerada do próprio item.
+-- Rodar depois do create_tables.sql (pode ser reexecutado).
+
+ALTER TABLE tb_item_pedido ADD COLUMN IF NOT EXISTS custo_unitario NUMERIC(10,2);
+
+
+-- Preenche o custo a partir do produto quando o item é gravado sem ele
+-- (ou quando o produto do item é trocado por outro).
+-- Excluir o produto zera tb_item_pedido.id_produto (FK ON DELETE SET NULL), o que também é um
+-- UPDATE OF id_produto: sem produto não há o que consultar e o custo gravado é mantido.
+CREATE OR REPLACE FUNCTION fn_tg_item_pedido_custo()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.id_produto IS NOT NULL
+       AND (NEW.custo_unitario IS NULL
+            OR (TG_OP = 'UPDATE' AND NEW.id_produto IS DISTINCT FROM OLD.id_produto
+                AND NEW.custo_unitario IS NOT DISTINCT FROM OLD.custo_unitario)) THEN
+        SELECT preco_compra INTO NEW.custo_unitario
+        FROM tb_produto
+        WHERE id_produto = NEW.id_produto;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tg_item_pedido_custo ON tb_item_pedido;
+CREATE TRIGGER tg_item_pedido_custo
+    BEFORE INSERT OR UPDATE OF id_produto, custo_unitario ON tb_item_pedido
+    FOR EACH ROW EXECUTE FUNCTION fn_tg_item_pedido_custo();
+
+
+-- Carga inicial dos itens já existentes: o histórico de preços não é guardado,
+-- então usa o preco_compra atual do produto (só para itens ainda sem custo)
+UPDATE tb_item_pedido ip
+SET custo_unitario = prod.preco_compra
+FROM tb_produto prod
+WHERE ip.id_produto = prod.id_produto
+  AND ip.custo_unitario IS NULL;
+
+
+-- Lucro do item (NULL quando o custo é desconhecido)
+ALTER TABLE tb_item_pedido ADD COLUMN IF NOT EXISTS lucro_item NUMERIC(14,2)
+    GENERATED ALWAYS AS (quantidade * (preco_unitario - custo_unitario)) STORED;
+
+ANALYZE tb_item_pedido;
+
+
+-- Conferência: o custo (e o lucro) do item sobrevive à exclusão do produto.
+-- Roda num bloco desfeito ao final (não deixa dados); falha o script se o custo for perdido.
+DO $$
+DECLARE
+    v_produto INTEGER;
+    v_item INTEGER;
+    v_custo NUMERIC;
+    v_lucro NUMERIC;
+BEGIN
+    BEGIN
+        INSERT INTO tb_produto (nome_produto, preco_compra, preco_venda)
+        VALUES ('conferência custo_item_pedido', 10.00, 15.00)
+        RETURNING id_produto INTO v_produto;
+        INSERT INTO tb_item_pedido (id_produto, quantidade, preco_unitario)
+        VALUES (v_produto, 2, 15.00)
+        RETURNING id_item_pedido INTO v_item;
+        DELETE FROM tb_produto WHERE id_produto = v_produto;
+
+        SELECT custo_unitario, lucro_item INTO v_custo, v_lucro
+        FROM tb_item_pedido WHERE id_item_pedido = v_item;
+        IF v_custo IS DISTINCT FROM 10.00 OR v_lucro IS DISTINCT FROM 10.00 THEN
+            RAISE EXCEPTION 'custo_item_pedido: custo % / lucro % perdidos ao excluir o produto', v_custo, v_lucro;
+        END IF;
+        RAISE SQLSTATE 'P0100';  -- desfaz o produto e o item de teste
+    EXCEPTION
+        WHEN SQLSTATE 'P0100' THEN
+            RAISE NOTICE 'custo_item_pedido: custo e lucro mantidos após excluir o produto.';
+    END;
+END;
+$$;
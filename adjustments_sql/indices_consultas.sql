@@ -0,0 +1,8 @@
+-- Índices de apoio às consultas do dashboard.
+-- Filtro por período + paginação keyset da grade de itens (ordenação por data, desempate pelo id).
+CREATE INDEX IF NOT EXISTS idx_pedido_data ON tb_pedido (data_pedido, id_pedido);
+-- Junção pedido -> itens (a FK não cria índice no lado referenciador).
+CREATE INDEX IF NOT EXISTS idx_item_pedido_pedido ON tb_item_pedido (id_pedido);
+
+ANALYZE tb_pedido;
+ANALYZE tb_item_pedido;
@@ -0,0 +1,248 @@
+-- Saldo de estoque por produto x localização x mês de validade
+-- Mantido por triggers em tb_estoque e tb_produto_entrada, substitui o
+-- JOIN + SUM de tb_estoque -> tb_produto_entrada -> tb_produto.
+-- Rodar depois do create_tables.sql (pode ser reexecutado).
+
+CREATE TABLE IF NOT EXISTS tb_saldo_estoque (
+    id_produto INTEGER NOT NULL,
+    localizacao VARCHAR(100) NOT NULL DEFAULT '',
+    mes_validade DATE NOT NULL, -- primeiro dia do mês de validade ('infinity' = sem validade)
+    quantidade_disponivel BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_produto, localizacao, mes_validade)
+);
+
+-- Índice parcial para limpar rapidamente as faixas zeradas
+CREATE INDEX IF NOT EXISTS idx_saldo_estoque_zerado
+    ON tb_saldo_estoque (id_produto)
+    WHERE quantidade_disponivel = 0;
+
+-- Índice para os joins dos triggers (tb_estoque -> tb_produto_entrada)
+CREATE INDEX IF NOT EXISTS idx_estoque_item_entrada ON tb_estoque (item_entrada);
+
+
+-- Faixa de validade usada como chave do saldo
+CREATE OR REPLACE FUNCTION fn_saldo_estoque_mes(p_validade DATE)
+RETURNS DATE AS $$
+    SELECT COALESCE(date_trunc('month', p_validade)::date, 'infinity'::date);
+$$ LANGUAGE sql IMMUTABLE;
+
+
+-- Remove as faixas que ficaram com saldo zero
+CREATE OR REPLACE FUNCTION fn_saldo_estoque_limpar()
+RETURNS VOID AS $$
+    DELETE FROM tb_saldo_estoque WHERE quantidade_disponivel = 0;
+$$ LANGUAGE sql;
+
+
+-- Movimentações em tb_estoque (nível de instrução, usando as tabelas de transição)
+CREATE OR REPLACE FUNCTION fn_tg_saldo_estoque_movimento()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO tb_saldo_estoque AS s (id_produto, localizacao, mes_validade, quantidade_disponivel)
+        SELECT pe.id_produto, COALESCE(n.localizacao, ''), fn_saldo_estoque_mes(pe.validade),
+               SUM(COALESCE(n.quantidade_disponivel, 0))
+        FROM novos n
+        JOIN tb_produto_entrada pe ON pe.id_item_entrada = n.item_entrada
+        WHERE pe.id_produto IS NOT NULL
+        GROUP BY 1, 2, 3
+        HAVING SUM(COALESCE(n.quantidade_disponivel, 0)) <> 0
+        ON CONFLICT (id_produto, localizacao, mes_validade)
+        DO UPDATE SET quantidade_disponivel = s.quantidade_disponivel + EXCLUDED.quantidade_disponivel;
+
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO tb_saldo_estoque AS s (id_produto, localizacao, mes_validade, quantidade_disponivel)
+        SELECT pe.id_produto, COALESCE(m.localizacao, ''), fn_saldo_estoque_mes(pe.validade), SUM(m.delta)
+        FROM (
+            SELECT item_entrada, localizacao, COALESCE(quantidade_disponivel, 0) AS delta FROM novos
+            UNION ALL
+            SELECT item_entrada, localizacao, -COALESCE(quantidade_disponivel, 0) FROM antigos
+        ) m
+        JOIN tb_produto_entrada pe ON pe.id_item_entrada = m.item_entrada
+        WHERE pe.id_produto IS NOT NULL
+        GROUP BY 1, 2, 3
+        HAVING SUM(m.delta) <> 0
+        ON CONFLICT (id_produto, localizacao, mes_validade)
+        DO UPDATE SET quantidade_disponivel = s.quantidade_disponivel + EXCLUDED.quantidade_disponivel;
+
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Linhas removidas em cascata por tb_produto_entrada não encontram mais a entrada
+        -- (já descontadas em fn_tg_saldo_estoque_entrada_delete)
+        INSERT INTO tb_saldo_estoque AS s (id_produto, localizacao, mes_validade, quantidade_disponivel)
+        SELECT pe.id_produto, COALESCE(a.localizacao, ''), fn_saldo_estoque_mes(pe.validade),
+               -SUM(COALESCE(a.quantidade_disponivel, 0))
+        FROM antigos a
+        JOIN tb_produto_entrada pe ON pe.id_item_entrada = a.item_entrada
+        WHERE pe.id_produto IS NOT NULL
+        GROUP BY 1, 2, 3
+        HAVING SUM(COALESCE(a.quantidade_disponivel, 0)) <> 0
+        ON CONFLICT (id_produto, localizacao, mes_validade)
+        DO UPDATE SET quantidade_disponivel = s.quantidade_disponivel + EXCLUDED.quantidade_disponivel;
+    END IF;
+
+    PERFORM fn_saldo_estoque_limpar();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Troca de produto ou validade de uma entrada: move o saldo dos lotes entre as faixas
+CREATE OR REPLACE FUNCTION fn_tg_saldo_estoque_entrada_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO tb_saldo_estoque AS s (id_produto, localizacao, mes_validade, quantidade_disponivel)
+    SELECT m.id_produto, m.localizacao, m.mes_validade, SUM(m.delta)
+    FROM (
+        SELECT OLD.id_produto AS id_produto, COALESCE(e.localizacao, '') AS localizacao,
+               fn_saldo_estoque_mes(OLD.validade) AS mes_validade,
+               -COALESCE(e.quantidade_disponivel, 0) AS delta
+        FROM tb_estoque e
+        WHERE e.item_entrada = OLD.id_item_entrada AND OLD.id_produto IS NOT NULL
+        UNION ALL
+        SELECT NEW.id_produto, COALESCE(e.localizacao, ''), fn_saldo_estoque_mes(NEW.validade),
+               COALESCE(e.quantidade_disponivel, 0)
+        FROM tb_estoque e
+        WHERE e.item_entrada = NEW.id_item_entrada AND NEW.id_produto IS NOT NULL
+    ) m
+    GROUP BY 1, 2, 3
+    HAVING SUM(m.delta) <> 0
+    ON CONFLICT (id_produto, localizacao, mes_validade)
+    DO UPDATE SET quantidade_disponivel = s.quantidade_disponivel + EXCLUDED.quantidade_disponivel;
+
+    PERFORM fn_saldo_estoque_limpar();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Exclusão de uma entrada: desconta os lotes antes do ON DELETE CASCADE em tb_estoque
+CREATE OR REPLACE FUNCTION fn_tg_saldo_estoque_entrada_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.id_produto IS NOT NULL THEN
+        INSERT INTO tb_saldo_estoque AS s (id_produto, localizacao, mes_validade, quantidade_disponivel)
+        SELECT OLD.id_produto, COALESCE(e.localizacao, ''), fn_saldo_estoque_mes(OLD.validade),
+               -SUM(COALESCE(e.quantidade_disponivel, 0))
+        FROM tb_estoque e
+        WHERE e.item_entrada = OLD.id_item_entrada
+        GROUP BY 1, 2, 3
+        HAVING SUM(COALESCE(e.quantidade_disponivel, 0)) <> 0
+        ON CONFLICT (id_produto, localizacao, mes_validade)
+        DO UPDATE SET quantidade_disponivel = s.quantidade_disponivel + EXCLUDED.quantidade_disponivel;
+
+        PERFORM fn_saldo_estoque_limpar();
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION fn_tg_saldo_estoque_truncate()
+RETURNS TRIGGER AS $$
+BEGIN
+    TRUNCATE TABLE tb_saldo_estoque;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP TRIGGER IF EXISTS tg_saldo_estoque_insert ON tb_estoque;
+CREATE TRIGGER tg_saldo_estoque_insert
+    AFTER INSERT ON tb_estoque
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_tg_saldo_estoque_movimento();
+
+DROP TRIGGER IF EXISTS tg_saldo_estoque_update ON tb_estoque;
+CREATE TRIGGER tg_saldo_estoque_update
+    AFTER UPDATE ON tb_estoque
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_tg_saldo_estoque_movimento();
+
+DROP TRIGGER IF EXISTS tg_saldo_estoque_delete ON tb_estoque;
+CREATE TRIGGER tg_saldo_estoque_delete
+    AFTER DELETE ON tb_estoque
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_tg_saldo_estoque_movimento();
+
+DROP TRIGGER IF EXISTS tg_saldo_estoque_truncate ON tb_estoque;
+CREATE TRIGGER tg_saldo_estoque_truncate
+    AFTER TRUNCATE ON tb_estoque
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_tg_saldo_estoque_truncate();
+
+DROP TRIGGER IF EXISTS tg_saldo_estoque_entrada_update ON tb_produto_entrada;
+CREATE TRIGGER tg_saldo_estoque_entrada_update
+    AFTER UPDATE OF id_produto, validade ON tb_produto_entrada
+    FOR EACH ROW
+    WHEN (OLD.id_produto IS DISTINCT FROM NEW.id_produto OR OLD.validade IS DISTINCT FROM NEW.validade)
+    EXECUTE FUNCTION fn_tg_saldo_estoque_entrada_update();
+
+DROP TRIGGER IF EXISTS tg_saldo_estoque_entrada_delete ON tb_produto_entrada;
+CREATE TRIGGER tg_saldo_estoque_entrada_delete
+    BEFORE DELETE ON tb_produto_entrada
+    FOR EACH ROW EXECUTE FUNCTION fn_tg_saldo_estoque_entrada_delete();
+
+
+-- Quantidade disponível de um produto (busca pela chave primária)
+CREATE OR REPLACE FUNCTION fn_saldo_disponivel(p_id_produto INTEGER)
+RETURNS BIGINT AS $$
+    SELECT COALESCE(SUM(quantidade_disponivel), 0)
+    FROM tb_saldo_estoque
+    WHERE id_produto = p_id_produto;
+$$ LANGUAGE sql STABLE;
+
+
+-- Saldo calculado do zero a partir das tabelas de origem
+CREATE OR REPLACE VIEW vw_saldo_estoque_calculado AS
+SELECT pe.id_produto,
+       COALESCE(e.localizacao, '') AS localizacao,
+       fn_saldo_estoque_mes(pe.validade) AS mes_validade,
+       SUM(COALESCE(e.quantidade_disponivel, 0)) AS quantidade_disponivel
+FROM tb_estoque e
+JOIN tb_produto_entrada pe ON pe.id_item_entrada = e.item_entrada
+WHERE pe.id_produto IS NOT NULL
+GROUP BY 1, 2, 3
+HAVING SUM(COALESCE(e.quantidade_disponivel, 0)) <> 0;
+
+
+-- Divergências entre tb_saldo_estoque e o saldo calculado (vazio = consistente)
+CREATE OR REPLACE FUNCTION fn_saldo_estoque_verificar()
+RETURNS TABLE (
+    id_produto INTEGER,
+    localizacao VARCHAR,
+    mes_validade DATE,
+    saldo_tabela BIGINT,
+    saldo_calculado BIGINT
+) AS $$
+    SELECT COALESCE(s.id_produto, c.id_produto),
+           COALESCE(s.localizacao, c.localizacao),
+           COALESCE(s.mes_validade, c.mes_validade),
+           COALESCE(s.quantidade_disponivel, 0),
+           COALESCE(c.quantidade_disponivel, 0)::BIGINT
+    FROM tb_saldo_estoque s
+    FULL OUTER JOIN vw_saldo_estoque_calculado c
+        ON c.id_produto = s.id_produto
+       AND c.localizacao = s.localizacao
+       AND c.mes_validade = s.mes_validade
+    WHERE COALESCE(s.quantidade_disponivel, 0) <> COALESCE(c.quantidade_disponivel, 0);
+$$ LANGUAGE sql STABLE;
+
+
+-- Reconstrói tb_saldo_estoque do zero (bloqueia escritas no estoque durante a operação)
+CREATE OR REPLACE FUNCTION fn_saldo_estoque_reconstruir()
+RETURNS BIGINT AS $$
+DECLARE
+    v_linhas BIGINT;
+BEGIN
+    LOCK TABLE tb_estoque, tb_produto_entrada IN SHARE MODE;
+    DELETE FROM tb_saldo_estoque;
+    INSERT INTO tb_saldo_estoque (id_produto, localizacao, mes_validade, quantidade_disponivel)
+    SELECT id_produto, localizacao, mes_validade, quantidade_disponivel
+    FROM vw_saldo_estoque_calculado;
+    GET DIAGNOSTICS v_linhas = ROW_COUNT;
+    RETURN v_linhas;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Carga inicial para bancos que já têm estoque
+SELECT fn_saldo_estoque_reconstruir();
@@ -6,4 +6,5 @@ TRUNCATE TABLE tb_produto_entrada RESTART IDENTITY CASCADE;
 TRUNCATE TABLE tb_entrada RESTART IDENTITY CASCADE;
 TRUNCATE TABLE tb_produto RESTART IDENTITY CASCADE;
 TRUNCATE TABLE tb_cliente RESTART IDENTITY CASCADE;
-TRUNCATE TABLE tb_fornecedor RESTART IDENTITY CASCADE;
\ No newline at end of file
+TRUNCATE TABLE tb_fornecedor RESTART IDENTITY CASCADE;
+TRUNCATE TABLE tb_saldo_estoque;
@@ -0,0 +1,328 @@
+# benchmark_dashboard.py
+# Benchmark de escala do pipeline do dashboard (frontend/pages/dashboard.py), sem banco e sem navegador.
+# Gera dados sintéticos no formato das consultas do dashboard em fatores de escala do volume
+# produzido por pipeline/populacao_final.py (1x ~ 13,7 mil pedidos / 110 mil itens em 5 anos),
+# mede prepare_data, a compactação, o cubo, o índice de validade e cada display_* com o Streamlit substituído pelo
+# stub (benchmarks/stub_streamlit.py), registra o pico de memória (tracemalloc), grava o
+# resultado em JSON e compara com um baseline.
+#
+# Uso (na raiz do projeto):
+#   python -m benchmarks.benchmark_dashboard                                  # escalas 1, 10 e 100
+#   python -m benchmarks.benchmark_dashboard --escalas 1 10 --saida resultado.json
+#   python -m benchmarks.benchmark_dashboard --salvar-baseline                # grava o baseline
+#   python -m benchmarks.benchmark_dashboard --baseline benchmarks/baseline.json --limite-tempo 0.3
+# Sai com código 1 quando alguma etapa piora além dos limites em relação ao baseline.
+# display_item_grid não entra: a grade consulta o PostgreSQL a cada página.
+
+# O stub precisa estar em sys.modules antes dos imports do dashboard
+from benchmarks.stub_streamlit import instalar, ParadaStreamlit
+instalar()
+
+# Import Modulos
+from frontend.pages import dashboard
+from models.compactacao import compactar
+from models.cubo_vendas import CuboVendas, AgregadorCubo
+from models.filtro_temporal import FiltroTemporal
+from models.indice_validade import IndiceValidade
+
+# Import Libs
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+BASELINE_PADRAO = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Volume de pipeline/populacao_final.py (fator 1)
+DIAS_SIMULACAO = 1825
+PEDIDOS_POR_DIA = (5, 10)
+ITENS_POR_PEDIDO = (2, 14)
+NUM_CLIENTES = 420
+NUM_PRODUTOS = 100
+NUM_ENTRADAS = 5000
+ITENS_POR_ENTRADA = (5, 10)
+
+TIPOS_CORTE = ['Alcatra', 'Ancho', 'Barriga', 'Contra filé', 'Costela', 'Coxão mole', 'Cupim', 'Filé mignon',
+               'Fraldinha', 'Lagarto', 'Linguiça', 'Lombo', 'Maminha', 'Panceta', 'Patinho', 'Picanha',
+               'Salame', 'Tulipa']
+STATUS_PEDIDO = (['Pendente', 'Faturado', 'Entregue', 'Cancelado'], [0.3, 0.3, 0.35, 0.05])
+STATUS_PAGAMENTO = (['Pago', 'Aguardando pagamento', 'Cancelado'], [0.8, 0.15, 0.05])
+METODOS_PAGAMENTO = ['PIX', 'Cartão de crédito', 'Cartão de débito', 'Boleto bancário',
+                     'Transferência bancária (TED)']
+TIPOS_CLIENTE = ['Atacado', 'Varejo', 'Restaurante', 'Mercado']
+LOCALIZACOES = ['Câmara Fria 1', 'Freezer', 'Prateleira A1', 'Despacho']
+
+
+def _texto(prefixo, ids):
+    return pd.Series(ids).map(lambda i: f"{prefixo} {i}")
+
+
+def gerar_dados(escala, semente=42):
+    '''
+    DataFrames no formato de QUERY_PEDIDOS_DETALHES, QUERY_CLIENTES, QUERY_PRODUTOS, QUERY_PAGAMENTOS e
+    QUERY_ESTOQUE. Pedidos, clientes e estoque crescem com a escala; o catálogo de produtos não.
+    '''
+    rng = np.random.default_rng(semente)
+    hoje = np.datetime64(datetime.now().date(), 'D')
+
+    num_clientes = NUM_CLIENTES * escala
+    df_clientes = pd.DataFrame({
+        'id_cliente': np.arange(1, num_clientes + 1),
+        'nome_cliente': _texto('Cliente', range(1, num_clientes + 1)),
+        'cnpj_cliente': [f"{i:014d}" for i in range(num_clientes)],
+        'telefone_cliente': [f"(11) 9{i % 10000:04d}-{i % 9999:04d}" for i in range(num_clientes)],
+        'email_cliente': [f"cliente{i}@exemplo.com.br" for i in range(num_clientes)],
+        'endereco_cliente': [f"Rua {i % 500}, {i % 1000} - SP" for i in range(num_clientes)],
+        'tipo_cliente': rng.choice(TIPOS_CLIENTE, num_clientes),
+    })
+
+    preco_venda = np.round(rng.uniform(20, 150, NUM_PRODUTOS), 2)
+    df_produtos = pd.DataFrame({
+        'id_produto': np.arange(1, NUM_PRODUTOS + 1),
+        'nome_produto': _texto('Produto', range(1, NUM_PRODUTOS + 1)),
+        'tipo_corte': rng.choice(TIPOS_CORTE, NUM_PRODUTOS),
+        'unidade_medida': 'Kg',
+        'preco_compra': np.round(preco_venda * rng.uniform(0.7, 0.9, NUM_PRODUTOS), 2),
+        'preco_venda': preco_venda,
+        'id_fornecedor': 1,
+    })
+
+    # Pedidos: 5 a 10 por dia (x escala) em 5 anos, 2 a 14 itens cada
+    pedidos_dia = rng.integers(PEDIDOS_POR_DIA[0], PEDIDOS_POR_DIA[1] + 1, DIAS_SIMULACAO) * escala
+    datas_pedido = np.repeat(hoje - np.arange(DIAS_SIMULACAO), pedidos_dia)
+    num_pedidos = len(datas_pedido)
+    cliente_pedido = rng.integers(0, num_clientes, num_pedidos)
+    status_pedido = rng.choice(STATUS_PEDIDO[0], num_pedidos, p=STATUS_PEDIDO[1])
+
+    itens_pedido = rng.integers(ITENS_POR_PEDIDO[0], ITENS_POR_PEDIDO[1] + 1, num_pedidos)
+    pedido_item = np.repeat(np.arange(num_pedidos), itens_pedido)
+    num_itens = len(pedido_item)
+    produto_item = rng.integers(0, NUM_PRODUTOS, num_itens)
+    quantidade = rng.integers(1, 4, num_itens)
+    preco_unitario = preco_venda[produto_item]
+    lucro_item = np.round(quantidade * (preco_unitario - df_produtos['preco_compra'].to_numpy()[produto_item]), 2)
+    valor_total = np.round(np.bincount(pedido_item, weights=quantidade * preco_unitario, minlength=num_pedidos), 2)
+
+    df_pedidos_detalhes = pd.DataFrame({
+        'id_pedido': pedido_item + 1,
+        'data_pedido': datas_pedido[pedido_item],
+        'status_pedido': status_pedido[pedido_item],
+        'valor_total': valor_total[pedido_item],
+        'nome_cliente': df_clientes['nome_cliente'].to_numpy()[cliente_pedido][pedido_item],
+        'tipo_cliente': df_clientes['tipo_cliente'].to_numpy()[cliente_pedido][pedido_item],
+        'id_item_pedido': np.arange(1, num_itens + 1),
+        'id_produto': produto_item + 1,
+        'nome_produto': df_produtos['nome_produto'].to_numpy()[produto_item],
+        'tipo_corte': df_produtos['tipo_corte'].to_numpy()[produto_item],
+        'quantidade': quantidade,
+        'unidade_medida': 'Kg',
+        'preco_unitario': preco_unitario,
+        'lucro_item': lucro_item,
+    }).iloc[::-1].reset_index(drop=True)  # consulta ordenada por data (mais antigo primeiro)
+
+    # Pagamentos dos pedidos faturados/entregues, 1 a 5 dias depois do pedido
+    pagaveis = np.flatnonzero(np.isin(status_pedido, ['Faturado', 'Entregue']))
+    num_pagamentos = len(pagaveis)
+    df_pagamentos = pd.DataFrame({
+        'id_pagamento': np.arange(1, num_pagamentos + 1),
+        'id_pedido': pagaveis + 1,
+        'data_pagamento': datas_pedido[pagaveis] + rng.integers(1, 6, num_pagamentos),
+        'valor_pago': valor_total[pagaveis],
+        'metodo_pagamento': rng.choice(METODOS_PAGAMENTO, num_pagamentos),
+        'status_pagamento': rng.choice(STATUS_PAGAMENTO[0], num_pagamentos, p=STATUS_PAGAMENTO[1]),
+        'data_pedido': datas_pedido[pagaveis],
+        'status_pedido': status_pedido[pagaveis],
+        'valor_total_pedido': valor_total[pagaveis],
+    }).sort_values('data_pagamento', kind='stable', ignore_index=True)
+
+    # Estoque: 5000 entradas (x escala) no último ano, 5 a 10 produtos cada, validade de 15 a 60 dias
+    entradas = NUM_ENTRADAS * escala
+    itens_entrada = rng.integers(ITENS_POR_ENTRADA[0], ITENS_POR_ENTRADA[1] + 1, entradas)
+    data_entrada = np.repeat(hoje - rng.integers(1, 366, entradas), itens_entrada)
+    num_estoque = len(data_entrada)
+    produto_estoque = rng.integers(0, NUM_PRODUTOS, num_estoque)
+    df_estoque = pd.DataFrame({
+        'id_estoque': np.arange(1, num_estoque + 1),
+        'quantidade_disponivel': rng.integers(15, 101, num_estoque),
+        'localizacao': rng.choice(LOCALIZACOES, num_estoque),
+        'lote': [f"L{i:08d}" for i in range(num_estoque)],
+        'validade': data_entrada + rng.integers(15, 61, num_estoque),
+        'nome_produto': df_produtos['nome_produto'].to_numpy()[produto_estoque],
+        'tipo_corte': df_produtos['tipo_corte'].to_numpy()[produto_estoque],
+        'unidade_medida': 'Kg',
+        'preco_venda': preco_venda[produto_estoque],
+    }).sort_values(['nome_produto', 'validade'], kind='stable', ignore_index=True)
+
+    return df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, df_estoque
+
+
+def _copias(frames):
+    return tuple(df.copy() for df in frames)
+
+
+def etapas(brutos):
+    '''
+    (nome, preparar, executar) de cada etapa. `preparar()` monta as entradas fora da medição
+    (cópias, quando a etapa altera os DataFrames) e `executar(*entradas)` é a parte medida.
+    '''
+    preparados = dashboard.prepare_data(*_copias(brutos))
+    compactados = tuple(compactar(df.copy(), nome) for df, nome in zip(preparados, dashboard.DATASETS_DASHBOARD))
+    df_pedidos, df_clientes, df_produtos, df_pagamentos, df_estoque = compactados
+    cubo = CuboVendas(df_pedidos, df_pagamentos)
+    indice_validade = IndiceValidade(df_estoque)
+
+    filtro_pedidos = FiltroTemporal(df_pedidos, 'data_pedido')
+    filtro_pagamentos = FiltroTemporal(df_pagamentos, 'data_pagamento')
+    inicio, fim = filtro_pedidos.limites()
+
+    def agregador():
+        return AgregadorCubo(cubo, inicio, fim, filtro_pedidos.periodo(inicio, fim),
+                             filtro_pagamentos.periodo(inicio, fim))
+
+    return [
+        ('prepare_data', lambda: _copias(brutos), dashboard.prepare_data),
+        ('compactar', lambda: _copias(preparados),
+         lambda *dfs: [compactar(df, nome) for df, nome in zip(dfs, dashboard.DATASETS_DASHBOARD)]),
+        ('CuboVendas', lambda: (df_pedidos, df_pagamentos), CuboVendas),
+        ('IndiceValidade', lambda: (df_estoque,), IndiceValidade),
+        ('display_kpis', lambda: (agregador(), df_clientes), dashboard.display_kpis),
+        ('display_sales_trends', lambda: (agregador(),), dashboard.display_sales_trends),
+        ('display_product_analysis', lambda: (agregador(), df_produtos), dashboard.display_product_analysis),
+        ('display_client_analysis', lambda: (df_clientes, agregador()), dashboard.display_client_analysis),
+        ('display_order_status', lambda: (agregador(),), dashboard.display_order_status),
+        ('display_payment_analysis', lambda: (agregador(),), dashboard.display_payment_analysis),
+        ('display_stock_analysis', lambda: (df_estoque, df_produtos, indice_validade),
+         dashboard.display_stock_analysis),
+        ('display_products_by_cut_type', lambda: (df_produtos,), dashboard.display_products_by_cut_type),
+    ]
+
+
+def _executar(executar, entradas):
+    try:
+        executar(*entradas)
+    except ParadaStreamlit:
+        pass
+
+
+def medir(preparar, executar, repeticoes):
+    '''Mediana e mínimo do tempo (s) em `repeticoes` execuções e pico de memória (MB) numa execução extra.'''
+    tempos = []
+    for _ in range(repeticoes):
+        entradas = preparar()
+        inicio = time.perf_counter()
+        _executar(executar, entradas)
+        tempos.append(time.perf_counter() - inicio)
+
+    # Pico medido à parte: o tracemalloc deixa a execução mais lenta
+    entradas = preparar()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        _executar(executar, entradas)
+        pico = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return {
+        'segundos_mediana': round(statistics.median(tempos), 5),
+        'segundos_min': round(min(tempos), 5),
+        'pico_memoria_mb': round(pico / 1024 ** 2, 3),
+    }
+
+
+def executar_benchmark(escalas, repeticoes, semente=42):
+    resultados = []
+    for escala in escalas:
+        inicio = time.perf_counter()
+        brutos = gerar_dados(escala, semente)
+        print(f"Escala {escala}x: {len(brutos[0]):n} itens de pedido, {len(brutos[3]):n} pagamentos, "
+              f"{len(brutos[4]):n} itens de estoque (gerados em {time.perf_counter() - inicio:.1f} s)")
+        for nome, preparar, executar in etapas(brutos):
+            medida = medir(preparar, executar, repeticoes)
+            resultados.append({'escala': escala, 'etapa': nome, 'itens_pedido': len(brutos[0]), **medida})
+            print(f"  {nome:<30} {medida['segundos_mediana']:>9.4f} s  pico {medida['pico_memoria_mb']:>9.2f} MB")
+    return {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'repeticoes': repeticoes,
+            'semente': semente,
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar(atual, baseline, limite_tempo, limite_memoria, minimo_segundos):
+    '''
+    Regressões em relação ao baseline: etapas (mesma escala) cujo tempo (mediana) ou pico de memória
+    passaram do baseline em mais que o limite relativo. Tempos abaixo de `minimo_segundos` são
+    ignorados (ruído).
+    '''
+    referencia = {(r['escala'], r['etapa']): r for r in baseline['resultados']}
+    regressoes = []
+    for r in atual['resultados']:
+        base = referencia.get((r['escala'], r['etapa']))
+        if base is None:
+            continue
+        if (max(r['segundos_mediana'], base['segundos_mediana']) >= minimo_segundos
+                and r['segundos_mediana'] > base['segundos_mediana'] * (1 + limite_tempo)):
+            regressoes.append((r['escala'], r['etapa'], 'tempo (s)', base['segundos_mediana'], r['segundos_mediana']))
+        if base['pico_memoria_mb'] > 0 and r['pico_memoria_mb'] > base['pico_memoria_mb'] * (1 + limite_memoria):
+            regressoes.append((r['escala'], r['etapa'], 'memória (MB)', base['pico_memoria_mb'], r['pico_memoria_mb']))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de escala do pipeline do dashboard.")
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1, 10, 100],
+                        help="fatores de escala sobre o volume do populacao_final.py (padrão: 1 10 100)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="execuções medidas por etapa (padrão: 3)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default='resultado_benchmark.json', help="arquivo JSON do resultado")
+    parser.add_argument('--baseline', default=BASELINE_PADRAO, help="JSON de referência para comparação")
+    parser.add_argument('--salvar-baseline', action='store_true', help="grava o resultado também como baseline")
+    parser.add_argument('--limite-tempo', type=float, default=0.25,
+                        help="piora relativa de tempo aceita (padrão: 0.25 = +25%%)")
+    parser.add_argument('--limite-memoria', type=float, default=0.25,
+                        help="piora relativa do pico de memória aceita (padrão: 0.25)")
+    parser.add_argument('--minimo-segundos', type=float, default=0.01,
+                        help="etapas abaixo deste tempo não contam como regressão de tempo (padrão: 0.01)")
+    args = parser.parse_args(argv)
+
+    atual = executar_benchmark(args.escalas, args.repeticoes, args.semente)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultado gravado em {args.saida}")
+
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Sem baseline em {args.baseline}; use --salvar-baseline para criar um.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as arquivo:
+        baseline = json.load(arquivo)
+    regressoes = comparar(atual, baseline, args.limite_tempo, args.limite_memoria, args.minimo_segundos)
+    if not regressoes:
+        print("Nenhuma regressão em relação ao baseline.")
+        return 0
+    print("Regressões em relação ao baseline:")
+    for escala, etapa, medida, antes, depois in regressoes:
+        print(f"  {escala}x {etapa}: {medida} {antes} -> {depois}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# planos_consultas.py
+# Baseline dos planos de execução das consultas da aplicação e verificação de regressões.
+# Roda EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) para o catálogo de consultas (carga do dashboard,
+# agregações do modo 'sql', grade de itens, alocação FEFO e as leituras do populacao_final.py)
+# no banco do .env, guarda a forma do plano (nós e tabelas/índices), custo, tempo e buffers e
+# compara com o baseline: novos Seq Scan, mudança de forma e saltos de custo/tempo/buffers.
+# Cada consulta roda numa transação desfeita no fim (EXPLAIN ANALYZE executa a consulta de verdade).
+#
+# Uso (na raiz do projeto, com o banco populado):
+#   python -m benchmarks.planos_consultas --salvar-baseline            # grava benchmarks/baseline_planos.json
+#   python -m benchmarks.planos_consultas                              # compara com o baseline
+#   python -m benchmarks.planos_consultas --consultas dashboard.pedidos dashboard.estoque --limite-custo 0.2
+# Sai com código 1 quando alguma consulta regride em relação ao baseline.
+
+# Import Modulos
+from driver.psycopg2_connect import PostgresConnect
+from frontend.pages import dashboard
+from models import dashboard_agregacoes, grade_itens
+from models.alocacao_fefo import QUERY_ITENS_PENDENTES, QUERY_LOTES_DISPONIVEIS, STATUS_ALOCAVEIS
+
+# Import Libs
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import argparse
+import json
+import os
+import statistics
+import sys
+import pandas as pd
+
+BASELINE_PADRAO = os.path.join(os.path.dirname(__file__), 'baseline_planos.json')
+
+# Leituras ad hoc de pipeline/populacao_final.py (o script popula o banco ao ser importado)
+CONSULTAS_POPULACAO = {
+    'populacao.produtos_custo': "SELECT id_produto, preco_compra FROM tb_produto",
+    'populacao.estoque_disponivel': """
+        SELECT e.id_estoque, e.quantidade_disponivel, p.id_produto, p.unidade_medida, p.preco_venda
+        FROM tb_estoque e
+        JOIN tb_produto_entrada pe ON pe.id_item_entrada = e.item_entrada
+        JOIN tb_produto p ON p.id_produto = pe.id_produto
+        WHERE e.quantidade_disponivel > 0
+    """,
+    'populacao.produtos_preco': "SELECT id_produto, nome_produto, preco_venda FROM tb_produto",
+}
+
+
+@contextmanager
+def _capturar_consultas(registro):
+    '''Troca consultar_agregacao por um gravador: as consultas geradas vão para `registro`, sem executar.'''
+    def gravar(query, params=None, table_name="agregação"):
+        registro.append((query, params))
+        return pd.DataFrame()
+
+    originais = (dashboard_agregacoes.consultar_agregacao, grade_itens.consultar_agregacao)
+    dashboard_agregacoes.consultar_agregacao = grade_itens.consultar_agregacao = gravar
+    try:
+        yield
+    finally:
+        dashboard_agregacoes.consultar_agregacao, grade_itens.consultar_agregacao = originais
+
+
+def _consultas_agregador_sql(inicio, fim):
+    '''Consultas geradas pelo AgregadorSQL (modo 'sql') e pela grade de itens no período [inicio, fim].'''
+    agregador = dashboard_agregacoes.AgregadorSQL(inicio, fim)
+    grade = grade_itens.GradeItensPedido(inicio, fim)
+    chamadas = {
+        'intervalo_datas': dashboard_agregacoes.AgregadorSQL.intervalo_datas,
+        'possui_pedidos': agregador.possui_pedidos,
+        'possui_pagamentos': agregador.possui_pagamentos,
+        'opcoes': lambda: agregador.opcoes('tipo_corte'),
+        'resumo_kpis': lambda: agregador.resumo_kpis(fim - timedelta(days=7), fim),
+        'vendas_por_periodo': lambda: agregador.vendas_por_periodo('ME'),
+        'pedidos_por_periodo': lambda: agregador.pedidos_por_periodo('ME'),
+        'top_produtos': lambda: agregador.top_produtos('valor_item_calculado'),
+        'soma_por_corte': lambda: agregador.soma_por_corte('lucro_item'),
+        'tendencia_produto': lambda: agregador.tendencia_produto('Picanha'),
+        'total_clientes_compradores': agregador.total_clientes_compradores,
+        'top_clientes': agregador.top_clientes,
+        'vendas_por_tipo_cliente': agregador.vendas_por_tipo_cliente,
+        'resumo_status': lambda: agregador.resumo_status(['Entregue']),
+        'status_por_periodo': lambda: agregador.status_por_periodo(['Entregue']),
+        'pedidos_por_status': lambda: agregador.pedidos_por_status(['Entregue']),
+        'pagamentos_por_metodo': agregador.pagamentos_por_metodo,
+        'pagamentos_por_status': agregador.pagamentos_por_status,
+        'grade_itens': grade.pagina,
+    }
+    consultas = {}
+    for nome, chamada in chamadas.items():
+        registro = []
+        with _capturar_consultas(registro):
+            try:
+                chamada()
+            except Exception:
+                pass  # o pós-processamento do resultado vazio pode falhar; a consulta já foi gravada
+        registro = [(q, p) for q, p in registro if not q.lstrip().upper().startswith('EXPLAIN')]
+        for i, (query, params) in enumerate(registro):
+            consultas[f"sql.{nome}" + (f".{i + 1}" if len(registro) > 1 else "")] = (query, params)
+    return consultas
+
+
+def catalogo():
+    '''{nome: (consulta, parâmetros)} das consultas verificadas.'''
+    fim = date.today()
+    inicio = fim - timedelta(days=365)
+    desde = datetime.now() - timedelta(days=1)
+    consultas = {
+        'dashboard.pedidos': (dashboard.QUERY_PEDIDOS_DETALHES, None),
+        'dashboard.pedidos_delta': (dashboard.QUERY_PEDIDOS_DETALHES_DELTA, {'desde': desde}),
+        'dashboard.clientes': (dashboard.QUERY_CLIENTES, None),
+        'dashboard.produtos': (dashboard.QUERY_PRODUTOS, None),
+        'dashboard.pagamentos': (dashboard.QUERY_PAGAMENTOS, None),
+        'dashboard.pagamentos_delta': (dashboard.QUERY_PAGAMENTOS_DELTA, {'desde': desde}),
+        'dashboard.estoque': (dashboard.QUERY_ESTOQUE, None),
+        'alocacao.itens_pendentes': (QUERY_ITENS_PENDENTES, {'status': list(STATUS_ALOCAVEIS), 'limite': None}),
+        'alocacao.lotes_disponiveis': (QUERY_LOTES_DISPONIVEIS, {'produtos': list(range(1, 201)),
+                                                                'data_referencia': fim}),
+    }
+    consultas.update(_consultas_agregador_sql(inicio, fim))
+    consultas.update({nome: (query, None) for nome, query in CONSULTAS_POPULACAO.items()})
+    return consultas
+
+
+def _nos(plano, profundidade=0):
+    '''Nós do plano em pré-ordem: (profundidade, nó).'''
+    yield profundidade, plano
+    for filho in plano.get('Plans', []):
+        yield from _nos(filho, profundidade + 1)
+
+
+def _rotulo(no):
+    alvo = no.get('Index Name') or no.get('Relation Name') or no.get('CTE Name') or ''
+    return f"{no['Node Type']}({alvo})" if alvo else no['Node Type']
+
+
+def resumir_plano(explain):
+    '''Forma do plano, Seq Scans, custo, linhas e buffers do resultado de EXPLAIN (FORMAT JSON).'''
+    raiz = explain[0]
+    plano = raiz['Plan']
+    nos = list(_nos(plano))
+    return {
+        'forma': [f"{'  ' * profundidade}{_rotulo(no)}" for profundidade, no in nos],
+        'seq_scans': sorted({no['Relation Name'] for _, no in nos if no['Node Type'] == 'Seq Scan'}),
+        'custo_total': plano['Total Cost'],
+        'linhas_estimadas': plano['Plan Rows'],
+        'linhas_reais': plano.get('Actual Rows'),
+        'buffers': plano.get('Shared Hit Blocks', 0) + plano.get('Shared Read Blocks', 0),
+        'planejamento_ms': raiz.get('Planning Time'),
+        'execucao_ms': raiz.get('Execution Time'),
+    }
+
+
+def explicar(db, query, params, repeticoes):
+    '''
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) da consulta `repeticoes` vezes (cada uma desfeita com
+    rollback); resumo da última com a mediana dos tempos de execução/planejamento.
+    '''
+    cur = db.get_cursor()
+    resumos = []
+    for _ in range(repeticoes):
+        try:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.strip().rstrip(';'), params)
+            resultado = cur.fetchone()[0]
+            resumos.append(resumir_plano(resultado if isinstance(resultado, list) else json.loads(resultado)))
+        finally:
+            db.rollback()
+    resumo = resumos[-1]
+    resumo['execucao_ms'] = round(statistics.median(r['execucao_ms'] for r in resumos), 3)
+    resumo['planejamento_ms'] = round(statistics.median(r['planejamento_ms'] for r in resumos), 3)
+    return resumo
+
+
+def capturar(nomes=None, repeticoes=3):
+    '''Resumo dos planos do catálogo (ou só das consultas em `nomes`).'''
+    db = PostgresConnect()
+    if db.conn is None or db.conn.closed:
+        print("Erro: Conexão com o banco de dados não está ativa para capturar os planos.")
+        return None
+    consultas = catalogo()
+    if nomes:
+        desconhecidas = set(nomes) - set(consultas)
+        if desconhecidas:
+            print(f"Consultas fora do catálogo ignoradas: {', '.join(sorted(desconhecidas))}")
+        consultas = {nome: consultas[nome] for nome in nomes if nome in consultas}
+    planos, erros = {}, {}
+    try:
+        for nome, (query, params) in consultas.items():
+            try:
+                planos[nome] = explicar(db, query, params, repeticoes)
+                print(f"  {nome:<40} custo {planos[nome]['custo_total']:>12.1f}  "
+                      f"{planos[nome]['execucao_ms']:>9.2f} ms  seq scan: {', '.join(planos[nome]['seq_scans']) or '-'}")
+            except Exception as e:
+                erros[nome] = str(e).strip()
+                print(f"  {nome:<40} ERRO: {erros[nome]}")
+    finally:
+        db.close_connection()
+    return {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'banco': f"{os.getenv('HOST_BD')}:{os.getenv('PORT_BD')}/{os.getenv('NAME_BD')}",
+            'repeticoes': repeticoes,
+        },
+        'planos': planos,
+        'erros': erros,
+    }
+
+
+def comparar(atual, baseline, limite_custo, limite_tempo, limite_buffers, minimo_ms):
+    '''
+    Regressões de cada consulta em relação ao baseline: [(consulta, motivo)].
+    Tempos abaixo de `minimo_ms` (no baseline e agora) não contam como regressão de tempo.
+    '''
+    regressoes = []
+    for nome, plano in atual['planos'].items():
+        base = baseline['planos'].get(nome)
+        if base is None:
+            continue
+        novos_seq = sorted(set(plano['seq_scans']) - set(base['seq_scans']))
+        if novos_seq:
+            regressoes.append((nome, f"novo Seq Scan em {', '.join(novos_seq)}"))
+        if plano['forma'] != base['forma']:
+            regressoes.append((nome, "forma do plano mudou:\n      antes:  " + " > ".join(n.strip() for n in base['forma'])
+                               + "\n      depois: " + " > ".join(n.strip() for n in plano['forma'])))
+        if plano['custo_total'] > base['custo_total'] * (1 + limite_custo):
+            regressoes.append((nome, f"custo {base['custo_total']:.1f} -> {plano['custo_total']:.1f}"))
+        if (max(plano['execucao_ms'], base['execucao_ms']) >= minimo_ms
+                and plano['execucao_ms'] > base['execucao_ms'] * (1 + limite_tempo)):
+            regressoes.append((nome, f"tempo {base['execucao_ms']:.2f} ms -> {plano['execucao_ms']:.2f} ms"))
+        if base['buffers'] and plano['buffers'] > base['buffers'] * (1 + limite_buffers):
+            regressoes.append((nome, f"buffers {base['buffers']} -> {plano['buffers']}"))
+    for nome, erro in atual['erros'].items():
+        if nome in baseline['planos']:
+            regressoes.append((nome, f"erro: {erro}"))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Baseline e regressões dos planos das consultas da aplicação.")
+    parser.add_argument('--consultas', nargs='+', help="só estas consultas do catálogo (padrão: todas)")
+    parser.add_argument('--listar', action='store_true', help="lista as consultas do catálogo e sai")
+    parser.add_argument('--repeticoes', type=int, default=3, help="EXPLAIN ANALYZE por consulta (padrão: 3)")
+    parser.add_argument('--saida', default='resultado_planos.json', help="arquivo JSON do resultado")
+    parser.add_argument('--baseline', default=BASELINE_PADRAO, help="JSON de referência para comparação")
+    parser.add_argument('--salvar-baseline', action='store_true', help="grava o resultado também como baseline")
+    parser.add_argument('--limite-custo', type=float, default=0.5,
+                        help="aumento relativo de custo estimado aceito (padrão: 0.5 = +50%%)")
+    parser.add_argument('--limite-tempo', type=float, default=1.0,
+                        help="aumento relativo do tempo de execução aceito (padrão: 1.0 = +100%%)")
+    parser.add_argument('--limite-buffers', type=float, default=0.5,
+                        help="aumento relativo de buffers lidos aceito (padrão: 0.5)")
+    parser.add_argument('--minimo-ms', type=float, default=5.0,
+                        help="consultas abaixo deste tempo não contam como regressão de tempo (padrão: 5)")
+    args = parser.parse_args(argv)
+
+    if args.listar:
+        print("\n".join(catalogo()))
+        return 0
+
+    atual = capturar(args.consultas, args.repeticoes)
+    if atual is None:
+        return 2
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultado gravado em {args.saida}")
+
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Sem baseline em {args.baseline}; use --salvar-baseline para criar um.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as arquivo:
+        baseline = json.load(arquivo)
+    regressoes = comparar(atual, baseline, args.limite_custo, args.limite_tempo, args.limite_buffers,
+                          args.minimo_ms)
+    if not regressoes:
+        print("Nenhuma regressão de plano em relação ao baseline.")
+        return 0
+    print("Regressões em relação ao baseline:")
+    for nome, motivo in regressoes:
+        print(f"  {nome}: {motivo}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# stub_streamlit.py
+# Substituto mínimo do módulo `streamlit` para medir o dashboard sem servidor nem navegador.
+# instalar() registra o stub em sys.modules ANTES de importar frontend.pages.dashboard:
+#   - decorators (cache_data, cache_resource, fragment) devolvem a própria função;
+#   - widgets devolvem o valor padrão que receberam (index, default, value);
+#   - elementos de saída (markdown, plotly_chart, dataframe, metric...) não fazem nada;
+#   - columns/tabs/expander/spinner devolvem blocos que aceitam `with` e as mesmas chamadas.
+# Assim o tempo medido é só o do código do dashboard (pandas, numpy, plotly), sem o custo do Streamlit.
+
+# Import Libs
+import sys
+import types
+
+
+class ParadaStreamlit(Exception):
+    '''Lançada por st.stop() / st.rerun() no stub.'''
+
+
+class EstadoSessao(dict):
+    '''st.session_state: dicionário com acesso por atributo.'''
+
+    def __getattr__(self, nome):
+        try:
+            return self[nome]
+        except KeyError:
+            raise AttributeError(nome)
+
+    def __setattr__(self, nome, valor):
+        self[nome] = valor
+
+
+class _Qualquer:
+    '''Objeto inerte: qualquer atributo ou chamada devolve outro _Qualquer (ex.: st.column_config.X(...)).'''
+
+    def __getattr__(self, nome):
+        return _Qualquer()
+
+    def __call__(self, *args, **kwargs):
+        return _Qualquer()
+
+
+def _decorador(funcao=None, **kwargs):
+    '''Aceita @decorador e @decorador(...); devolve a função sem alteração (com .clear()).'''
+    def aplicar(f):
+        f.clear = lambda *a, **k: None
+        return f
+    return aplicar(funcao) if callable(funcao) else aplicar
+
+
+def _nada(*args, **kwargs):
+    return None
+
+
+def _opcao(label, options, index=0, **kwargs):
+    options = list(options)
+    return options[index] if options and index is not None else None
+
+
+def _multiselect(label, options, default=None, **kwargs):
+    if default is None:
+        return []
+    return [default] if isinstance(default, str) else list(default)
+
+
+def _valor(label, value=None, **kwargs):
+    return value
+
+
+class _Bloco:
+    '''Bloco de layout (coluna, aba, expander...): aceita `with` e repassa as chamadas ao stub.'''
+
+    open = True  # st.tabs(on_change="rerun"): todas as abas são executadas
+
+    def __init__(self, stub):
+        self._stub = stub
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, nome):
+        return getattr(self._stub, nome)
+
+
+class StreamlitStub(types.ModuleType):
+
+    def __init__(self):
+        super().__init__('streamlit')
+        self.session_state = EstadoSessao()
+        self.column_config = _Qualquer()
+        self.sidebar = _Bloco(self)
+        self.cache_data = self.cache_resource = self.fragment = _decorador
+        self.radio = self.selectbox = _opcao
+        self.multiselect = _multiselect
+        self.date_input = self.toggle = self.checkbox = self.text_input = self.number_input = _valor
+        self.slider = lambda label, min_value=None, max_value=None, value=None, **kw: value
+        self.button = self.download_button = lambda *a, **k: False
+
+    def columns(self, spec, **kwargs):
+        return [_Bloco(self) for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def tabs(self, labels, **kwargs):
+        return [_Bloco(self) for _ in labels]
+
+    def expander(self, *args, **kwargs):
+        return _Bloco(self)
+
+    spinner = container = empty = form = expander
+
+    def stop(self):
+        raise ParadaStreamlit("st.stop()")
+
+    def rerun(self, *args, **kwargs):
+        raise ParadaStreamlit("st.rerun()")
+
+    def __getattr__(self, nome):
+        # markdown, plotly_chart, dataframe, metric, info, caption...: sem efeito
+        return _nada
+
+
+def instalar():
+    '''Registra o stub como `streamlit` (só tem efeito se chamado antes dos imports do dashboard).'''
+    stub = StreamlitStub()
+    sys.modules['streamlit'] = stub
+    return stub
@@ -2,7 +2,12 @@
 # Importando Libs
 from dotenv import load_dotenv, find_dotenv
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2.extensions import encodings
+from psycopg2.pool import ThreadedConnectionPool
 # import urllib.parse # REMOVIDO: Não é necessário para psycopg2
 
 # Carregar variáveis do arquivo .env
@@ -72,6 +77,30 @@ class PostgresConnect:
         else:
             print("Erro: Conexão não está ativa para executar query.")
 
+    def copy_to_csv(self, query, params=None):
+        '''
+        Exporta o resultado da consulta em CSV (com cabeçalho, UTF-8) via COPY ... TO STDOUT.
+        As linhas vão do banco direto para um arquivo temporário em disco, que volta posicionado no
+        início (FileIO: o st.download_button aceita); o arquivo some ao ser fechado. Retorna None em caso de erro.
+        '''
+        if self.conn is None or self.conn.closed:
+            print("Erro: Conexão não está ativa para exportar CSV.")
+            return None
+        arquivo = tempfile.TemporaryFile(buffering=0)
+        try:
+            # Cursor próprio: a exportação pode rodar fora da thread que usa self._cursor
+            with self.conn.cursor() as cur:
+                consulta = cur.mogrify(query, params).decode(encodings[self.conn.encoding])
+                # ENCODING no COPY: sai em UTF-8 mesmo com a conexão em LATIN1, sem recodificar aqui
+                cur.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT CSV, HEADER, ENCODING 'UTF8')", arquivo)
+            arquivo.seek(0)
+            return arquivo
+        except Exception as e:
+            print(f"Erro ao exportar CSV: {e}")
+            arquivo.close()
+            self.rollback()
+            return None
+
     def commit(self): # === NOVO MÉTODO: Para commit manual ===
         '''Realiza o commit das transações pendentes se o autocommit for False.'''
         if self.conn and not self.conn.closed and not self.autocommit:
@@ -101,4 +130,48 @@ class PostgresConnect:
                 self.conn.close()
                 print("Conexão com o PostgreSQL fechada.")
         except Exception as e:
-            print(f"Erro ao fechar a conexão com o banco de dados: {e}")
\ No newline at end of file
+            print(f"Erro ao fechar a conexão com o banco de dados: {e}")
+
+class PostgresPool:
+    '''Pool de conexões thread-safe (psycopg2.pool) para consultas concorrentes de leitura'''
+
+    def __init__(self, maxconn=5):
+        self.maxconn = maxconn
+        self.pool = None
+        # getconn() do psycopg2 falha quando o pool esgota; o semáforo faz a thread esperar
+        self._vagas = threading.BoundedSemaphore(maxconn)
+        try:
+            port_int = int(os.getenv("PORT_BD")) if os.getenv("PORT_BD") else 5432
+            self.pool = ThreadedConnectionPool(
+                1, maxconn,
+                dbname=os.getenv("NAME_BD"),
+                user=os.getenv("USER_BD"),
+                password=os.getenv("PASSWORD_BD"),
+                host=os.getenv("HOST_BD"),
+                port=port_int
+            )
+            print("Pool de conexões com o PostgreSQL criado com sucesso!")
+        except Exception as e:
+            print(f"Erro ao criar o pool de conexões com o PostgreSQL: {e}")
+
+    @contextmanager
+    def conexao(self):
+        '''Empresta uma conexão do pool (em autocommit) e a devolve ao sair do bloco.'''
+        if self.pool is None:
+            raise psycopg2.OperationalError("Pool de conexões com o PostgreSQL indisponível.")
+        with self._vagas:
+            conn = self.pool.getconn()
+            try:
+                if conn.encoding != 'LATIN1':
+                    conn.set_client_encoding('LATIN1')
+                conn.autocommit = True
+                yield conn
+            finally:
+                # Conexões quebradas são descartadas em vez de voltarem ao pool
+                self.pool.putconn(conn, close=bool(conn.closed))
+
+    def close_pool(self):
+        '''Fecha todas as conexões do pool.'''
+        if self.pool is not None and not self.pool.closed:
+            self.pool.closeall()
+            print("Pool de conexões com o PostgreSQL fechado.")
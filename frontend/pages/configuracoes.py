@@ -7,6 +7,8 @@ import subprocess
 import sys
 import os
 
+from models.alocacao_fefo import STATUS_ALOCAVEIS, alocar_pedidos_pendentes
+
 def show():
     st.title("Configurações de Dados")
 
@@ -45,3 +47,20 @@ def show():
                 else:
                     st.success("Script export_postgres_minio.py executado com sucesso!")
 
+    st.header("Alocação de Estoque (FEFO)")
+    st.caption("Aloca os itens pendentes dos pedidos aos lotes que vencem primeiro e dá baixa no estoque "
+               "(requer adjustments_sql/alocacao_fefo.sql).")
+    status_alocacao = st.multiselect("Status dos pedidos a alocar",
+                                     ["Pendente", "Faturado", "Entregue"], default=list(STATUS_ALOCAVEIS))
+    simular_alocacao = st.checkbox("Apenas simular (desfaz a transação no fim)", value=True)
+    if st.button("Alocar pedidos pendentes", disabled=not status_alocacao):
+        with st.spinner("Alocando itens de pedido..."):
+            resumo = alocar_pedidos_pendentes(status=status_alocacao, simular=simular_alocacao)
+        if resumo is None:
+            st.error("Erro na alocação de estoque. Veja o log do servidor.")
+        else:
+            st.dataframe(pd.DataFrame([resumo]), hide_index=True)
+            if resumo['quantidade_faltante']:
+                st.warning(f"{resumo['quantidade_faltante']} unidades ficaram sem estoque e continuam pendentes.")
+            else:
+                st.success("Todos os itens pendentes foram alocados.")
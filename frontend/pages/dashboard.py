@@ -1,11 +1,44 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import plotly.express
+from contextlib import nullcontext
 from datetime import datetime, timedelta
+from functools import partial, wraps
+import time
 import locale  # Importa módulo locale para formatação numérica
+import os
+import uuid
+from psycopg2 import OperationalError
 
 # Importa a classe de conexão com o banco de dados
-from driver.psycopg2_connect import PostgresConnect
+from driver.psycopg2_connect import PostgresConnect, PostgresPool
+from models.dashboard_agregacoes import AgregadorSQL
+from models.grade_itens import GradeItensPedido
+from models.cubo_vendas import CuboVendas, AgregadorCubo
+from models.filtro_temporal import FiltroTemporal, ordenar_por_data
+from models.compactacao import compactar, relatorio_memoria
+from models.carga_incremental import (
+    EstadoCarga, MARGEM_WATERMARK, aplicar_delta, exige_carga_completa, instante_banco, watermark_disponivel
+)
+from models.carga_paralela import MAX_TAREFAS_PARALELAS, ResultadoCarga, consultar, executar_em_paralelo
+from models.snapshot_parquet import carregar_snapshot, salvar_snapshot_em_segundo_plano
+from models.reducao_pontos import descrever_reducao, grafico_linha
+from models.dados_compartilhados import DadosCompartilhados
+from models.indice_validade import IndiceValidade
+from models.diagnostico_render import (
+    FigurasMedidas, MedidorRender, medir, medir_envio, medir_figuras, resumo_log
+)
+
+# Origem das agregações dos gráficos:
+#   'memoria' -> carrega os itens de pedido e responde pelo cubo pré-agregado em memória (CuboVendas)
+#   'sql'     -> envia as agregações ao PostgreSQL (só o resultado de cada gráfico volta)
+DASHBOARD_FONTE = os.getenv("DASHBOARD_FONTE", "memoria").strip().lower()
+
+# Modo diagnóstico (?diagnostico=1 na URL ou chave na barra lateral): montagem e envio das figuras
+# entram no tempo das seções (models/diagnostico_render.py); desligado, os wrappers só repassam
+px = FigurasMedidas(plotly.express)
+grafico_linha = medir_figuras(grafico_linha)
+plotly_chart = medir_envio(st.plotly_chart)
 
 
 def format_currency_br(value):
@@ -27,57 +60,273 @@ def format_currency_br(value):
         return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 
-@st.cache_data(ttl=3600)
-def load_data_from_db(query, table_name="dados"):
+def _medidor_sessao():
+    """MedidorRender da execução atual da sessão ou None com o modo diagnóstico desligado."""
+    return st.session_state.get("dashboard_medidor")
+
+
+def _secao_diagnostico(nome):
+    """Contexto que mede o bloco como a seção `nome` no modo diagnóstico (sem efeito desligado)."""
+    medidor = _medidor_sessao()
+    return medidor.secao(nome) if medidor is not None else nullcontext()
+
+
+def secao_medida(nome):
     """
-    Carrega dados do banco de dados PostgreSQL com cache.
+    Decorator das seções do dashboard (abaixo de @st.fragment, para medir também as reexecuções
+    do fragmento disparadas pelos widgets da própria seção).
+    """
+    def decorar(funcao):
+        @wraps(funcao)
+        def executar(*args, **kwargs):
+            with _secao_diagnostico(nome):
+                return funcao(*args, **kwargs)
+        return executar
+    return decorar
+
+
+# Conjuntos de dados do dashboard (nomes dos esquemas de compactação), na ordem usada em show()
+DATASETS_DASHBOARD = ('pedidos', 'clientes', 'produtos', 'pagamentos', 'estoque')
+
+# Tabelas cujas alterações invalidam os dados preparados do dashboard
+TABELAS_DASHBOARD = ('tb_pedido', 'tb_item_pedido', 'tb_cliente', 'tb_produto', 'tb_pagamento',
+                     'tb_estoque', 'tb_produto_entrada')
+
+
+@st.cache_resource(show_spinner=False)
+def get_connection_pool():
+    """
+    Pool de conexões do processo para a carga paralela do dashboard
+    (uma conexão por consulta simultânea, mais folga para o histórico).
+    Sem conexão o erro sobe e nada fica no cache: a próxima execução tenta criar o pool de novo.
+    """
+    pool = PostgresPool(maxconn=MAX_TAREFAS_PARALELAS + 2)
+    if pool.pool is None:
+        raise OperationalError("Não foi possível criar o pool de conexões com o PostgreSQL.")
+    return pool
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_data_version():
+    """
+    Versão dos dados do dashboard: contadores de inserções/atualizações/exclusões das tabelas
+    (pg_stat_user_tables). Consulta barata; muda sempre que alguma tabela do dashboard é alterada.
     """
     db_connection = PostgresConnect()
     if db_connection.conn is None or db_connection.conn.closed:
-        st.error(f"Erro ao conectar ao banco para carregar {table_name}. Verifique as credenciais e o status do DB.")
-        return pd.DataFrame()
+        return None
     try:
-        df = pd.read_sql(query, db_connection.conn)
-        return df
+        cur = db_connection.get_cursor()
+        cur.execute(
+            """
+            SELECT relname, n_tup_ins, n_tup_upd, n_tup_del, n_live_tup
+            FROM pg_stat_user_tables
+            WHERE relname = ANY(%s)
+            ORDER BY relname
+            """,
+            (list(TABELAS_DASHBOARD),)
+        )
+        return tuple(cur.fetchall())
     except Exception as e:
-        st.error(f"Erro na consulta {table_name}: {e}")
-        return pd.DataFrame()
+        print(f"Erro ao consultar a versão dos dados do dashboard: {e}")
+        return None
     finally:
         db_connection.close_connection()
 
 
+@st.cache_resource(show_spinner=False)
+def get_load_state():
+    """
+    Histórico de pedidos/pagamentos já carregado neste processo (compartilhado entre as sessões),
+    base da carga incremental.
+    """
+    return EstadoCarga()
+
+
+def _compactar_com_relatorio(preparados):
+    """
+    Compacta os tipos (categorias, int32, float32, strings Arrow) conforme models/compactacao.py
+    e imprime a memória antes -> depois de cada conjunto.
+    """
+    antes = relatorio_memoria(preparados).set_index('dataset')['memoria_mb']
+    compactados = {nome: compactar(df, nome) for nome, df in preparados.items()}
+    depois = relatorio_memoria(compactados).set_index('dataset')['memoria_mb']
+    print("Memória dos dados do dashboard (MB): " +
+          ", ".join(f"{nome} {antes[nome]:.1f} -> {depois[nome]:.1f}" for nome in compactados))
+    return compactados
+
+
+def _preparar_delta(df_pedidos_detalhes, df_pagamentos):
+    """Prepara e compacta as linhas do delta de pedidos/itens e pagamentos."""
+    df_pedidos_detalhes, _, _, df_pagamentos, _ = prepare_data(
+        df_pedidos_detalhes, pd.DataFrame(), pd.DataFrame(), df_pagamentos, pd.DataFrame()
+    )
+    return compactar(df_pedidos_detalhes, 'pedidos'), compactar(df_pagamentos, 'pagamentos')
+
+
+def load_history(estado, pool, data_version):
+    """
+    Pedidos/itens e pagamentos preparados e compactados, atualizados por watermark:
+    na primeira carga (ou quando o delta não basta, ver exige_carga_completa) lê o histórico todo;
+    nas seguintes busca só as linhas inseridas/alteradas desde a última carga e as aplica
+    sobre os DataFrames do processo. As duas consultas rodam em paralelo.
+    Num processo novo o histórico parte do snapshot em disco (models/snapshot_parquet.py) e só o
+    delta vem do banco; cada carga bem-sucedida grava um snapshot novo em segundo plano.
+    Retorna ((df_pedidos_detalhes, df_pagamentos), ResultadoCarga das consultas).
+    Roda numa thread da carga paralela: não chama st.*.
+    """
+    with estado.lock:
+        resultado = ResultadoCarga()
+        if estado.frames is None:
+            inicio_snapshot = time.perf_counter()
+            snapshot = carregar_snapshot(('pedidos', 'pagamentos'))
+            if snapshot is not None:
+                frames, watermark, versao = snapshot
+                estado.atualizado((frames['pedidos'], frames['pagamentos']), watermark, versao)
+                resultado.tempos['snapshot'] = time.perf_counter() - inicio_snapshot
+                print(f"Histórico do dashboard lido do snapshot em {resultado.tempos['snapshot']:.2f} s "
+                      f"(watermark {watermark:%d/%m/%Y %H:%M:%S})")
+        if estado.versao == data_version and estado.frames is not None:
+            return estado.frames, resultado
+
+        # Próximo watermark: lido antes das consultas, então nada gravado durante a carga se perde
+        inicio = instante_banco()
+        incremental = (estado.frames is not None and estado.watermark is not None and inicio is not None
+                       and not exige_carga_completa(estado.versao, data_version))
+        if incremental:
+            params = {'desde': estado.watermark - MARGEM_WATERMARK}
+            carga = executar_em_paralelo({
+                'pedidos (delta)': partial(consultar, pool, QUERY_PEDIDOS_DETALHES_DELTA, params),
+                'pagamentos (delta)': partial(consultar, pool, QUERY_PAGAMENTOS_DELTA, params),
+            })
+            resultado.incluir(carga)
+            if carga.erros:
+                # Falha no delta: mantém o histórico e o watermark (a próxima carga tenta de novo)
+                return estado.frames, resultado
+            delta_pedidos, delta_pagamentos = _preparar_delta(carga.dados['pedidos (delta)'],
+                                                              carga.dados['pagamentos (delta)'])
+            df_pedidos_base, df_pagamentos_base = estado.frames
+            print(f"Carga incremental: {len(delta_pedidos)} itens de pedido e {len(delta_pagamentos)} pagamentos")
+            frames = estado.atualizado(
+                (aplicar_delta(df_pedidos_base, delta_pedidos, 'id_item_pedido', 'data_pedido'),
+                 aplicar_delta(df_pagamentos_base, delta_pagamentos, 'id_pagamento', 'data_pagamento')),
+                inicio, data_version
+            )
+            salvar_snapshot_em_segundo_plano(dict(zip(('pedidos', 'pagamentos'), frames)), inicio, data_version)
+            return frames, resultado
+
+        carga = executar_em_paralelo({
+            'pedidos': partial(consultar, pool, QUERY_PEDIDOS_DETALHES),
+            'pagamentos': partial(consultar, pool, QUERY_PAGAMENTOS),
+        })
+        df_pedidos_detalhes, _, _, df_pagamentos, _ = prepare_data(
+            carga.dados.get('pedidos', pd.DataFrame()), pd.DataFrame(), pd.DataFrame(),
+            carga.dados.get('pagamentos', pd.DataFrame()), pd.DataFrame()
+        )
+        compactados = _compactar_com_relatorio({'pedidos': df_pedidos_detalhes, 'pagamentos': df_pagamentos})
+        frames = (compactados['pedidos'], compactados['pagamentos'])
+        resultado.incluir(carga)
+        if carga.erros:
+            # Carga parcial não vira base do delta: a próxima carga relê o histórico
+            return frames, resultado
+        # Sem a coluna atualizado_em (migração não aplicada) toda nova versão recarrega tudo
+        # e não há snapshot (não haveria como atualizá-lo pelo delta)
+        watermark = inicio if watermark_disponivel() else None
+        salvar_snapshot_em_segundo_plano(compactados, watermark, data_version)
+        return estado.atualizado(frames, watermark, data_version), resultado
+
+
+@st.cache_resource(ttl=3600, show_spinner=False, max_entries=2)
+def load_prepared_data(data_version, fonte_sql=False):
+    """
+    Carrega e prepara os DataFrames do dashboard uma única vez por versão dos dados.
+    O resultado (DadosCompartilhados) é um só por processo: todas as sessões leem os mesmos
+    DataFrames por visões sem cópia, então a memória não cresce com o número de sessões.
+    As consultas independentes rodam em paralelo (executar_em_paralelo) com conexões do pool;
+    o histórico de pedidos e pagamentos vem de load_history (incremental).
+    O relatório de tempo/status por consulta fica em DadosCompartilhados.relatorio_carga.
+    Conjuntos cuja consulta falhou voltam vazios; as seções com dados são exibidas normalmente.
+    """
+    pool = get_connection_pool()
+    tarefas = {
+        'clientes': partial(consultar, pool, QUERY_CLIENTES),
+        'produtos': partial(consultar, pool, QUERY_PRODUTOS),
+        'estoque': partial(consultar, pool, QUERY_ESTOQUE),
+    }
+    # No modo 'sql' o histórico de itens e pagamentos não é carregado: cada gráfico consulta o banco
+    if not fonte_sql:
+        tarefas['historico'] = partial(load_history, get_load_state(), pool, data_version)
+    carga = executar_em_paralelo(tarefas)
+
+    df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, df_estoque = prepare_data(
+        pd.DataFrame(), carga.dados.get('clientes', pd.DataFrame()), carga.dados.get('produtos', pd.DataFrame()),
+        pd.DataFrame(), carga.dados.get('estoque', pd.DataFrame())
+    )
+    if 'historico' in carga.dados:
+        (df_pedidos_detalhes, df_pagamentos), carga_historico = carga.dados.pop('historico')
+        carga.incluir(carga_historico)
+    print(f"Carga do dashboard em {carga.total:.2f} s: " +
+          ", ".join(f"{nome} {segundos:.2f} s" for nome, segundos in carga.tempos.items()))
+
+    # Pedidos e pagamentos já chegam compactados de load_history
+    compactados = _compactar_com_relatorio({'clientes': df_clientes, 'produtos': df_produtos, 'estoque': df_estoque})
+    compactados.update(pedidos=df_pedidos_detalhes, pagamentos=df_pagamentos)
+    return DadosCompartilhados(compactados, carga.relatorio())
+
+
+@st.cache_resource(ttl=3600, show_spinner=False, max_entries=2)
+def load_sales_cube(data_version):
+    """
+    Cubo pré-agregado (CuboVendas) dos pedidos e pagamentos, montado uma vez por versão dos dados
+    e compartilhado (somente leitura) entre as sessões.
+    """
+    dados = load_prepared_data(data_version, False)
+    return CuboVendas(dados.visao('pedidos'), dados.visao('pagamentos'))
+
+
+@st.cache_resource(ttl=3600, show_spinner=False, max_entries=2)
+def load_expiry_index(data_version, fonte_sql=False):
+    """
+    Índice de vencimento (IndiceValidade) do estoque, montado uma vez por versão dos dados
+    e compartilhado (somente leitura) entre as sessões.
+    """
+    dados = load_prepared_data(data_version, fonte_sql)
+    return IndiceValidade(dados.visao('estoque'))
+
+
+def _mes_ano(datas):
+    """
+    Rótulo 'AAAA-MM' de cada data. Formata só os meses distintos e espalha pelos códigos,
+    em vez de converter linha a linha com .dt.to_period('M').astype(str).
+    """
+    codigos, meses = pd.factorize(datas.dt.to_period('M'))
+    return pd.Series(meses.astype(str).to_numpy()[codigos], index=datas.index)
+
+
 def prepare_data(df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, df_estoque):
     """
     Prepara e limpa os DataFrames, calculando métricas adicionais como lucro.
+    Todas as colunas derivadas são calculadas com operações vetorizadas.
+    Pedidos, pagamentos e estoque saem ordenados pela data (base dos filtros por FiltroTemporal).
     """
     # Converter colunas de data para datetime
     if not df_pedidos_detalhes.empty:
         df_pedidos_detalhes['data_pedido'] = pd.to_datetime(df_pedidos_detalhes['data_pedido'])
-        df_pedidos_detalhes['mes_ano_pedido'] = df_pedidos_detalhes['data_pedido'].dt.to_period('M').astype(str)
+        df_pedidos_detalhes = ordenar_por_data(df_pedidos_detalhes, 'data_pedido')
+        df_pedidos_detalhes['mes_ano_pedido'] = _mes_ano(df_pedidos_detalhes['data_pedido'])
 
     if not df_pagamentos.empty:
         df_pagamentos['data_pagamento'] = pd.to_datetime(df_pagamentos['data_pagamento'])
-        df_pagamentos['mes_ano_pagamento'] = df_pagamentos['data_pagamento'].dt.to_period('M').astype(str)
+        df_pagamentos = ordenar_por_data(df_pagamentos, 'data_pagamento')
+        df_pagamentos['mes_ano_pagamento'] = _mes_ano(df_pagamentos['data_pagamento'])
 
     if not df_estoque.empty:
         df_estoque['validade'] = pd.to_datetime(df_estoque['validade'])
+        df_estoque = ordenar_por_data(df_estoque, 'validade')
 
-    # Cálculo do Lucro (merge com preco_compra)
-    if not df_pedidos_detalhes.empty and not df_produtos.empty:
-        # Garante que 'id_produto' é do mesmo tipo em ambos os DFs para o merge
-        df_pedidos_detalhes['id_produto'] = df_pedidos_detalhes['id_produto'].astype(str)
-        df_produtos['id_produto'] = df_produtos['id_produto'].astype(str)
-
-        df_pedidos_detalhes = df_pedidos_detalhes.merge(
-            df_produtos[['id_produto', 'preco_compra']],
-            on='id_produto',
-            how='left'
-        )
-        # Calcula lucro_item apenas onde preco_compra não é nulo para evitar NaNs
-        df_pedidos_detalhes['lucro_item'] = df_pedidos_detalhes.apply(
-            lambda row: row['quantidade'] * (row['preco_unitario'] - row['preco_compra'])
-            if pd.notna(row['preco_compra']) else 0, axis=1
-        )
+    # lucro_item já vem do banco (tb_item_pedido.lucro_item, calculado com o custo gravado na venda)
+    if not df_pedidos_detalhes.empty:
+        df_pedidos_detalhes['lucro_item'] = pd.to_numeric(df_pedidos_detalhes['lucro_item']).fillna(0)
         df_pedidos_detalhes['ano_pedido'] = df_pedidos_detalhes['data_pedido'].dt.year
     else:
         df_pedidos_detalhes['lucro_item'] = 0
@@ -91,21 +340,29 @@ def prepare_data(df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, d
     return df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, df_estoque
 
 
-def display_kpis(df_pedidos_detalhes, df_clientes):
+@st.fragment
+@secao_medida("KPIs")
+def display_kpis(agregador, df_clientes):
     """
     Exibe os KPIs gerais do dashboard.
     """
     st.subheader("📈 KPIs Gerais")
     col1, col2, col3, col4, col5, col6 = st.columns(6)
 
+    #lucro semanal
+    today_date = datetime.now().date()
+
+    # Calculo de  e nício e fim da semana (segunda-feira a domingo) para a data atual do sistema
+    start_of_current_week = today_date - timedelta(days=today_date.weekday())
+    end_of_current_week = start_of_current_week + timedelta(days=6)
+
+    resumo = agregador.resumo_kpis(start_of_current_week, end_of_current_week)
+
     # Total de Vendas
-    total_vendas = 0
-    if not df_pedidos_detalhes.empty:
-        unique_pedidos_for_total = df_pedidos_detalhes.drop_duplicates(subset=['id_pedido'])
-        total_vendas = unique_pedidos_for_total['valor_total'].sum()
+    total_vendas = resumo['total_vendas']
 
     # Total de Pedidos
-    total_pedidos = df_pedidos_detalhes['id_pedido'].nunique() if not df_pedidos_detalhes.empty else 0
+    total_pedidos = resumo['total_pedidos']
 
     # Ticket Médio
     media_valor_pedido = total_vendas / total_pedidos if total_pedidos > 0 else 0
@@ -114,27 +371,13 @@ def display_kpis(df_pedidos_detalhes, df_clientes):
     total_clientes = df_clientes['id_cliente'].nunique() if not df_clientes.empty else 0
 
     # Lucro Anual e Médio Anual
-    lucro_anual = df_pedidos_detalhes.groupby('ano_pedido')[
-        'lucro_item'].sum().reset_index() if not df_pedidos_detalhes.empty else pd.DataFrame()
+    lucro_anual = resumo['lucro_por_ano']
     lucro_medio_anual = lucro_anual['lucro_item'].mean() if not lucro_anual.empty else 0
     ano_atual = datetime.now().year
     lucro_ano_atual = lucro_anual.loc[lucro_anual['ano_pedido'] == ano_atual, 'lucro_item'].sum() if ano_atual in \
                                                                                                      lucro_anual[
                                                                                                          'ano_pedido'].values else 0
-    #lucro semanal
-    today_date = datetime.now().date()
-
-    # Calculo de  e nício e fim da semana (segunda-feira a domingo) para a data atual do sistema
-    start_of_current_week = today_date - timedelta(days=today_date.weekday())
-    end_of_current_week = start_of_current_week + timedelta(days=6)
-    df_pedidos_apenas_data = df_pedidos_detalhes.copy()  # Criar uma cópia para garantir que não haja modificações no DF original
-    df_pedidos_apenas_data['data_pedido_date_only'] = df_pedidos_apenas_data['data_pedido'].dt.date
-
-    df_current_week = df_pedidos_apenas_data[
-        (df_pedidos_apenas_data['data_pedido_date_only'] >= start_of_current_week) &
-        (df_pedidos_apenas_data['data_pedido_date_only'] <= end_of_current_week)
-        ]
-    lucro_semanal = df_current_week['lucro_item'].sum()
+    lucro_semanal = resumo['lucro_semanal']
 
     # Cálculo do delta para o lucro do ano atual em relação à média
     delta_lucro = lucro_ano_atual - lucro_medio_anual
@@ -170,19 +413,16 @@ def display_kpis(df_pedidos_detalhes, df_clientes):
     st.markdown("---")
 
 
-def display_sales_trends(df_pedidos_detalhes, start_date, end_date):
+@st.fragment
+@secao_medida("Vendas ao longo do tempo")
+def display_sales_trends(agregador):
     """
     Exibe gráficos de vendas e pedidos ao longo do tempo com granularidade selecionável e métricas.
+    O agregador já está restrito ao período selecionado na barra lateral.
     """
     st.subheader("Vendas e Pedidos ao Longo do Tempo")
 
-    # Filtrar o DataFrame com base no período selecionado na barra lateral
-    df_filtered_by_date = df_pedidos_detalhes[
-        (df_pedidos_detalhes['data_pedido'].dt.date >= start_date) &
-        (df_pedidos_detalhes['data_pedido'].dt.date <= end_date)
-        ].copy()
-
-    if df_filtered_by_date.empty:
+    if not agregador.possui_pedidos():
         st.info("Nenhum dado de vendas encontrado para o período selecionado para visualização temporal.")
         st.markdown("---")
         return
@@ -214,14 +454,13 @@ def display_sales_trends(df_pedidos_detalhes, start_date, end_date):
 
     # --- Gráfico de Volume de Vendas ao Longo do Tempo ---
     with col_vendas_data:
-        vendas_por_data = df_filtered_by_date.drop_duplicates(subset=['id_pedido']).groupby(
-            pd.Grouper(key='data_pedido', freq=selected_freq)
-        )['valor_total'].sum().reset_index()
+        vendas_por_data = agregador.vendas_por_periodo(selected_freq)
 
         # O Grouper pode retornar algumas datas sem vendas no período, Plotly lida bem com isso
         # Se quiser remover, use: vendas_por_data = vendas_por_data[vendas_por_data['valor_total'] > 0]
 
-        fig_vendas_data = px.line(
+        # Série reduzida no servidor (LTTB) quando passa do orçamento de pontos; WebGL em séries longas
+        fig_vendas_data, reducao_vendas = grafico_linha(
             vendas_por_data,
             x='data_pedido',
             y='valor_total',
@@ -232,7 +471,6 @@ def display_sales_trends(df_pedidos_detalhes, start_date, end_date):
         )
         fig_vendas_data.update_layout(yaxis_tickprefix="R$ ")
         fig_vendas_data.update_traces(
-            mode='lines+markers',  # Mostra linhas e marcadores
             hovertemplate='<b>Data:</b> %{x|%d/%m/%Y}<br><b>Vendas:</b> %{y:,.2f}<extra></extra>'
             # Formato para o tooltip
         )
@@ -244,15 +482,15 @@ def display_sales_trends(df_pedidos_detalhes, start_date, end_date):
             dict(count=1, label="1y", step="year", stepmode="backward"),
             dict(step="all")
         ]))
-        st.plotly_chart(fig_vendas_data, use_container_width=True)
+        plotly_chart(fig_vendas_data, use_container_width=True)
+        if descrever_reducao(reducao_vendas):
+            st.caption(descrever_reducao(reducao_vendas))
 
     # --- Gráfico de Número de Pedidos ao Longo do Tempo ---
     with col_pedidos_data:
-        pedidos_por_data = df_filtered_by_date.groupby(
-            pd.Grouper(key='data_pedido', freq=selected_freq)
-        )['id_pedido'].nunique().reset_index(name='num_pedidos')
+        pedidos_por_data = agregador.pedidos_por_periodo(selected_freq)
 
-        fig_pedidos_data = px.line(
+        fig_pedidos_data, reducao_pedidos = grafico_linha(
             pedidos_por_data,
             x='data_pedido',
             y='num_pedidos',
@@ -262,7 +500,6 @@ def display_sales_trends(df_pedidos_detalhes, start_date, end_date):
             color_discrete_sequence=[orders_line_color]  # Aplica a cor definida
         )
         fig_pedidos_data.update_traces(
-            mode='lines+markers',
             hovertemplate='<b>Data:</b> %{x|%d/%m/%Y}<br><b>Pedidos:</b> %{y}<extra></extra>'
         )
         fig_pedidos_data.update_xaxes(rangeselector_buttons=list([
@@ -273,36 +510,31 @@ def display_sales_trends(df_pedidos_detalhes, start_date, end_date):
             dict(count=1, label="1y", step="year", stepmode="backward"),
             dict(step="all")
         ]))
-        st.plotly_chart(fig_pedidos_data, use_container_width=True)
+        plotly_chart(fig_pedidos_data, use_container_width=True)
+        if descrever_reducao(reducao_pedidos):
+            st.caption(descrever_reducao(reducao_pedidos))
 
     st.markdown("---")
 
 
-def display_product_analysis(df_pedidos_detalhes, df_produtos):
+@st.fragment
+@secao_medida("Produtos")
+def display_product_analysis(agregador, df_produtos):
     """
     Exibe análises detalhadas de produtos e vendas, incluindo rentabilidade e tendências.
     Aprimorado com melhores cores e visualização para gráficos de rosca.
     """
     st.subheader("Análise de Produtos e Vendas")
 
-    if df_pedidos_detalhes.empty:
+    if not agregador.possui_pedidos():
         st.info("Nenhum dado de vendas disponível para análise de produtos.")
         st.markdown("---")
         return
 
-    # Certifique-se de que 'valor_item_calculado' e 'lucro_item' existem,
-    # que são calculados na função prepare_data
-    if 'valor_item_calculado' not in df_pedidos_detalhes.columns:
-        st.warning("Coluna 'valor_item_calculado' não encontrada. Verifique a função 'prepare_data'.")
-        return
-    if 'lucro_item' not in df_pedidos_detalhes.columns:
-        st.warning("Coluna 'lucro_item' não encontrada. Verifique a função 'prepare_data'.")
-        return
-
     # --- Filtro para Top Produtos/Lucro ---
     col_filters, _ = st.columns([0.3, 0.7])
     with col_filters:
-        all_cut_types = sorted(df_pedidos_detalhes['tipo_corte'].unique())
+        all_cut_types = agregador.opcoes('tipo_corte')
         selected_cut_type = st.multiselect(
             "Filtrar por Tipo de Corte (para Top Produtos/Lucro):",
             options=['Todos'] + all_cut_types,
@@ -310,11 +542,12 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
             key="product_analysis_cut_type_filter"
         )
 
-    df_filtered_by_cut_type = df_pedidos_detalhes.copy()
+    tipos_corte_filtro = None
     if 'Todos' not in selected_cut_type and selected_cut_type:
-        df_filtered_by_cut_type = df_pedidos_detalhes[df_pedidos_detalhes['tipo_corte'].isin(selected_cut_type)]
+        tipos_corte_filtro = selected_cut_type
 
-    if df_filtered_by_cut_type.empty:
+    top_produtos_qtd = agregador.top_produtos('quantidade', tipos_corte_filtro)
+    if top_produtos_qtd.empty:
         st.info("Nenhum dado de vendas encontrado para os tipos de corte selecionados.")
         st.markdown("---")
         return
@@ -375,8 +608,6 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
 
     # --- 1. Top N Produtos Mais Vendidos (por quantidade) ---
     with col_top_produtos_qtd:
-        top_produtos_qtd = df_filtered_by_cut_type.groupby('nome_produto')['quantidade'].sum().nlargest(
-            10).reset_index()
         fig_top_produtos_qtd = px.bar(top_produtos_qtd, x='quantidade', y='nome_produto',
                                       title='Top 10 Produtos Mais Vendidos (Quantidade)',
                                       orientation='h',
@@ -387,12 +618,11 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
         fig_top_produtos_qtd.update_layout(yaxis={'categoryorder': 'total ascending'})
         fig_top_produtos_qtd.update_traces(
             hovertemplate='<b>Produto:</b> %{y}<br><b>Quantidade:</b> %{x}<extra></extra>')
-        st.plotly_chart(fig_top_produtos_qtd, use_container_width=True)
+        plotly_chart(fig_top_produtos_qtd, use_container_width=True)
 
     # --- 2. Top N Produtos por Lucro ---
     with col_top_produtos_lucro:
-        top_produtos_lucro = df_filtered_by_cut_type.groupby('nome_produto')['lucro_item'].sum().nlargest(
-            10).reset_index()
+        top_produtos_lucro = agregador.top_produtos('lucro_item', tipos_corte_filtro)
         fig_top_produtos_lucro = px.bar(top_produtos_lucro, x='lucro_item', y='nome_produto',
                                         title='Top 10 Produtos Mais Lucrativos (R$)',
                                         orientation='h',
@@ -403,7 +633,7 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
         fig_top_produtos_lucro.update_layout(xaxis_tickprefix="R$ ")
         fig_top_produtos_lucro.update_traces(
             hovertemplate='<b>Produto:</b> %{y}<br><b>Lucro:</b> %{x:,.2f} R$<extra></extra>')
-        st.plotly_chart(fig_top_produtos_lucro, use_container_width=True)
+        plotly_chart(fig_top_produtos_lucro, use_container_width=True)
 
     st.markdown("---")
 
@@ -411,7 +641,7 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
 
     # --- 3. Distribuição de Vendas por Tipo de Corte ---
     with col_vendas_corte:
-        vendas_por_corte = df_pedidos_detalhes.groupby('tipo_corte')['valor_item_calculado'].sum().reset_index()
+        vendas_por_corte = agregador.soma_por_corte('valor_item_calculado')
 
         # Melhoria para gráficos de rosca: agrupar fatias pequenas em "Outros"
         # Isso é útil se tivermos muitos tipos de corte com valores muito pequenos
@@ -468,11 +698,11 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
             fig_vendas_por_corte.update_traces(
                 hovertemplate='<b>Tipo de Corte:</b> %{x}<br><b>Valor:</b> %{y:,.2f} R$<extra></extra>')
 
-        st.plotly_chart(fig_vendas_por_corte, use_container_width=True)
+        plotly_chart(fig_vendas_por_corte, use_container_width=True)
 
     # --- 4. Distribuição de Lucro por Tipo de Corte ---
     with col_lucro_corte:
-        lucro_por_corte = df_pedidos_detalhes.groupby('tipo_corte')['lucro_item'].sum().reset_index()
+        lucro_por_corte = agregador.soma_por_corte('lucro_item')
 
         # Melhoria para gráficos de rosca: agrupar fatias pequenas em "Outros"
         total_lucro_corte = lucro_por_corte['lucro_item'].sum()
@@ -522,7 +752,7 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
             fig_lucro_por_corte.update_traces(
                 hovertemplate='<b>Tipo de Corte:</b> %{x}<br><b>Lucro:</b> %{y:,.2f} R$<extra></extra>')
 
-        st.plotly_chart(fig_lucro_por_corte, use_container_width=True)
+        plotly_chart(fig_lucro_por_corte, use_container_width=True)
 
     st.markdown("---")
 
@@ -530,7 +760,7 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
     st.markdown("### Tendência de Vendas de Produtos Individuais")
 
     # Obter lista de produtos vendidos no período filtrado
-    available_products = sorted(df_pedidos_detalhes['nome_produto'].unique())
+    available_products = agregador.opcoes('nome_produto')
     selected_product_for_trend = st.selectbox(
         "Selecione um produto para ver sua tendência de vendas:",
         options=['Selecione um produto'] + available_products,
@@ -538,15 +768,9 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
     )
 
     if selected_product_for_trend != 'Selecione um produto':
-        df_product_trend = df_pedidos_detalhes[df_pedidos_detalhes['nome_produto'] == selected_product_for_trend].copy()
-
-        if not df_product_trend.empty:
-            product_sales_trend = df_product_trend.groupby(pd.Grouper(key='data_pedido', freq='ME')).agg(
-                Quantidade_Vendida=('quantidade', 'sum'),
-                Valor_Vendido=('valor_item_calculado', 'sum'),
-                Lucro_Gerado=('lucro_item', 'sum')
-            ).reset_index()
+        product_sales_trend = agregador.tendencia_produto(selected_product_for_trend, 'ME')
 
+        if not product_sales_trend.empty:
             metric_to_display = st.radio(
                 "Mostrar tendência por:",
                 ('Quantidade Vendida', 'Valor Vendido', 'Lucro Gerado'),
@@ -569,13 +793,12 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
                 y_title = 'Lucro Total Gerado (R$)'
                 hover_format = 'R$ %{y:,.2f}'
 
-            fig_product_trend = px.line(
+            fig_product_trend, reducao_produto = grafico_linha(
                 product_sales_trend,
                 x='data_pedido',
                 y=y_column,
                 title=f"Tendência de {metric_to_display} para {selected_product_for_trend}",
                 labels={'data_pedido': 'Mês/Ano', y_column: y_title},
-                markers=True,
                 color_discrete_sequence=[px.colors.qualitative.Dark2[0]]  # Cor única para a linha
             )
             if 'Valor' in y_title or 'Lucro' in y_title:
@@ -589,7 +812,9 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
                 dict(count=1, label="1y", step="year", stepmode="backward"),
                 dict(step="all")
             ]))
-            st.plotly_chart(fig_product_trend, use_container_width=True)
+            plotly_chart(fig_product_trend, use_container_width=True)
+            if descrever_reducao(reducao_produto):
+                st.caption(descrever_reducao(reducao_produto))
         else:
             st.info(f"Nenhuma venda encontrada para '{selected_product_for_trend}' no período filtrado.")
     else:
@@ -597,11 +822,26 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
 
     st.markdown("---")
 
-    # --- 6. Tabela Detalhada de Itens de Pedido ---
+
+def _exportar_itens_csv(grade):
+    # Roda na thread do download (comandos st são ignorados): falha vira exceção
+    arquivo = grade.exportar_csv()
+    if arquivo is None:
+        raise RuntimeError("Falha ao exportar os itens de pedido para CSV.")
+    return arquivo
+
+
+@st.fragment
+@secao_medida("Grade de itens")
+def display_item_grid(agregador, start_date, end_date):
+    """
+    Exibe a tabela de itens de pedido vendidos paginada no banco (keyset),
+    com filtros e ordenação resolvidos em SQL e exportação do conjunto filtrado completo.
+    """
     st.markdown("### Detalhes dos Itens de Pedido Vendidos")
 
     # Adicionar filtro para tipo de corte na tabela detalhada
-    all_table_cut_types = sorted(df_pedidos_detalhes['tipo_corte'].unique())
+    all_table_cut_types = agregador.opcoes('tipo_corte')
     selected_table_cut_type = st.multiselect(
         "Filtrar itens da tabela por Tipo de Corte:",
         options=['Todos'] + all_table_cut_types,
@@ -609,31 +849,55 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
         key="product_item_table_cut_type_filter"
     )
 
-    df_itens_tabela = df_pedidos_detalhes.copy()
-    if 'Todos' not in selected_table_cut_type and selected_table_cut_type:
-        df_itens_tabela = df_itens_tabela[df_itens_tabela['tipo_corte'].isin(selected_table_cut_type)]
-
     # Adicionar filtro para status do pedido na tabela detalhada
-    all_table_status = sorted(df_pedidos_detalhes['status_pedido'].unique())
+    all_table_status = agregador.opcoes('status_pedido')
     selected_table_status = st.multiselect(
         "Filtrar itens da tabela por Status do Pedido:",
         options=['Todos'] + all_table_status,
-        default=['Faturado', 'Entregue'],  # Exemplo: padrão para pedidos concluídos
+        default=[s for s in ['Faturado', 'Entregue'] if s in all_table_status],  # Exemplo: padrão para pedidos concluídos
         key="product_item_table_status_filter"
     )
 
-    if 'Todos' not in selected_table_status and selected_table_status:
-        df_itens_tabela = df_itens_tabela[df_itens_tabela['status_pedido'].isin(selected_table_status)]
+    ordenacoes = {
+        'Data': 'data_pedido',
+        'Cliente': 'nome_cliente',
+        'Produto': 'nome_produto',
+        'Qtd.': 'quantidade',
+        'Valor Total Item': 'valor_item_calculado',
+        'Lucro Item': 'lucro_item',
+    }
+    col_ordem, col_direcao, col_tamanho = st.columns([0.4, 0.3, 0.3])
+    with col_ordem:
+        ordenar_por = st.selectbox("Ordenar por:", list(ordenacoes.keys()), key="product_item_table_sort")
+    with col_direcao:
+        decrescente = st.toggle("Ordem decrescente", value=True, key="product_item_table_desc")
+    with col_tamanho:
+        tamanho_pagina = st.selectbox("Itens por página:", [50, 100, 250, 500], index=1,
+                                      key="product_item_table_page_size")
+
+    grade = GradeItensPedido(
+        start_date, end_date,
+        tipos_corte=selected_table_cut_type if 'Todos' not in selected_table_cut_type else None,
+        status=selected_table_status if 'Todos' not in selected_table_status else None,
+        ordenar_por=ordenacoes[ordenar_por],
+        decrescente=decrescente,
+        tamanho_pagina=tamanho_pagina
+    )
 
-    if not df_itens_tabela.empty:
-        # Colunas a serem exibidas na tabela
-        columns_to_display = [
-            'data_pedido', 'nome_cliente', 'nome_produto', 'tipo_corte',
-            'quantidade', 'unidade_medida', 'preco_unitario', 'valor_item_calculado', 'lucro_item', 'status_pedido'
-        ]
+    # Cursores das páginas visitadas; qualquer mudança de filtro/ordem volta para a primeira página
+    assinatura = (start_date, end_date, tuple(selected_table_cut_type), tuple(selected_table_status),
+                  ordenar_por, decrescente, tamanho_pagina)
+    estado = st.session_state.get("product_item_table_pages")
+    if estado is None or estado['assinatura'] != assinatura:
+        estado = {'assinatura': assinatura, 'cursores': [None], 'total_estimado': grade.total_estimado()}
+        st.session_state["product_item_table_pages"] = estado
+
+    df_itens_tabela, proximo_cursor = grade.pagina(estado['cursores'][-1])
+    pagina_atual = len(estado['cursores'])
 
+    if not df_itens_tabela.empty:
         st.dataframe(
-            df_itens_tabela[columns_to_display].rename(columns={
+            df_itens_tabela.rename(columns={
                 'data_pedido': 'Data',
                 'nome_cliente': 'Cliente',
                 'nome_produto': 'Produto',
@@ -654,27 +918,50 @@ def display_product_analysis(df_pedidos_detalhes, df_produtos):
             },
             hide_index=True
         )
+
+        total_estimado = estado['total_estimado']
+        col_anterior, col_info, col_proxima = st.columns([0.2, 0.6, 0.2])
+        with col_anterior:
+            # Callbacks: a pilha muda antes da reexecução do fragmento, sem st.rerun()
+            st.button("◀ Anterior", disabled=pagina_atual == 1, key="product_item_table_prev",
+                      on_click=estado['cursores'].pop)
+        with col_info:
+            texto_total = f" · ~{total_estimado:n} itens (estimativa)" if total_estimado is not None else ""
+            st.caption(f"Página {pagina_atual}{texto_total}")
+        with col_proxima:
+            st.button("Próxima ▶", disabled=proximo_cursor is None, key="product_item_table_next",
+                      on_click=estado['cursores'].append, args=(proximo_cursor,))
+
+        # Exportação completa: gerada só no clique, direto do banco (COPY) para um arquivo temporário
+        st.download_button(
+            label="Baixar itens_pedido.csv (todos os itens filtrados)",
+            data=partial(_exportar_itens_csv, grade),
+            file_name="itens_pedido.csv",
+            mime="text/csv",
+            key="product_item_table_download"
+        )
     else:
         st.info("Nenhum item de pedido encontrado para os filtros selecionados.")
     st.markdown("---")
 
-def display_client_analysis(df_clientes, df_pedidos_detalhes):
+
+@st.fragment
+@secao_medida("Clientes")
+def display_client_analysis(df_clientes, agregador):
     """
     Exibe análises detalhadas de clientes, incluindo distribuição por tipo e top clientes.
     """
     st.subheader("Análise de Clientes")
 
-    # Garante que temos apenas uma entrada por pedido para o valor_total do pedido
-    # e que id_pedido e nome_cliente são únicos para a soma
-    df_pedidos_unicos_para_clientes = df_pedidos_detalhes.drop_duplicates(subset=['id_pedido', 'nome_cliente'])
+    possui_pedidos = agregador.possui_pedidos()
 
     col_kpi_clientes1, col_kpi_clientes2 = st.columns(2)
     with col_kpi_clientes1:
         total_clientes = df_clientes['id_cliente'].nunique() if not df_clientes.empty else 0
         st.metric("Total de Clientes Cadastrados", f"{total_clientes:n}")
     with col_kpi_clientes2:
-        if not df_pedidos_unicos_para_clientes.empty:
-            total_clientes_compradores = df_pedidos_unicos_para_clientes['nome_cliente'].nunique()
+        if possui_pedidos:
+            total_clientes_compradores = agregador.total_clientes_compradores()
             st.metric("Clientes com Pedidos Registrados", f"{total_clientes_compradores:n}")
         else:
             st.metric("Clientes com Pedidos Registrados", "N/A")
@@ -682,19 +969,19 @@ def display_client_analysis(df_clientes, df_pedidos_detalhes):
 
     col_tipo_cliente, col_top_clientes_valor = st.columns(2)
 
+    # Mapeamento de cores para tipos de cliente (exemplo)
+    tipo_cliente_colors = {
+        "Atacado": "#1f77b4",  # Azul
+        "Varejo": "#ff7f0e",  # Laranja
+        "Restaurante": "#2ca02c",  # Verde
+        "Mercado": "#d62728"  # Vermelho
+    }
+
     if not df_clientes.empty:
         # --- 1. Distribuição de Clientes por Tipo ---
         dist_tipo_cliente = df_clientes['tipo_cliente'].value_counts().reset_index()
         dist_tipo_cliente.columns = ['Tipo de Cliente', 'Número de Clientes']
 
-        # Mapeamento de cores para tipos de cliente (exemplo)
-        tipo_cliente_colors = {
-            "Atacado": "#1f77b4",  # Azul
-            "Varejo": "#ff7f0e",  # Laranja
-            "Restaurante": "#2ca02c",  # Verde
-            "Mercado": "#d62728"  # Vermelho
-        }
-
         fig_tipo_cliente = px.bar(
             dist_tipo_cliente,
             x='Tipo de Cliente',
@@ -705,14 +992,13 @@ def display_client_analysis(df_clientes, df_pedidos_detalhes):
         )
         fig_tipo_cliente.update_traces(hovertemplate='<b>Tipo:</b> %{x}<br><b>Contagem:</b> %{y}<extra></extra>')
         with col_tipo_cliente:
-            st.plotly_chart(fig_tipo_cliente, use_container_width=True)
+            plotly_chart(fig_tipo_cliente, use_container_width=True)
     else:
         col_tipo_cliente.info("Dados de clientes ausentes para distribuição por tipo.")
 
-    if not df_pedidos_detalhes.empty:
+    if possui_pedidos:
         # --- 2. Top N Clientes por Valor Total de Compras ---
-        top_clientes_valor = df_pedidos_unicos_para_clientes.groupby('nome_cliente')['valor_total'].sum().nlargest(
-            10).reset_index()
+        top_clientes_valor = agregador.top_clientes(10)
 
         fig_top_clientes_valor = px.bar(
             top_clientes_valor,
@@ -730,7 +1016,7 @@ def display_client_analysis(df_clientes, df_pedidos_detalhes):
             hovertemplate='<b>Cliente:</b> %{y}<br><b>Valor Total:</b> %{x:,.2f} R$<extra></extra>')
 
         with col_top_clientes_valor:
-            st.plotly_chart(fig_top_clientes_valor, use_container_width=True)
+            plotly_chart(fig_top_clientes_valor, use_container_width=True)
     else:
         col_top_clientes_valor.info("Dados de pedidos ausentes para top clientes.")
 
@@ -738,9 +1024,8 @@ def display_client_analysis(df_clientes, df_pedidos_detalhes):
 
     # --- 3. Valor Total de Vendas por Tipo de Cliente ---
     st.markdown("### Valor de Vendas por Tipo de Cliente")
-    if not df_pedidos_unicos_para_clientes.empty:
-        vendas_por_tipo_cliente = df_pedidos_unicos_para_clientes.groupby('tipo_cliente')[
-            'valor_total'].sum().reset_index()
+    if possui_pedidos:
+        vendas_por_tipo_cliente = agregador.vendas_por_tipo_cliente()
         fig_vendas_por_tipo = px.pie(
             vendas_por_tipo_cliente,
             names='tipo_cliente',
@@ -752,7 +1037,7 @@ def display_client_analysis(df_clientes, df_pedidos_detalhes):
         )
         fig_vendas_por_tipo.update_traces(textinfo='percent+label',
                                           hovertemplate='<b>Tipo:</b> %{label}<br><b>Valor:</b> %{value:,.2f} R$ (%{percent})<extra></extra>')
-        st.plotly_chart(fig_vendas_por_tipo, use_container_width=True)
+        plotly_chart(fig_vendas_por_tipo, use_container_width=True)
     else:
         st.info("Nenhum dado de vendas por tipo de cliente disponível.")
 
@@ -794,23 +1079,22 @@ def display_client_analysis(df_clientes, df_pedidos_detalhes):
     st.markdown("---")
 
 
-def display_order_status(df_pedidos_detalhes):
+@st.fragment
+@secao_medida("Status dos pedidos")
+def display_order_status(agregador):
     """
     Exibe a análise e o status dos pedidos com mais detalhes e interatividade.
     """
     st.subheader("Status dos Pedidos")
 
-    if not df_pedidos_detalhes.empty:
-        # Garante que temos apenas uma entrada por pedido para o status
-        df_pedidos_unicos = df_pedidos_detalhes.drop_duplicates(subset=['id_pedido']).copy()
-
+    if agregador.possui_pedidos():
         # --- 1. Filtro de Status ---
         st.markdown("##### Filtrar por Status do Pedido")
-        all_status = df_pedidos_unicos['status_pedido'].unique()
+        all_status = agregador.opcoes('status_pedido')
         selected_status_filter = st.multiselect(
             "Selecione um ou mais status para visualizar:",
-            options=sorted(all_status),
-            default=sorted(all_status),  # Seleciona todos por padrão
+            options=all_status,
+            default=all_status,  # Seleciona todos por padrão
             key="status_order_multiselect"
         )
 
@@ -818,9 +1102,10 @@ def display_order_status(df_pedidos_detalhes):
             st.info("Por favor, selecione ao menos um status para visualizar os dados.")
             return
 
-        df_filtered_by_status = df_pedidos_unicos[df_pedidos_unicos['status_pedido'].isin(selected_status_filter)]
+        # Uma linha por status com contagem de pedidos e valor total
+        status_summary = agregador.resumo_status(selected_status_filter)
 
-        if df_filtered_by_status.empty:
+        if status_summary.empty:
             st.info("Nenhum pedido encontrado para os status selecionados no período filtrado.")
             return
 
@@ -836,8 +1121,8 @@ def display_order_status(df_pedidos_detalhes):
 
         # --- 2. Distribuição de Status de Pedido (Gráfico de Pizza) ---
         with col_pie:
-            status_counts = df_filtered_by_status['status_pedido'].value_counts().reset_index()
-            status_counts.columns = ['Status', 'Contagem']
+            status_counts = status_summary[['status_pedido', 'Total_Pedidos']].rename(
+                columns={'status_pedido': 'Status', 'Total_Pedidos': 'Contagem'})
             fig_status_pedido = px.pie(
                 status_counts,
                 names='Status',
@@ -849,15 +1134,12 @@ def display_order_status(df_pedidos_detalhes):
             )
             fig_status_pedido.update_traces(textinfo='percent+label',
                                             hovertemplate='<b>Status:</b> %{label}<br><b>Contagem:</b> %{value} (%{percent})<extra></extra>')
-            st.plotly_chart(fig_status_pedido, use_container_width=True)
+            plotly_chart(fig_status_pedido, use_container_width=True)
 
         # --- 3. Métricas de Desempenho por Status ---
         with col_metrics:
             st.markdown("##### Métricas por Status")
-            status_summary = df_filtered_by_status.groupby('status_pedido').agg(
-                Total_Pedidos=('id_pedido', 'nunique'),
-                Valor_Total=('valor_total', 'sum')
-            ).reset_index().rename(columns={'status_pedido': 'Status'})
+            status_summary = status_summary.rename(columns={'status_pedido': 'Status'})
 
             if not status_summary.empty:
                 for index, row in status_summary.iterrows():
@@ -891,14 +1173,8 @@ def display_order_status(df_pedidos_detalhes):
         # para usar o df_pedidos_filtrado da barra lateral se quiser.
         # Para este exemplo, vou considerar que o df_pedidos_detalhes já veio pré-filtrado pela data global.
 
-        # Agrupa por mês/ano e status para ver a evolução
-        status_temporal = df_pedidos_detalhes.drop_duplicates(subset=['id_pedido']).groupby([
-            pd.Grouper(key='data_pedido', freq='ME'),
-            'status_pedido'
-        ])['id_pedido'].nunique().reset_index(name='Contagem')
-
-        # Filtra apenas os status selecionados no multiselect
-        status_temporal = status_temporal[status_temporal['status_pedido'].isin(selected_status_filter)]
+        # Agrupa por mês/ano e status para ver a evolução (apenas os status selecionados no multiselect)
+        status_temporal = agregador.status_por_periodo(selected_status_filter, 'ME')
 
         if not status_temporal.empty:
             fig_temporal_status = px.line(
@@ -919,7 +1195,7 @@ def display_order_status(df_pedidos_detalhes):
                 dict(count=1, label="1y", step="year", stepmode="backward"),
                 dict(step="all")
             ]))
-            st.plotly_chart(fig_temporal_status, use_container_width=True)
+            plotly_chart(fig_temporal_status, use_container_width=True)
         else:
             st.info("Nenhum dado de tendência de status para o período e status selecionados.")
 
@@ -928,9 +1204,7 @@ def display_order_status(df_pedidos_detalhes):
         # --- 5. Tabela Detalhada dos Pedidos ---
         st.markdown("### Detalhes dos Pedidos por Status")
         st.dataframe(
-            df_filtered_by_status[[
-                'id_pedido', 'data_pedido', 'nome_cliente', 'valor_total', 'status_pedido'
-            ]].rename(columns={
+            agregador.pedidos_por_status(selected_status_filter).rename(columns={
                 'id_pedido': 'ID Pedido',
                 'data_pedido': 'Data do Pedido',
                 'nome_cliente': 'Cliente',
@@ -949,17 +1223,20 @@ def display_order_status(df_pedidos_detalhes):
         st.info("Dados de pedidos ausentes para a análise de status.")
     st.markdown("---")
 
-def display_payment_analysis(df_pagamentos):
+@st.fragment
+@secao_medida("Pagamentos")
+def display_payment_analysis(agregador):
     """
     Exibe análises relacionadas a pagamentos com mais opções de cores.
     """
     st.subheader("Análise de Pagamentos")
     col_metodo_pagamento, col_status_pagamento, col_pagamento_valor_metodo = st.columns(3)
 
-    if not df_pagamentos.empty:
+    if agregador.possui_pagamentos():
         # --- 1. Distribuição de Métodos de Pagamento ---
-        metodo_pagamento_counts = df_pagamentos['metodo_pagamento'].value_counts().reset_index()
-        metodo_pagamento_counts.columns = ['Método de Pagamento', 'Contagem']
+        pagamentos_por_metodo = agregador.pagamentos_por_metodo()
+        metodo_pagamento_counts = pagamentos_por_metodo[['metodo_pagamento', 'Contagem']].rename(
+            columns={'metodo_pagamento': 'Método de Pagamento'})
 
         # Definir uma paleta de cores para métodos de pagamento
         # Você pode usar paletas pré-definidas do Plotly (e.g., 'Pastel', 'Dark2', 'Set3')
@@ -983,10 +1260,10 @@ def display_payment_analysis(df_pagamentos):
         fig_metodo_pagamento.update_traces(hovertemplate='<b>Método:</b> %{x}<br><b>Contagem:</b> %{y}<extra></extra>')
         fig_metodo_pagamento.update_layout(xaxis_title="Método de Pagamento", yaxis_title="Número de Pagamentos")
         with col_metodo_pagamento:
-            st.plotly_chart(fig_metodo_pagamento, use_container_width=True)
+            plotly_chart(fig_metodo_pagamento, use_container_width=True)
 
         # --- 2. Distribuição de Status de Pagamento ---
-        status_pagamento_counts = df_pagamentos['status_pagamento'].value_counts().reset_index()
+        status_pagamento_counts = agregador.pagamentos_por_status()
         status_pagamento_counts.columns = ['Status', 'Contagem']
 
         # Definir uma paleta de cores para status de pagamento
@@ -1007,10 +1284,10 @@ def display_payment_analysis(df_pagamentos):
         )
         fig_status_pagamento.update_traces(textinfo='percent+label', hovertemplate='<b>Status:</b> %{label}<br><b>Contagem:</b> %{value} (%{percent})<extra></extra>')
         with col_status_pagamento:
-            st.plotly_chart(fig_status_pagamento, use_container_width=True)
+            plotly_chart(fig_status_pagamento, use_container_width=True)
 
         # --- 3. Valor Total Pago por Método de Pagamento ---
-        valor_por_metodo = df_pagamentos.groupby('metodo_pagamento')['valor_pago'].sum().reset_index()
+        valor_por_metodo = pagamentos_por_metodo[['metodo_pagamento', 'valor_pago']]
 
         # Reutilizar o mesmo mapeamento de cores dos métodos de pagamento para consistência
         fig_valor_por_metodo = px.bar(
@@ -1026,26 +1303,81 @@ def display_payment_analysis(df_pagamentos):
         fig_valor_por_metodo.update_traces(hovertemplate='<b>Método:</b> %{x}<br><b>Valor Pago:</b> %{y:,.2f} R$<extra></extra>')
         fig_valor_por_metodo.update_layout(xaxis_title="Método de Pagamento", yaxis_title="Valor Pago (R$)")
         with col_pagamento_valor_metodo:
-            st.plotly_chart(fig_valor_por_metodo, use_container_width=True)
+            plotly_chart(fig_valor_por_metodo, use_container_width=True)
     else:
         st.info("Dados de pagamentos ausentes para esta seção.")
     st.markdown("---")
 
 
-def display_stock_analysis(df_estoque, df_produtos):
+# Colunas da tabela de próximos vencimentos (alerta diário)
+COLUNAS_ALERTA_VALIDADE = ['validade', 'dias_para_vencer', 'nome_produto', 'localizacao', 'lote', 'quantidade_disponivel']
+
+
+def _display_expiry_alerts(indice_validade, hoje):
+    """
+    Alerta diário de vencimento: lotes vencidos e a vencer em 7/30 dias (contagens do índice)
+    e os próximos N lotes a vencer por produto ou localização.
+    """
+    st.markdown("##### Alerta de Vencimento")
+    vencidos = indice_validade.contar(None, hoje)
+    em_7_dias = indice_validade.contar(hoje, hoje + timedelta(days=7))
+    em_30_dias = indice_validade.contar(hoje, hoje + timedelta(days=30))
+    col_vencidos, col_7_dias, col_30_dias = st.columns(3)
+    col_vencidos.metric("Lotes vencidos", f"{vencidos[0]:n}", f"{vencidos[1]:n} em estoque", delta_color="off")
+    col_7_dias.metric("Vencem em 7 dias", f"{em_7_dias[0]:n}", f"{em_7_dias[1]:n} em estoque", delta_color="off")
+    col_30_dias.metric("Vencem em 30 dias", f"{em_30_dias[0]:n}", f"{em_30_dias[1]:n} em estoque",
+                       delta_color="off")
+
+    col_agrupamento, col_quantidade = st.columns([2, 1])
+    with col_agrupamento:
+        agrupamento = st.radio("Próximos vencimentos por:", ('Produto', 'Localização'), horizontal=True,
+                               key="stock_alert_group")
+    with col_quantidade:
+        lotes_por_grupo = st.number_input("Lotes por grupo", min_value=1, max_value=20, value=3, step=1,
+                                          key="stock_alert_n")
+    coluna_grupo = 'nome_produto' if agrupamento == 'Produto' else 'localizacao'
+    proximos = indice_validade.proximos(hoje, int(lotes_por_grupo), por=coluna_grupo)
+    if proximos.empty:
+        st.success("Nenhum lote a vencer.")
+        return
+    st.dataframe(
+        proximos[COLUNAS_ALERTA_VALIDADE],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "validade": st.column_config.DateColumn("Data de Validade", format="DD/MM/YYYY"),
+            "dias_para_vencer": st.column_config.NumberColumn("Dias Para Vencer"),
+            "nome_produto": "Produto",
+            "localizacao": "Localização",
+            "lote": "Lote",
+            "quantidade_disponivel": "Quantidade",
+        }
+    )
+
+
+@st.fragment
+@secao_medida("Estoque")
+def display_stock_analysis(df_estoque, df_produtos, indice_validade):
     """
     Exibe análises relacionadas ao estoque com um seletor de data específico.
+    Faixas de validade, contagens e próximos vencimentos saem do índice de validade
+    (models/indice_validade.py), sem recalcular os dias para vencer do estoque inteiro.
     """
     st.subheader("Análise de Estoque")
 
     if not df_estoque.empty:
+        hoje = pd.Timestamp(datetime.now().date())
+        _display_expiry_alerts(indice_validade, hoje)
+
+        min_validade_available, max_validade_available = indice_validade.limites()
+        if min_validade_available is None:
+            st.info("Nenhum item de estoque com data de validade.")
+            st.markdown("---")
+            return
+
         # --- Adicionar Seletor de Data para Análise de Validade do Estoque ---
         st.markdown("##### Filtrar Estoque por Período de Validade")
 
-        # Encontra as datas mínimas e máximas de validade disponíveis nos dados
-        min_validade_available = df_estoque['validade'].min().date()
-        max_validade_available = df_estoque['validade'].max().date()
-
         col_date_start, col_date_end = st.columns(2)
         with col_date_start:
             # Garante que a data de início não seja maior que a data de fim no valor padrão
@@ -1073,11 +1405,9 @@ def display_stock_analysis(df_estoque, df_produtos):
                 "A 'Data de Início da Validade' não pode ser posterior à 'Data de Fim da Validade'. Por favor, ajuste as datas.")
             return  # Sai da função para evitar erros nos cálculos subsequentes
 
-        # Filtrar o DataFrame de estoque com base nas datas selecionadas
-        df_estoque_filtered = df_estoque[
-            (df_estoque['validade'].dt.date >= selected_start_validade) &
-            (df_estoque['validade'].dt.date <= selected_end_validade)
-            ].copy()  # Use .copy() para evitar SettingWithCopyWarning
+        # Filtrar o estoque com base nas datas selecionadas (slice do índice, sem cópia; fim inclusive)
+        periodo_validade = (selected_start_validade, selected_end_validade + timedelta(days=1))
+        df_estoque_filtered = indice_validade.faixa(dentro=periodo_validade)
 
         if df_estoque_filtered.empty:
             st.info("Nenhum item de estoque encontrado para o período de validade selecionado.")
@@ -1086,7 +1416,7 @@ def display_stock_analysis(df_estoque, df_produtos):
         col_estoque_produto, col_estoque_validade = st.columns(2)
 
         # Quantidade de Estoque por Produto (usando df_estoque_filtered)
-        estoque_por_produto = df_estoque_filtered.groupby('nome_produto')['quantidade_disponivel'].sum().nlargest(
+        estoque_por_produto = df_estoque_filtered.groupby('nome_produto', observed=True)['quantidade_disponivel'].sum().nlargest(
             10).reset_index()
         fig_estoque_produto = px.bar(estoque_por_produto, x='quantidade_disponivel', y='nome_produto',
                                      title='Top 10 Produtos Mais Estocados (no período filtrado)',
@@ -1097,27 +1427,13 @@ def display_stock_analysis(df_estoque, df_produtos):
         fig_estoque_produto.update_traces(
             hovertemplate='<b>Produto:</b> %{y}<br><b>Quantidade:</b> %{x}<extra></extra>')
         with col_estoque_produto:
-            st.plotly_chart(fig_estoque_produto, use_container_width=True)
+            plotly_chart(fig_estoque_produto, use_container_width=True)
 
         # Estoque por Validade (aplica-se a df_estoque_filtered)
-        hoje = pd.to_datetime(datetime.now().date())
-        df_estoque_filtered['dias_para_vencer'] = (df_estoque_filtered['validade'] - hoje).dt.days
-
-        bins = [-float('inf'), 30, 60, float('inf')]
+        # Faixas de dias para vencer: [< 30), [30, 60), [>= 60), contadas pelo índice (buscas binárias)
+        limites_dias = [30, 60]
         labels = [ 'Vence em até 30 dias', 'Vence em 30-60 dias', 'Vence em mais de 60 dias']
-        # Usar df_estoque_filtered aqui para o corte
-        df_estoque_filtered['status_validade'] = pd.cut(df_estoque_filtered['dias_para_vencer'], bins=bins,
-                                                        labels=labels, right=False, ordered=False)
-
-        # Resumo da validade (usando df_estoque_filtered)
-        # AQUI ESTÁ A CORREÇÃO: Adicionando o parâmetro 'observed=False'
-        # e garantindo que 'status_validade' seja uma categoria para Plotly não reclamar
-        resumo_validade = df_estoque_filtered.groupby('status_validade', observed=False)[
-            'quantidade_disponivel'].sum().reset_index()
-        # Garante a ordem das categorias no gráfico
-        resumo_validade['status_validade'] = pd.Categorical(resumo_validade['status_validade'], categories=labels,
-                                                            ordered=True)
-        resumo_validade = resumo_validade.sort_values('status_validade')
+        resumo_validade = indice_validade.resumo_faixas(hoje, limites_dias, labels, dentro=periodo_validade)
 
         mapa_cores = {
 
@@ -1139,7 +1455,7 @@ def display_stock_analysis(df_estoque, df_produtos):
         fig_estoque_validade.update_traces(
             hovertemplate='<b>Status:</b> %{x}<br><b>Quantidade:</b> %{y}<extra></extra>')
         with col_estoque_validade:
-            st.plotly_chart(fig_estoque_validade, use_container_width=True)
+            plotly_chart(fig_estoque_validade, use_container_width=True)
 
         # --- 3. Permitir Análise Detalhada (Drill-down) ---
         st.write("---")
@@ -1152,9 +1468,12 @@ def display_stock_analysis(df_estoque, df_produtos):
             key="status_validade_detail"  # Chave única para o widget
         )
 
-        # Usa df_estoque_filtered para o drill-down
-        df_detalhes_validade = df_estoque_filtered[
-            df_estoque_filtered['status_validade'] == status_selecionado].sort_values('dias_para_vencer')
+        # Drill-down: a faixa do status dentro do período é um slice contíguo (estoque ordenado pela validade)
+        inicio_status, fim_status = indice_validade.bordas_faixas(hoje, limites_dias)[labels.index(status_selecionado)]
+        df_status = indice_validade.faixa(inicio_status, fim_status, dentro=periodo_validade)
+        df_detalhes_validade = df_status[['nome_produto', 'quantidade_disponivel', 'validade']].assign(
+            dias_para_vencer=(df_status['validade'] - hoje).dt.days
+        )
 
         if not df_detalhes_validade.empty:
             st.dataframe(
@@ -1176,6 +1495,8 @@ def display_stock_analysis(df_estoque, df_produtos):
     st.markdown("---")
 
 
+@st.fragment
+@secao_medida("Tipos de corte")
 def display_products_by_cut_type(df_produtos):
     """
     Exibe a tabela de produtos com filtro por tipo de corte e métricas de margem.
@@ -1189,7 +1510,7 @@ def display_products_by_cut_type(df_produtos):
             key='filtro_corte_tabela_unica'
         )
 
-        df_exibir = df_produtos.copy()
+        df_exibir = df_produtos
         if tipo_selecionado != 'Todos':
             df_exibir = df_exibir[df_exibir['tipo_corte'] == tipo_selecionado]
 
@@ -1204,11 +1525,13 @@ def display_products_by_cut_type(df_produtos):
         col3.metric("Preço Mais Alto", format_currency_br(preco_max))
         st.write("---")
 
-        df_exibir['Margem (R$)'] = df_exibir['preco_venda'] - df_exibir['preco_compra']
-        df_exibir['Margem (%)'] = 0.0
-        mask = df_exibir['preco_venda'] > 0
-        df_exibir.loc[mask, 'Margem (%)'] = (df_exibir['Margem (R$)'] / df_exibir['preco_venda']) * 100
-        df_exibir['Valor (R$)'] = df_exibir['preco_venda']
+        # assign cria as colunas de margem sem copiar nem alterar o df_produtos compartilhado
+        margem = df_exibir['preco_venda'] - df_exibir['preco_compra']
+        df_exibir = df_exibir.assign(**{
+            'Margem (R$)': margem,
+            'Margem (%)': (margem / df_exibir['preco_venda'] * 100).where(df_exibir['preco_venda'] > 0, 0.0),
+            'Valor (R$)': df_exibir['preco_venda'],
+        })
 
         st.markdown(f"**Produtos para: {tipo_selecionado}**")
         st.dataframe(
@@ -1253,7 +1576,8 @@ QUERY_PEDIDOS_DETALHES = """
                                 prod.tipo_corte, \
                                 ip.quantidade, \
                                 ip.unidade_medida, \
-                                ip.preco_unitario
+                                ip.preco_unitario, \
+                                COALESCE(ip.lucro_item, 0) AS lucro_item
                          FROM tb_pedido p
                                   JOIN tb_cliente c ON p.id_cliente = c.id_cliente
                                   JOIN tb_item_pedido ip ON p.id_pedido = ip.id_pedido
@@ -1261,6 +1585,38 @@ QUERY_PEDIDOS_DETALHES = """
                          ORDER BY p.data_pedido; \
                          """
 
+# Delta da carga incremental: itens gravados/alterados desde %(desde)s ou de pedidos alterados
+# (status, valor) desde então. Cada lado usa o índice de atualizado_em.
+QUERY_PEDIDOS_DETALHES_DELTA = """
+                               SELECT p.id_pedido, \
+                                      p.data_pedido, \
+                                      p.status AS status_pedido, \
+                                      p.valor_total, \
+                                      c.nome_cliente, \
+                                      c.tipo_cliente, \
+                                      ip.id_item_pedido, \
+                                      ip.id_produto, \
+                                      prod.nome_produto, \
+                                      prod.tipo_corte, \
+                                      ip.quantidade, \
+                                      ip.unidade_medida, \
+                                      ip.preco_unitario, \
+                                      COALESCE(ip.lucro_item, 0) AS lucro_item
+                               FROM tb_pedido p
+                                        JOIN tb_cliente c ON p.id_cliente = c.id_cliente
+                                        JOIN tb_item_pedido ip ON p.id_pedido = ip.id_pedido
+                                        JOIN tb_produto prod ON ip.id_produto = prod.id_produto
+                               WHERE ip.id_item_pedido IN (SELECT id_item_pedido
+                                                           FROM tb_item_pedido
+                                                           WHERE atualizado_em > %(desde)s
+                                                           UNION
+                                                           SELECT ip2.id_item_pedido
+                                                           FROM tb_pedido p2
+                                                                    JOIN tb_item_pedido ip2 ON p2.id_pedido = ip2.id_pedido
+                                                           WHERE p2.atualizado_em > %(desde)s)
+                               ORDER BY p.data_pedido; \
+                               """
+
 QUERY_CLIENTES = """
                  SELECT id_cliente, \
                         nome_cliente, \
@@ -1298,6 +1654,30 @@ QUERY_PAGAMENTOS = """
                    ORDER BY pa.data_pagamento; \
                    """
 
+# Delta da carga incremental: pagamentos gravados/alterados ou de pedidos alterados desde %(desde)s
+QUERY_PAGAMENTOS_DELTA = """
+                         SELECT pa.id_pagamento, \
+                                pa.id_pedido, \
+                                pa.data_pagamento, \
+                                pa.valor_pago, \
+                                pa.metodo_pagamento, \
+                                pa.status       AS status_pagamento, \
+                                ped.data_pedido, \
+                                ped.status      AS status_pedido, \
+                                ped.valor_total AS valor_total_pedido
+                         FROM tb_pagamento pa
+                                  JOIN tb_pedido ped ON pa.id_pedido = ped.id_pedido
+                         WHERE pa.id_pagamento IN (SELECT id_pagamento
+                                                   FROM tb_pagamento
+                                                   WHERE atualizado_em > %(desde)s
+                                                   UNION
+                                                   SELECT pa2.id_pagamento
+                                                   FROM tb_pedido ped2
+                                                            JOIN tb_pagamento pa2 ON ped2.id_pedido = pa2.id_pedido
+                                                   WHERE ped2.atualizado_em > %(desde)s)
+                         ORDER BY pa.data_pagamento; \
+                         """
+
 QUERY_ESTOQUE = """
                 SELECT e.id_estoque, \
                        e.quantidade_disponivel, \
@@ -1338,15 +1718,41 @@ def show():
     st.title("📊 Dashboard de Vendas de Carnes")
     st.markdown("Uma visão geral dos dados populados do sistema de gerenciamento de carnes.")
 
-    # --- Carrega os DataFrames ---
-    with st.spinner("Carregando dados do banco de dados..."):
-        df_pedidos_detalhes = load_data_from_db(QUERY_PEDIDOS_DETALHES, "pedidos e itens")
-        df_clientes = load_data_from_db(QUERY_CLIENTES, "clientes")
-        df_produtos = load_data_from_db(QUERY_PRODUTOS, "produtos")
-        df_pagamentos = load_data_from_db(QUERY_PAGAMENTOS, "pagamentos")
-        df_estoque = load_data_from_db(QUERY_ESTOQUE, "estoque")
+    fonte_sql = DASHBOARD_FONTE == 'sql'
+
+    # Modo diagnóstico: a chave da barra lateral (criada mais abaixo) prevalece sobre ?diagnostico=1
+    diagnostico_url = st.query_params.get("diagnostico", "").lower() in ("1", "true", "sim")
+    diagnostico = st.session_state.get("dashboard_diagnostico", diagnostico_url)
+    st.session_state["dashboard_medidor"] = (
+        MedidorRender(st.session_state.setdefault("dashboard_sessao", uuid.uuid4().hex[:8])) if diagnostico else None
+    )
 
-    if (df_pedidos_detalhes.empty and
+    # --- Carrega e prepara os DataFrames (em cache por versão dos dados) ---
+    with st.spinner("Carregando dados do banco de dados..."), _secao_diagnostico("Carga dos dados"), \
+            medir('espera_dados'):
+        data_version = get_data_version()
+        try:
+            dados = load_prepared_data(data_version, fonte_sql)
+        except OperationalError as e:
+            st.error(f"Erro ao conectar ao banco de dados: {e}")
+            if st.button("Tentar novamente", key="dashboard_retry"):
+                st.rerun()
+            st.stop()
+        df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, df_estoque = dados.visoes(DATASETS_DASHBOARD)
+        relatorio_carga = dados.relatorio_carga
+
+    # Carga parcial: as seções com dados aparecem; o botão descarta o cache e consulta de novo
+    falhas = relatorio_carga[relatorio_carga['status'] != 'ok']
+    if not falhas.empty:
+        for consulta, status in zip(falhas['consulta'], falhas['status']):
+            st.error(f"Erro na consulta {consulta}: {status.removeprefix('erro: ')}")
+        if st.button("Recarregar dados", key="dashboard_reload"):
+            load_prepared_data.clear()
+            get_connection_pool.clear()
+            st.rerun()
+
+    if (not fonte_sql and
+            df_pedidos_detalhes.empty and
             df_clientes.empty and
             df_produtos.empty and
             df_pagamentos.empty and
@@ -1354,16 +1760,19 @@ def show():
         st.warning("Nenhum dado foi carregado do banco. Verifique a conexão e população do banco.")
         st.stop()
 
-    # --- Preparação e Cálculos Iniciais ---
-    df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, df_estoque = \
-        prepare_data(df_pedidos_detalhes, df_clientes, df_produtos, df_pagamentos, df_estoque)
-
     # --- Barra Lateral para Filtros Globais ---
     st.sidebar.header("Filtros de Período")
-    min_date_available = df_pedidos_detalhes[
-        'data_pedido'].min().date() if not df_pedidos_detalhes.empty else datetime.now().date()
-    max_date_available = df_pedidos_detalhes[
-        'data_pedido'].max().date() if not df_pedidos_detalhes.empty else datetime.now().date()
+    if fonte_sql:
+        min_date_available, max_date_available = AgregadorSQL.intervalo_datas()
+        min_date_available = min_date_available or datetime.now().date()
+        max_date_available = max_date_available or datetime.now().date()
+    else:
+        # Recortes por período via busca binária nos DataFrames ordenados por data
+        filtro_pedidos = FiltroTemporal(df_pedidos_detalhes, 'data_pedido')
+        filtro_pagamentos = FiltroTemporal(df_pagamentos, 'data_pagamento')
+        min_date_available, max_date_available = filtro_pedidos.limites()
+        min_date_available = min_date_available or datetime.now().date()
+        max_date_available = max_date_available or datetime.now().date()
 
     # Ajusta min/max para garantir que data_input não dê erro se o DF estiver vazio
     if min_date_available > max_date_available:  # Caso só tenha um dia de dados ou dados inválidos
@@ -1405,28 +1814,96 @@ def show():
         start_date = end_date - timedelta(days=1) if end_date > min_date_available else min_date_available
         st.sidebar.info(f"Ajustando data de início para {start_date.strftime('%d/%m/%Y')}.")
 
-    # Filtrar dataframes globais com base nos filtros da barra lateral, se aplicável
-    df_pedidos_filtrado = df_pedidos_detalhes[
-        (df_pedidos_detalhes['data_pedido'].dt.date >= start_date) &
-        (df_pedidos_detalhes['data_pedido'].dt.date <= end_date)
-        ]
-    df_pagamentos_filtrado = df_pagamentos[
-        (df_pagamentos['data_pagamento'].dt.date >= start_date) &
-        (df_pagamentos['data_pagamento'].dt.date <= end_date)
-        ]
+    st.sidebar.toggle("Modo diagnóstico", value=diagnostico_url, key="dashboard_diagnostico",
+                      help="Mede o tempo de cada seção (espera por dados, cálculo, figuras e envio) "
+                           "e grava as medições num log local.")
+
+    if fonte_sql:
+        # Período e filtros vão como parâmetros das consultas agregadas
+        agregador = AgregadorSQL(start_date, end_date)
+    else:
+        # Filtrar dataframes globais com base nos filtros da barra lateral (slices, sem cópia)
+        df_pedidos_filtrado = filtro_pedidos.periodo(start_date, end_date)
+        df_pagamentos_filtrado = filtro_pagamentos.periodo(start_date, end_date)
+        # KPIs e gráficos saem do cubo; os DataFrames filtrados atendem o que depende do cliente
+        with _secao_diagnostico("Cubo de vendas"), medir('espera_dados'):
+            cubo = load_sales_cube(data_version)
+        agregador = AgregadorCubo(cubo, start_date, end_date, df_pedidos_filtrado, df_pagamentos_filtrado)
 
     # O df_estoque e df_produtos não são filtrados por data diretamente em seus KPIs principais
     # mas podem ser filtrados em seções específicas se necessário.
 
     # --- Exibição das Seções do Dashboard ---
-    display_kpis(df_pedidos_filtrado, df_clientes)  # KPIs agora usam dados filtrados
-    display_sales_trends(df_pedidos_detalhes, start_date, end_date)  # Gráficos de tendência usam filtros de data
-    display_product_analysis(df_pedidos_filtrado, df_produtos)  # Análise de produtos também usa dados filtrados
-    display_client_analysis(df_clientes, df_pedidos_filtrado)  # Análise de clientes também usa dados filtrados
-    display_order_status(df_pedidos_filtrado)  # Status de pedidos usa dados filtrados
-    display_payment_analysis(df_pagamentos_filtrado)  # Análise de pagamentos usa dados filtrados
-    display_stock_analysis(df_estoque, df_produtos)  # Análise de estoque não é diretamente por data de pedido/pagamento
-    display_products_by_cut_type(df_produtos)  # Análise de produtos por tipo de corte é estática por produto
+    # Cada display_* é um fragmento: widgets de uma seção reexecutam só aquela seção.
+    # As abas rodam com estado (on_change="rerun"), então só a aba aberta é calculada.
+    display_kpis(agregador, df_clientes)  # KPIs agora usam dados filtrados
+
+    aba_vendas, aba_produtos, aba_clientes, aba_pedidos, aba_estoque, aba_cortes = st.tabs(
+        ["Vendas", "Produtos", "Clientes", "Pedidos e Pagamentos", "Estoque", "Tipos de Corte"],
+        key="dashboard_aba", on_change="rerun"
+    )
+    if aba_vendas.open:
+        with aba_vendas:
+            display_sales_trends(agregador)  # Gráficos de tendência usam filtros de data
+    if aba_produtos.open:
+        with aba_produtos:
+            display_product_analysis(agregador, df_produtos)  # Análise de produtos também usa dados filtrados
+            display_item_grid(agregador, start_date, end_date)  # Tabela paginada no banco
+    if aba_clientes.open:
+        with aba_clientes:
+            display_client_analysis(df_clientes, agregador)  # Análise de clientes também usa dados filtrados
+    if aba_pedidos.open:
+        with aba_pedidos:
+            display_order_status(agregador)  # Status de pedidos usa dados filtrados
+            display_payment_analysis(agregador)  # Análise de pagamentos usa dados filtrados
+    if aba_estoque.open:
+        with aba_estoque:
+            with _secao_diagnostico("Índice de validade"), medir('espera_dados'):
+                indice_validade = load_expiry_index(data_version, fonte_sql)
+            display_stock_analysis(df_estoque, df_produtos, indice_validade)  # Análise de estoque não é diretamente por data de pedido/pagamento
+    if aba_cortes.open:
+        with aba_cortes:
+            display_products_by_cut_type(df_produtos)  # Análise de produtos por tipo de corte é estática por produto
+
+    with st.expander("Carga e uso de memória dos dados"):
+        st.markdown("##### Consultas da última carga (em paralelo)")
+        st.dataframe(
+            relatorio_carga,
+            hide_index=True,
+            column_config={"segundos": st.column_config.NumberColumn("Tempo (s)", format="%.3f")}
+        )
+        st.markdown("##### Memória por conjunto de dados")
+        st.dataframe(
+            relatorio_memoria(dict(zip(DATASETS_DASHBOARD, (df_pedidos_detalhes, df_clientes, df_produtos,
+                                                             df_pagamentos, df_estoque)))),
+            hide_index=True,
+            column_config={"memoria_mb": st.column_config.NumberColumn("Memória (MB)", format="%.2f")}
+        )
+
+    medidor = _medidor_sessao()
+    if medidor is not None:
+        colunas_tempo = {
+            coluna: st.column_config.NumberColumn(rotulo, format="%.3f")
+            for coluna, rotulo in (('total_s', "Total (s)"), ('espera_dados_s', "Espera por dados (s)"),
+                                   ('calculo_s', "Cálculo (s)"), ('figuras_s', "Figuras (s)"),
+                                   ('envio_s', "Envio (s)"))
+        }
+        with st.expander("Diagnóstico de desempenho", expanded=True):
+            st.markdown("##### Esta execução")
+            st.caption("Seções das abas fechadas não rodam. Reexecuções de uma seção isolada (widgets dentro dela) "
+                       "vão só para o log.")
+            st.dataframe(
+                medidor.tabela(),
+                hide_index=True,
+                column_config={**colunas_tempo,
+                               "payload_kb": st.column_config.NumberColumn("Payload (KB)", format="%.1f")}
+            )
+            st.markdown(f"##### Histórico do log local (`{medidor.arquivo_log}`)")
+            resumo = resumo_log(medidor.arquivo_log)
+            if resumo.empty:
+                st.info("Nenhuma medição registrada ainda.")
+            else:
+                st.dataframe(resumo, hide_index=True)
 
     st.markdown("---")
     st.write("Dados atualizados automaticamente. Última atualização: " + datetime.now().strftime("%H:%M:%S"))
\ No newline at end of file
@@ -10,59 +10,111 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
 from statsmodels.tsa.seasonal import seasonal_decompose
 
 from datetime import datetime, timedelta
 import locale  # Importa módulo locale para formatação numérica
-from minio import Minio
+from models.dados_externos import CacheExterno
+from models.modelos_externos import (
+    prophet_ok, avaliar_kmeans, avaliar_prophet, avaliar_random_forest, treinar_cluster_volume,
+    treinar_clusters_pca, treinar_prophet_anomalias, treinar_prophet_previsao, treinar_random_forest,
+    treinar_regressao_anual, treinar_tendencia_linear,
+)
+from models.registro_modelos import RegistroModelos
+from models.treino_segundo_plano import ESTADOS_FINAIS, EXPIRADO, ERRO, FilaTreinos
+from models.varredura_modelos import grade, varrer
 
 
-minio_client = Minio(
-    endpoint='localhost:9000',
-    access_key='minioadmin',
-    secret_key='minioadmin',
-    secure=False
-)
+# Colunas do SIGSIF (df1_agro_gov) usadas pela página
+COLUNAS_ABATES = ['ANO', 'MES', 'UF_PROCEDENCIA', 'MUNICIPIO_PROCEDENCIA', 'CATEGORIA', 'QUANTIDADE']
+# Anos (a partir do mais recente) usados nas clusterizações
+ANOS_RECENTES = 5
+# Grades das buscas de hiperparâmetros
+GRADE_RANDOM_FOREST = grade(n_estimators=[50, 100, 200], max_depth=[None, 10, 20])
+GRADE_PROPHET = grade(seasonality_mode=['additive', 'multiplicative'], changepoint_prior_scale=[0.01, 0.05, 0.5])
 
-bucket = 'fornecedor-dados'
 
-def download_df_from_minio(filename, minio_client, bucket):
+@st.cache_resource
+def cache_dados_externos():
     """
-    Download de CSV do MinIO e retorna como DataFrame.
+    Conjuntos do MinIO (df_cepea, df1/df2/df3_agro_gov) compartilhados pelas sessões do processo.
+    Nada é baixado no import: cada conjunto vem no primeiro uso e é renovado em segundo plano
+    quando o ETag do objeto no bucket muda.
     """
-    response = minio_client.get_object(bucket, filename)
-    df = pd.read_csv(response, sep=',')
-    response.close()
-    response.release_conn()
-    
-    print(f"Arquivo {filename} baixado com sucesso do bucket {bucket}.")
-    return df
+    return CacheExterno()
+
+
+@st.cache_resource
+def registro_modelos():
+    """Modelos ajustados do relatório por impressão digital dos dados + parâmetros (memória, disco e MinIO)."""
+    return RegistroModelos()
+
+
+@st.cache_resource
+def fila_treinos():
+    """Treinos pesados (Random Forest, Prophet, DB score) em processos separados, com limite por worker."""
+    return FilaTreinos(registro_modelos())
+
+
+def _situacao_treino(job, resultado):
+    """Avisa quando o que aparece na seção não é o resultado dos dados atuais."""
+    if job.estado in (ERRO, EXPIRADO):
+        st.warning(f"Treino {job.id} {job.estado}: {job.erro}")
+    elif job.estado not in ESTADOS_FINAIS:
+        if resultado is None:
+            st.info(f"Treinando em segundo plano ({job.estado})... o resultado aparece aqui quando ficar pronto.")
+        else:
+            st.caption(f"Resultado anterior. Treino com os dados atuais {job.estado} em segundo plano.")
+
 
-df_cepea = download_df_from_minio('csv_exports/df_cepea.csv', minio_client, bucket)
-df1_agro_gov = download_df_from_minio('csv_exports/df1_agro_gov.csv', minio_client, bucket) # Esse aqui
-df2_agro_gov = download_df_from_minio('csv_exports/df2_agro_gov.csv', minio_client, bucket)
-df3_agro_gov = download_df_from_minio('csv_exports/df3_agro_gov.csv', minio_client, bucket)
+@st.fragment(run_every=2)
+def _acompanhar_treinos(ids):
+    """Consulta os jobs da página e roda a página de novo quando todos terminam."""
+    pendentes = fila_treinos().pendentes(ids)
+    if not pendentes:
+        st.rerun(scope="app")
+    st.caption("Treinos em segundo plano: " + ", ".join(f"{job.nome} ({job.estado})" for job in pendentes))
 
-df = df1_agro_gov
 
-# Prophet pode não estar instalado em todos os ambientes
-try:
-    from prophet import Prophet
-    prophet_ok = True
-except ImportError:
-    prophet_ok = False
+def _varredura(fila, jobs, nome, avaliar, dados, pontos, ordenar_por, titulo):
+    """Submete a varredura como job de treino e mostra o ranking (o anterior enquanto recalcula)."""
+    resultado, job = fila.resultado(nome, varrer, dados,
+                                    {'avaliar': avaliar, 'pontos': pontos, 'ordenar_por': ordenar_por})
+    jobs.append(job)
+    _situacao_treino(job, resultado)
+    if resultado is not None:
+        st.write(titulo)
+        st.dataframe(resultado['ranking'], hide_index=True)
+        st.caption("Melhor: " + ", ".join(f"{chave}={valor}" for chave, valor in resultado['melhor'].items()))
+    return resultado
+
+
+def _mostrar_metricas(metricas):
+    st.write(f"MAE: {metricas['MAE']:,.2f}")
+    st.write(f"RMSE: {metricas['RMSE']:.2f}")
+    st.write(f"R²: {metricas['R2']:.2f}")
+
 
 def show():
     st.title("Relatório Externo - Análise de Dados Agropecuários")
 
-    # df já está carregado do MinIO
+    cache = cache_dados_externos()
+    with st.spinner("Carregando dados externos..."):
+        df = cache.obter('df1_agro_gov', colunas=COLUNAS_ABATES)
+    if df is None:
+        st.error("Não foi possível carregar os dados externos do MinIO (e não há cópia local).")
+        return
+    etag, idade, desatualizado = cache.info('df1_agro_gov')
+    st.caption(f"Versão dos dados: {etag[:12]} • conferida há {int(idade)} s")
+    if desatualizado:
+        st.warning("MinIO indisponível: exibindo a última cópia local dos dados.")
+    registro = registro_modelos()
+    fila = fila_treinos()
+    jobs = []
+
     st.header("Visualização inicial dos dados")
     st.write("Colunas e primeiras linhas:")
     st.dataframe(df.head(10))
@@ -134,37 +186,22 @@ def show():
 
     # Random Forest (sem normalização)
     st.header("Random Forest para Previsão de QUANTIDADE")
-    df_ml = df_agg.copy()
-    df_ml["ANO"] = df_ml["DATA"].dt.year
-    df_ml["MES"] = df_ml["DATA"].dt.month
-    df_ml = pd.get_dummies(df_ml, columns=["UF_PROCEDENCIA", "CATEGORIA"], drop_first=True)
-    X = df_ml.drop(columns=["QUANTIDADE", "DATA"])
-    y = df_ml["QUANTIDADE"]
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
-    model_rf = RandomForestRegressor(n_estimators=100, random_state=42)
-    model_rf.fit(X_train, y_train)
-    y_pred_rf = model_rf.predict(X_test)
-    st.write("Random Forest")
-    st.write(f"MAE: {mean_absolute_error(y_test, y_pred_rf):,.2f}")
-    st.write(f"RMSE: {np.sqrt(mean_squared_error(y_test, y_pred_rf)):.2f}")
-    st.write(f"R²: {r2_score(y_test, y_pred_rf):.2f}")
+    resultado_rf, job = fila.resultado('random_forest', treinar_random_forest, df_agg,
+                                       {'n_estimators': 100, 'random_state': 42})
+    jobs.append(job)
+    _situacao_treino(job, resultado_rf)
+    if resultado_rf is not None:
+        st.write("Random Forest")
+        _mostrar_metricas(resultado_rf['metricas'])
+    if st.toggle("Buscar hiperparâmetros do Random Forest", key="externo_busca_rf"):
+        _varredura(fila, jobs, 'varredura_random_forest', avaliar_random_forest, df_agg, GRADE_RANDOM_FOREST,
+                   'RMSE', "Configurações do Random Forest por RMSE no teste (menor é melhor):")
 
     # Regressão Linear (com normalização)
     st.header("Regressão Linear para Previsão Anual até 2030")
     df_ano = df.groupby('ANO')['QUANTIDADE'].sum().reset_index()
-    df_ano['TimeIndex'] = np.arange(len(df_ano))
-    X_lr = df_ano[['TimeIndex']]
-    y_lr = df_ano['QUANTIDADE']
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X_lr)
-    model = LinearRegression()
-    model.fit(X_scaled, y_lr)
-    ano_max = df_ano['ANO'].max()
-    anos_futuros = np.arange(ano_max + 1, 2031)
-    time_index_futuro = np.arange(len(df_ano), len(df_ano) + len(anos_futuros)).reshape(-1, 1)
-    time_index_futuro_scaled = scaler.transform(time_index_futuro)
-    y_pred_futuro = model.predict(time_index_futuro_scaled)
-    df_proj = pd.DataFrame({'ANO': anos_futuros, 'QUANTIDADE_PREDITA': y_pred_futuro.astype(int)})
+    resultado_lr = registro.obter_ou_treinar('regressao_anual', treinar_regressao_anual, df_ano)
+    df_proj = resultado_lr['projecao']
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.plot(df_ano['ANO'], df_ano['QUANTIDADE'], label='Histórico')
     ax.plot(df_proj['ANO'], df_proj['QUANTIDADE_PREDITA'], '--', label='Previsão até 2030')
@@ -174,41 +211,48 @@ def show():
     ax.legend()
     ax.grid(True)
     st.pyplot(fig)
-    y_pred_hist = model.predict(X_scaled)
     st.write("Avaliação nos dados históricos:")
-    st.write(f"MAE: {mean_absolute_error(y_lr, y_pred_hist):,.2f}")
-    st.write(f"RMSE: {np.sqrt(mean_squared_error(y_lr, y_pred_hist)):.2f}")
-    st.write(f"R²: {r2_score(y_lr, y_pred_hist):.2f}")
+    _mostrar_metricas(resultado_lr['metricas'])
 
     # Prophet (série temporal)
     if prophet_ok:
         st.header("Previsão de Série Temporal com Prophet")
         df_prophet = df_agg.groupby("DATA")["QUANTIDADE"].sum().reset_index()
         df_prophet.columns = ["ds", "y"]
-        modelo_prophet = Prophet()
-        modelo_prophet.fit(df_prophet)
-        futuro = modelo_prophet.make_future_dataframe(periods=12, freq="MS")
-        forecast = modelo_prophet.predict(futuro)
-        fig1 = modelo_prophet.plot(forecast)
-        st.pyplot(fig1)
-        fig2 = modelo_prophet.plot_components(forecast)
-        st.pyplot(fig2)
+        resultado_prophet, job = fila.resultado('prophet_previsao', treinar_prophet_previsao,
+                                                df_prophet, {'periodos': 12})
+        jobs.append(job)
+        _situacao_treino(job, resultado_prophet)
+        if resultado_prophet is not None:
+            modelo_prophet, forecast = resultado_prophet['modelo'], resultado_prophet['previsao']
+            fig1 = modelo_prophet.plot(forecast)
+            st.pyplot(fig1)
+            fig2 = modelo_prophet.plot_components(forecast)
+            st.pyplot(fig2)
+        if st.toggle("Comparar configurações de sazonalidade do Prophet", key="externo_busca_prophet"):
+            _varredura(fila, jobs, 'varredura_prophet', avaliar_prophet, df_prophet, GRADE_PROPHET,
+                       'MAE', "Prophet por MAE nos últimos 12 meses (menor é melhor):")
     else:
         st.info("Prophet não está instalado. Pulei a previsão de série temporal.")
 
+    # Últimos anos para as clusterizações: só essas partições (e colunas) são lidas
+    anos = cache.valores_particao('df1_agro_gov', 'ANO') or [df["ANO"].max()]
+    df_recente = cache.obter('df1_agro_gov', colunas=['UF_PROCEDENCIA', 'CATEGORIA', 'QUANTIDADE'],
+                             filtros={'ANO': (max(anos) - (ANOS_RECENTES - 1), None)})
+    if df_recente is None:
+        st.error("Não foi possível carregar os dados recentes do MinIO para as clusterizações (e não há cópia local).")
+        pendentes = [job.id for job in jobs if job.estado not in ESTADOS_FINAIS]
+        if pendentes:
+            _acompanhar_treinos(pendentes)  # os treinos já submetidos continuam sendo acompanhados
+        return
+
     # Clustering dos Estados (UFs)
     st.header("Clusterização dos Estados (UFs)")
-    df_filtrado = df[df["ANO"] >= df["ANO"].max() - 4].copy()
+    df_filtrado = df_recente
     df_cluster = df_filtrado.groupby(["UF_PROCEDENCIA", "CATEGORIA"])["QUANTIDADE"].sum().unstack(fill_value=0)
-    scaler = StandardScaler()
-    df_scaled = scaler.fit_transform(df_cluster)
-    kmeans = KMeans(n_clusters=3, random_state=42)
-    df_cluster["CLUSTER"] = kmeans.fit_predict(df_scaled)
-    pca = PCA(n_components=3)
-    pca_result = pca.fit_transform(df_scaled)
-    df_cluster["PCA1"] = pca_result[:, 0]
-    df_cluster["PCA2"] = pca_result[:, 1]
-    df_cluster["PCA3"] = pca_result[:, 2]
+    df_cluster = df_cluster.join(
+        registro.obter_ou_treinar('clusters_pca', treinar_clusters_pca, df_cluster, {'n_clusters': 3})['clusters']
+    )
     fig = plt.figure(figsize=(12, 8))
     ax = fig.add_subplot(111, projection="3d")
     scatter = ax.scatter(df_cluster["PCA1"], df_cluster["PCA2"], df_cluster["PCA3"], c=df_cluster["CLUSTER"], cmap="viridis", s=100, edgecolors='k')
@@ -222,13 +266,10 @@ def show():
 
     # Clusterização simplificada por volume total
     st.header("Clusterização Simplificada por Volume Total de Abates")
-    df_recente = df[df["ANO"] >= df["ANO"].max() - 4].copy()
-    df_cluster2 = df_recente.groupby("UF_PROCEDENCIA")["QUANTIDADE"].sum().reset_index()
-    df_cluster2.columns = ["UF", "TOTAL_ABATES"]
-    scaler2 = StandardScaler()
-    X2 = scaler2.fit_transform(df_cluster2[["TOTAL_ABATES"]])
-    kmeans2 = KMeans(n_clusters=3, random_state=42)
-    df_cluster2["CLUSTER"] = kmeans2.fit_predict(X2)
+    df_volume = df_recente.groupby("UF_PROCEDENCIA")["QUANTIDADE"].sum().reset_index()
+    df_volume.columns = ["UF", "TOTAL_ABATES"]
+    df_cluster2 = registro.obter_ou_treinar('cluster_volume', treinar_cluster_volume, df_volume,
+                                            {'n_clusters': 3})['clusters']
     fig, ax = plt.subplots(figsize=(12, 6))
     sns.barplot(data=df_cluster2.sort_values("TOTAL_ABATES", ascending=False), x="UF", y="TOTAL_ABATES", hue="CLUSTER", palette="viridis", ax=ax)
     ax.set_title("Clusterização dos Estados por Volume Total de Abates (Últimos 5 anos)")
@@ -257,14 +298,8 @@ def show():
 
     # Regressão Linear no Tempo
     st.subheader("Tendência Linear com Regressão")
-    from sklearn.linear_model import LinearRegression
-    serie = serie_mensal.reset_index()
-    serie["DATA_NUM"] = (serie["DATA"] - serie["DATA"].min()).dt.days
-    X3 = serie[["DATA_NUM"]]
-    y3 = serie["QUANTIDADE"]
-    modelo = LinearRegression()
-    modelo.fit(X3, y3)
-    serie["TREND"] = modelo.predict(X3)
+    serie = registro.obter_ou_treinar('tendencia_linear', treinar_tendencia_linear,
+                                      serie_mensal.reset_index())['serie']
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.plot(serie["DATA"], serie["QUANTIDADE"], label="Dados reais", alpha=0.6)
     ax.plot(serie["DATA"], serie["TREND"], label="Tendência linear", color="red", linewidth=2)
@@ -277,37 +312,31 @@ def show():
     if prophet_ok:
         st.subheader("Detecção de Anomalias com Prophet")
         df_prophet = serie[["DATA", "QUANTIDADE"]].rename(columns={"DATA": "ds", "QUANTIDADE": "y"})
-        model = Prophet()
-        model.fit(df_prophet)
-        future = model.make_future_dataframe(periods=0)
-        forecast = model.predict(future)
-        df_prophet["previsto"] = forecast["yhat"]
-        df_prophet["erro"] = abs(df_prophet["y"] - df_prophet["previsto"])
-        limite = 2 * df_prophet["erro"].std()
-        outliers = df_prophet[df_prophet["erro"] > limite]
-        fig, ax = plt.subplots(figsize=(12, 6))
-        ax.plot(df_prophet["ds"], df_prophet["y"], label="Real")
-        ax.plot(df_prophet["ds"], df_prophet["previsto"], label="Previsto")
-        ax.scatter(outliers["ds"], outliers["y"], color="red", label="Anomalias")
-        ax.set_title("Anomalias com Prophet")
-        ax.legend()
-        ax.grid(True)
-        st.pyplot(fig)
+        resultado_anomalias, job = fila.resultado('prophet_anomalias', treinar_prophet_anomalias,
+                                                  df_prophet, {'desvios': 2})
+        jobs.append(job)
+        _situacao_treino(job, resultado_anomalias)
+        if resultado_anomalias is not None:
+            df_prophet, outliers = resultado_anomalias['serie'], resultado_anomalias['anomalias']
+            fig, ax = plt.subplots(figsize=(12, 6))
+            ax.plot(df_prophet["ds"], df_prophet["y"], label="Real")
+            ax.plot(df_prophet["ds"], df_prophet["previsto"], label="Previsto")
+            ax.scatter(outliers["ds"], outliers["y"], color="red", label="Anomalias")
+            ax.set_title("Anomalias com Prophet")
+            ax.legend()
+            ax.grid(True)
+            st.pyplot(fig)
     else:
         st.info("Prophet não está instalado. Pulei a detecção de anomalias.")
 
     # DB Score (Davies-Bouldin Index)
     st.header("Avaliação de Clusterização (DB Score)")
-    from sklearn.metrics import davies_bouldin_score
-    df_recente = df[df["ANO"] >= df["ANO"].max() - 4]
     df_cluster3 = df_recente.groupby(["UF_PROCEDENCIA", "CATEGORIA"])["QUANTIDADE"].sum().unstack(fill_value=0)
-    scaler3 = StandardScaler()
-    X3 = scaler3.fit_transform(df_cluster3)
-    st.write("DB Score para diferentes valores de k (quanto menor, melhor):")
-    for k in range(2, 10):
-        model = KMeans(n_clusters=k, random_state=42)
-        labels = model.fit_predict(X3)
-        score = davies_bouldin_score(X3, labels)
-        st.write(f"k={k} ➜ DB Score: {score:.3f}")
-
-    st.success("Relatório completo gerado com sucesso!")
\ No newline at end of file
+    k_maximo = st.slider("Maior k avaliado", min_value=3, max_value=min(20, len(df_cluster3) - 1),
+                         value=min(9, len(df_cluster3) - 1), key="externo_k_maximo")
+    _varredura(fila, jobs, 'varredura_kmeans', avaliar_kmeans, df_cluster3, grade(k=list(range(2, k_maximo + 1))),
+               'db_score', "DB Score para diferentes valores de k (quanto menor, melhor):")
+
+    pendentes = [job.id for job in jobs if job.estado not in ESTADOS_FINAIS]
+    if pendentes:
+        _acompanhar_treinos(pendentes)
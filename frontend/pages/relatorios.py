@@ -1,16 +1,48 @@
 import streamlit as st
 import pandas as pd
 import time
+from functools import partial
 from models.database_psycopg_manager import Manage_database
 
+# Registros por página na listagem de cada tabela
+TAMANHO_PAGINA = 50
+
+def _exportar_csv(table_name, id_column, columns):
+    # Roda na thread do download (comandos st são ignorados): falha vira exceção.
+    # Conexão própria: a da página é usada pela thread do script (inserções/edições ainda sem commit)
+    db_export = Manage_database()
+    try:
+        arquivo = db_export.export_table_csv(table_name, id_column, columns)
+    finally:
+        db_export.close_connection()
+    if arquivo is None:
+        raise RuntimeError(f"Falha ao exportar {table_name} para CSV.")
+    return arquivo
+
 def crud_section(title, table_name, columns, id_column, db_manager):
     st.header(title)
-    df = db_manager.read_table(table_name)
-    
-    # Exibe a tabela antes do formulário de inserção
+
+    # Exibe a tabela antes do formulário de inserção, uma página por vez (keyset pela chave primária)
     st.subheader(f"Tabela de {title}")
+    if f'pages_{table_name}' not in st.session_state:
+        st.session_state[f'pages_{table_name}'] = [None]
+    cursores = st.session_state[f'pages_{table_name}']
+    df, proximo = db_manager.read_page(table_name, id_column, columns, after_id=cursores[-1], limit=TAMANHO_PAGINA)
     if df is not None and not df.empty:
-        st.dataframe(df)
+        st.dataframe(df, hide_index=True)
+        col_anterior, col_info, col_proxima = st.columns([0.2, 0.6, 0.2])
+        with col_anterior:
+            st.button("◀ Anterior", disabled=len(cursores) == 1, key=f"prev_{table_name}",
+                      on_click=cursores.pop)
+        with col_info:
+            st.caption(f"Página {len(cursores)}")
+        with col_proxima:
+            st.button("Próxima ▶", disabled=proximo is None, key=f"next_{table_name}",
+                      on_click=cursores.append, args=(proximo,))
+    elif len(cursores) > 1:
+        # A página guardada ficou vazia (registros excluídos): volta para a primeira
+        st.session_state[f'pages_{table_name}'] = [None]
+        st.rerun()
     else:
         st.info("Nenhum registro encontrado.")
     st.subheader(f"Exportar/Importar para CSV")
@@ -18,11 +50,10 @@ def crud_section(title, table_name, columns, id_column, db_manager):
     with col_export:
         st.subheader(f"Exportar")
         if df is not None and not df.empty:
-            # Converte o DataFrame para CSV e o codifica para UTF-8
-            csv_data = df.to_csv(index=False).encode('utf-8')
+            # O CSV só é gerado no clique (COPY direto do banco para um arquivo temporário)
             st.download_button(
                 label=f"Baixar {title}.csv",
-                data=csv_data,
+                data=partial(_exportar_csv, table_name, id_column, columns),
                 file_name=f"{table_name}.csv",
                 mime="text/csv",
                 key=f"download_{table_name}"
@@ -86,13 +117,39 @@ def crud_section(title, table_name, columns, id_column, db_manager):
         st.success(f"{title[:-1]} adicionado com sucesso!")
         st.rerun()
     st.subheader(f"Editar/Excluir {title[:-1]}")
-    if df is not None and not df.empty:
-        selected = st.selectbox(f"Selecione o {title[:-1]} para editar/excluir", df[id_column])
-        selected_row = df[df[id_column] == selected].iloc[0]
+    # Busca no banco (índices de trigramas) em vez de listar todos os ids da tabela
+    search_columns = [col for col in columns if col.startswith(('nome_', 'cnpj_', 'email_'))]
+    campos_busca = ', '.join(col.split('_')[0].replace('cnpj', 'CNPJ').replace('email', 'e-mail') for col in search_columns)
+    termo = st.text_input(f"Buscar {title[:-1]} por {campos_busca} ou id", key=f"search_{table_name}")
+    selected = None
+    if termo.strip():
+        if len(termo.strip()) < 3 and not termo.strip().isdigit():
+            st.info("Digite ao menos 3 caracteres para buscar.")
+        else:
+            resultados = db_manager.search_records(table_name, id_column, search_columns, termo)
+            if resultados is None or resultados.empty:
+                st.info("Nenhum registro encontrado para a busca.")
+            else:
+                rotulos = {
+                    int(row[id_column]): f"{row[id_column]} · " + ' · '.join(
+                        str(row[col]) for col in search_columns if pd.notna(row[col]))
+                    for _, row in resultados.iterrows()
+                }
+                selected = st.selectbox(
+                    f"Selecione o {title[:-1]} para editar/excluir",
+                    list(rotulos.keys()),
+                    format_func=rotulos.get,
+                    key=f"select_{table_name}"
+                )
+    if selected is not None:
+        selected_row = db_manager.read_record(table_name, id_column, selected, columns)
+    else:
+        selected_row = None
+    if selected_row is not None:
         edit_data = {}
         for col in columns:
             if col != id_column:
-                edit_data[col] = st.text_input(f"{col.replace('_', ' ').capitalize()} (editar)", value=str(selected_row[col]), key=f"{table_name}_{col}_edit")
+                edit_data[col] = st.text_input(f"{col.replace('_', ' ').capitalize()} (editar)", value=str(selected_row[col]), key=f"{table_name}_{col}_edit_{selected}")
         col1, col2 = st.columns(2)
         with col1:
             if st.button(f"Atualizar {title[:-1]}", key=f"update_{table_name}"):
@@ -0,0 +1,179 @@
+# alocacao_fefo.py
+# Alocação dos itens de pedido aos lotes do estoque por FEFO (primeiro a vencer, primeiro a sair).
+# Requer adjustments_sql/alocacao_fefo.sql (tabela tb_alocacao_estoque).
+#
+# Um lote de pedidos é alocado numa única passada:
+#   1. lê os itens pendentes (quantidade ainda não alocada), em ordem de data do pedido;
+#   2. lê e trava (FOR UPDATE) os lotes disponíveis só dos produtos desses itens;
+#   3. monta uma fila de prioridade (heap) por produto ordenada pela validade e consome os lotes
+#      em memória, item a item;
+#   4. grava todas as alocações (INSERT em lote) e desconta os lotes (um UPDATE ... FROM VALUES
+#      com a baixa somada por lote) na mesma transação.
+# O banco recebe poucas instruções por lote de pedidos, não uma por item/lote. Alocações
+# concorrentes são serializadas por um advisory lock da transação.
+
+# Import Modulos
+from driver.psycopg2_connect import PostgresConnect
+
+# Import Libs
+from collections import Counter
+from datetime import date
+import heapq
+import time
+from psycopg2.extras import execute_values
+
+# Pedidos cujos itens são alocados por padrão (aguardando separação)
+STATUS_ALOCAVEIS = ('Pendente',)
+# Linhas por instrução no INSERT/UPDATE em lote
+TAMANHO_PAGINA = 10000
+
+QUERY_ITENS_PENDENTES = """
+    SELECT ip.id_item_pedido, ip.id_produto, ip.quantidade - a.alocado AS pendente
+    FROM tb_item_pedido ip
+    JOIN tb_pedido p ON p.id_pedido = ip.id_pedido
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(quantidade), 0) AS alocado
+        FROM tb_alocacao_estoque
+        WHERE id_item_pedido = ip.id_item_pedido
+    ) a
+    WHERE p.status = ANY(%(status)s)
+      AND ip.id_produto IS NOT NULL
+      AND ip.quantidade > a.alocado
+    ORDER BY p.data_pedido, p.id_pedido, ip.id_item_pedido
+    LIMIT %(limite)s
+"""
+
+# Ordenado por id_estoque: transações concorrentes travam os lotes sempre na mesma ordem
+QUERY_LOTES_DISPONIVEIS = """
+    SELECT e.id_estoque, pe.id_produto, pe.validade, e.quantidade_disponivel
+    FROM tb_estoque e
+    JOIN tb_produto_entrada pe ON pe.id_item_entrada = e.item_entrada
+    WHERE pe.id_produto = ANY(%(produtos)s)
+      AND e.quantidade_disponivel > 0
+      AND (pe.validade IS NULL OR pe.validade >= %(data_referencia)s)
+    ORDER BY e.id_estoque
+    FOR UPDATE OF e
+"""
+
+
+class FilasFEFO:
+    '''
+    Uma fila de prioridade (heap) por produto com os lotes disponíveis: o topo é o lote que vence
+    primeiro (sem validade vai para o fim; empate pelo id_estoque). `saldo` guarda o que resta em cada lote.
+    '''
+
+    def __init__(self, lotes):
+        '''`lotes`: iterável de (id_estoque, id_produto, validade, quantidade_disponivel).'''
+        self._filas = {}
+        self.saldo = {}
+        for id_estoque, id_produto, validade, quantidade in lotes:
+            if quantidade and quantidade > 0:
+                self._filas.setdefault(id_produto, []).append((validade or date.max, id_estoque))
+                self.saldo[id_estoque] = quantidade
+        for fila in self._filas.values():
+            heapq.heapify(fila)
+
+    def retirar(self, id_produto, quantidade):
+        '''
+        Retira `quantidade` do produto dos lotes que vencem primeiro.
+        Retorna ([(id_estoque, quantidade retirada)], quantidade que faltou).
+        '''
+        fila = self._filas.get(id_produto)
+        retiradas = []
+        while quantidade > 0 and fila:
+            id_estoque = fila[0][1]
+            retirada = min(quantidade, self.saldo[id_estoque])
+            retiradas.append((id_estoque, retirada))
+            quantidade -= retirada
+            self.saldo[id_estoque] -= retirada
+            if self.saldo[id_estoque] == 0:
+                heapq.heappop(fila)
+        return retiradas, quantidade
+
+
+def alocar_itens(filas, itens):
+    '''
+    Aloca os itens na ordem recebida. `itens`: iterável de (id_item_pedido, id_produto, quantidade).
+    Retorna (alocações [(id_item_pedido, id_estoque, quantidade)], faltas [(id_item_pedido, quantidade)]).
+    Item sem estoque suficiente fica com o que havia e o restante continua pendente.
+    '''
+    alocacoes, faltas = [], []
+    for id_item_pedido, id_produto, quantidade in itens:
+        retiradas, faltou = filas.retirar(id_produto, quantidade)
+        alocacoes.extend((id_item_pedido, id_estoque, retirada) for id_estoque, retirada in retiradas)
+        if faltou:
+            faltas.append((id_item_pedido, faltou))
+    return alocacoes, faltas
+
+
+def gravar_alocacoes(cur, alocacoes):
+    '''Insere as alocações e desconta os lotes (baixa somada por lote) com instruções em lote.'''
+    if not alocacoes:
+        return
+    execute_values(
+        cur,
+        "INSERT INTO tb_alocacao_estoque (id_item_pedido, id_estoque, quantidade) VALUES %s",
+        alocacoes, page_size=TAMANHO_PAGINA
+    )
+    baixas = Counter()
+    for _, id_estoque, quantidade in alocacoes:
+        baixas[id_estoque] += quantidade
+    execute_values(
+        cur,
+        """UPDATE tb_estoque e
+           SET quantidade_disponivel = e.quantidade_disponivel - v.quantidade
+           FROM (VALUES %s) AS v (id_estoque, quantidade)
+           WHERE e.id_estoque = v.id_estoque""",
+        sorted(baixas.items()), page_size=TAMANHO_PAGINA
+    )
+
+
+def alocar_pedidos_pendentes(status=STATUS_ALOCAVEIS, limite=None, data_referencia=None, simular=False):
+    '''
+    Aloca por FEFO os itens pendentes dos pedidos com `status` (mais antigos primeiro, até `limite`
+    itens) numa única transação. Lotes vencidos em `data_referencia` (padrão: hoje) não são usados.
+    Com simular=True faz toda a alocação e desfaz a transação no fim.
+    Retorna um resumo (dict) ou None em caso de erro.
+    '''
+    db = PostgresConnect()
+    if db.conn is None or db.conn.closed:
+        print("Erro: Conexão com o banco de dados não está ativa para a alocação de estoque.")
+        return None
+    inicio = time.perf_counter()
+    try:
+        cur = db.get_cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('alocacao_fefo'))")
+        cur.execute(QUERY_ITENS_PENDENTES, {'status': list(status), 'limite': limite})
+        itens = cur.fetchall()
+        produtos = sorted({id_produto for _, id_produto, _ in itens})
+        cur.execute(QUERY_LOTES_DISPONIVEIS, {'produtos': produtos,
+                                              'data_referencia': data_referencia or date.today()})
+        filas = FilasFEFO(cur.fetchall())
+        alocacoes, faltas = alocar_itens(filas, itens)
+        gravar_alocacoes(cur, alocacoes)
+        if simular:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception as e:
+        print(f"Erro na alocação de estoque (FEFO): {e}")
+        db.rollback()
+        return None
+    finally:
+        db.close_connection()
+
+    segundos = time.perf_counter() - inicio
+    resumo = {
+        'itens': len(itens),
+        'itens_completos': len(itens) - len(faltas),
+        'alocacoes': len(alocacoes),
+        'lotes_baixados': len({id_estoque for _, id_estoque, _ in alocacoes}),
+        'quantidade_alocada': sum(quantidade for _, _, quantidade in alocacoes),
+        'quantidade_faltante': sum(faltou for _, faltou in faltas),
+        'segundos': round(segundos, 3),
+        'simulacao': simular,
+    }
+    print(f"Alocação FEFO{' (simulação)' if simular else ''}: {resumo['itens']} itens, "
+          f"{resumo['alocacoes']} alocações em {resumo['lotes_baixados']} lotes, "
+          f"{resumo['quantidade_faltante']} unidades sem estoque ({segundos:.2f} s)")
+    return resumo
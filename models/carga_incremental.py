@@ -0,0 +1,145 @@
+# carga_incremental.py
+# Carga incremental (por watermark) do histórico de itens de pedido e pagamentos do dashboard.
+# Depende de adjustments_sql/carga_incremental.sql: pedidos, itens e pagamentos têm `atualizado_em`,
+# gravado por trigger em toda inserção/alteração. A cada nova versão dos dados só as linhas com
+# atualizado_em posterior à última carga (menos MARGEM_WATERMARK, para transações longas que
+# gravaram antes mas confirmaram depois) vêm do banco. Elas substituem as linhas de mesma chave
+# nos DataFrames em memória e o resto do histórico é reaproveitado.
+# Exclusões (e alterações em clientes/produtos, cujos nomes são copiados para as linhas) não
+# aparecem no delta: nesses casos a carga volta a ser completa.
+
+# Import Modulos
+from driver.psycopg2_connect import PostgresConnect
+from models.filtro_temporal import ordenar_por_data
+
+# Import Libs
+from datetime import timedelta
+import threading
+import pandas as pd
+
+MARGEM_WATERMARK = timedelta(minutes=5)
+
+# Tabelas com a coluna atualizado_em
+TABELAS_DELTA = ('tb_pedido', 'tb_item_pedido', 'tb_pagamento')
+
+# Tabelas cujos dados são copiados para as linhas de pedidos/pagamentos (nome do cliente, produto...)
+TABELAS_DESNORMALIZADAS = ('tb_cliente', 'tb_produto')
+
+
+def watermark_disponivel():
+    '''True se as tabelas do delta já têm a coluna atualizado_em (migração aplicada).'''
+    db_connection = PostgresConnect()
+    if db_connection.conn is None or db_connection.conn.closed:
+        return False
+    try:
+        cur = db_connection.get_cursor()
+        cur.execute(
+            """
+            SELECT count(*)
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND column_name = 'atualizado_em'
+              AND table_name = ANY(%s)
+            """,
+            (list(TABELAS_DELTA),)
+        )
+        return cur.fetchone()[0] == len(TABELAS_DELTA)
+    except Exception as e:
+        print(f"Erro ao verificar a coluna atualizado_em: {e}")
+        return False
+    finally:
+        db_connection.close_connection()
+
+
+def instante_banco():
+    '''Instante atual segundo o banco (próximo watermark) ou None em caso de erro.'''
+    db_connection = PostgresConnect()
+    if db_connection.conn is None or db_connection.conn.closed:
+        return None
+    try:
+        cur = db_connection.get_cursor()
+        cur.execute("SELECT now()")
+        return cur.fetchone()[0]
+    except Exception as e:
+        print(f"Erro ao consultar o instante do banco: {e}")
+        return None
+    finally:
+        db_connection.close_connection()
+
+
+def exige_carga_completa(versao_anterior, versao_atual):
+    '''
+    Compara duas versões (linhas de pg_stat_user_tables: relname, n_tup_ins, n_tup_upd, n_tup_del,
+    n_live_tup) e diz se o delta não basta: exclusões/TRUNCATE nas tabelas do delta ou
+    alterações/exclusões em clientes e produtos.
+    '''
+    if not versao_anterior or not versao_atual:
+        return True
+    anterior = {linha[0]: linha[1:] for linha in versao_anterior}
+    atual = {linha[0]: linha[1:] for linha in versao_atual}
+    if anterior.keys() != atual.keys():
+        return True
+    for tabela, (ins, upd, dele, vivas) in atual.items():
+        ins_ant, upd_ant, dele_ant, vivas_ant = anterior[tabela]
+        if ins < ins_ant or upd < upd_ant or dele < dele_ant:  # estatísticas zeradas
+            return True
+        # n_live_tup menor sem exclusões contadas: TRUNCATE
+        if tabela in TABELAS_DELTA and (dele != dele_ant or vivas < vivas_ant):
+            return True
+        if tabela in TABELAS_DESNORMALIZADAS and (upd != upd_ant or dele != dele_ant):
+            return True
+    return False
+
+
+def _alinhar_categorias(base, delta):
+    '''
+    Dá às colunas categóricas de `base` e `delta` as mesmas categorias (as da base + as novas do
+    delta, no fim), para o concat manter o tipo category sem recodificar a base.
+    '''
+    colunas_base, colunas_delta = {}, {}
+    for coluna in base.columns:
+        if not isinstance(base[coluna].dtype, pd.CategoricalDtype) or coluna not in delta.columns:
+            continue
+        categorias = base[coluna].cat.categories
+        novas = pd.Index(delta[coluna].dropna().unique()).difference(categorias)
+        if len(novas):
+            colunas_base[coluna] = base[coluna].cat.add_categories(novas)
+            categorias = colunas_base[coluna].cat.categories
+        colunas_delta[coluna] = pd.Categorical(delta[coluna], categories=categorias)
+    return base.assign(**colunas_base), delta.assign(**colunas_delta)
+
+
+def aplicar_delta(base, delta, chave, coluna_data):
+    '''
+    Substitui em `base` as linhas cuja `chave` aparece no `delta`, acrescenta as novas e
+    devolve o resultado ordenado por `coluna_data` (ordenação estável; se o delta só tem datas
+    novas o resultado já sai ordenado).
+    '''
+    if delta.empty:
+        return base
+    if base.empty:
+        return ordenar_por_data(delta.reset_index(drop=True), coluna_data)
+    substituidas = base[chave].isin(delta[chave]).to_numpy()
+    mantidas = base[~substituidas] if substituidas.any() else base
+    mantidas, delta = _alinhar_categorias(mantidas, delta)
+    resultado = pd.concat([mantidas, delta], ignore_index=True)
+    return ordenar_por_data(resultado, coluna_data)
+
+
+class EstadoCarga:
+    '''
+    Histórico já carregado (DataFrames preparados e compactados), watermark e versão da última carga.
+    Uma instância por processo (st.cache_resource); o lock serializa as atualizações entre sessões.
+    '''
+
+    def __init__(self):
+        self.frames = None
+        self.watermark = None
+        self.versao = None
+        self.lock = threading.Lock()
+
+    def atualizado(self, frames, watermark, versao):
+        self.frames = frames
+        self.watermark = watermark
+        self.versao = versao
+        return frames
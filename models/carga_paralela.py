@@ -0,0 +1,84 @@
+# carga_paralela.py
+# Carga em paralelo das consultas independentes do dashboard.
+# Cada tarefa roda numa thread do ThreadPoolExecutor e usa uma conexão emprestada do
+# PostgresPool (o banco atende as consultas ao mesmo tempo; o pandas/psycopg2 liberam o GIL
+# enquanto esperam a rede). O tempo total fica próximo ao da consulta mais lenta.
+# Falhas são registradas por tarefa: as demais continuam e o dashboard exibe o que chegou.
+
+# Import Libs
+from concurrent.futures import ThreadPoolExecutor
+import time
+import pandas as pd
+
+MAX_TAREFAS_PARALELAS = 5
+
+
+def consultar(pool, query, params=None):
+    '''Executa a consulta numa conexão do pool e devolve o DataFrame (erros são propagados).'''
+    with pool.conexao() as conn:
+        return pd.read_sql(query, conn, params=params)
+
+
+class ResultadoCarga:
+    '''
+    Resultado de executar_em_paralelo: dados, tempo (s) e erro de cada tarefa, mais o tempo total.
+    '''
+
+    def __init__(self):
+        self.dados = {}
+        self.tempos = {}
+        self.erros = {}
+        self.total = 0.0
+
+    def incluir(self, outro):
+        '''Acrescenta tempos e erros de uma carga feita dentro de uma das tarefas.'''
+        self.tempos.update(outro.tempos)
+        self.erros.update(outro.erros)
+        for nome, dados in outro.dados.items():
+            self.dados.setdefault(nome, dados)
+        return self
+
+    def relatorio(self):
+        '''DataFrame com uma linha por tarefa: segundos, linhas retornadas e status.'''
+        linhas = []
+        for nome, segundos in self.tempos.items():
+            dados = self.dados.get(nome)
+            linhas.append({
+                'consulta': nome,
+                'segundos': round(segundos, 3),
+                'linhas': len(dados) if isinstance(dados, pd.DataFrame) else None,
+                'status': f"erro: {self.erros[nome]}" if nome in self.erros else 'ok',
+            })
+        return pd.DataFrame(linhas, columns=['consulta', 'segundos', 'linhas', 'status'])
+
+
+def _cronometrar(tarefa):
+    inicio = time.perf_counter()
+    try:
+        return tarefa(), None, time.perf_counter() - inicio
+    except Exception as e:
+        return None, e, time.perf_counter() - inicio
+
+
+def executar_em_paralelo(tarefas, max_workers=MAX_TAREFAS_PARALELAS):
+    '''
+    Executa as tarefas ({nome: função sem argumentos}) em paralelo.
+    As funções não podem chamar st.*: rodam fora da thread do script do Streamlit.
+    '''
+    resultado = ResultadoCarga()
+    if not tarefas:
+        return resultado
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tarefas)),
+                            thread_name_prefix='carga_dashboard') as executor:
+        futuros = {nome: executor.submit(_cronometrar, tarefa) for nome, tarefa in tarefas.items()}
+        for nome, futuro in futuros.items():
+            dados, erro, segundos = futuro.result()
+            resultado.tempos[nome] = segundos
+            if erro is not None:
+                print(f"Erro na carga de '{nome}': {erro}")
+                resultado.erros[nome] = str(erro).strip()
+            else:
+                resultado.dados[nome] = dados
+    resultado.total = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,116 @@
+# compactacao.py
+# Representação compacta dos DataFrames do dashboard.
+# Cada conjunto de dados tem um esquema (coluna -> tipo lógico) e a compactação converte:
+#   - 'categoria': textos repetidos (status, tipo de corte, nomes nos itens...) -> category
+#   - 'texto':     textos pouco repetidos (e-mail, endereço...)                -> string com Arrow
+#   - 'id' / 'inteiro': inteiros                                              -> int32 (quando cabe e não há nulos)
+#   - 'moeda':     valores em R$                                               -> float32 quando todos os valores
+#                  ficam abaixo de LIMITE_MOEDA_FLOAT32 (float32 ainda representa o centavo); senão float64
+
+# Import Libs
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 (só habilita as strings com Arrow)
+    TIPO_TEXTO = pd.StringDtype('pyarrow')
+except ImportError:
+    TIPO_TEXTO = None
+
+# Acima disso o espaçamento do float32 passa de meio centavo
+LIMITE_MOEDA_FLOAT32 = 40_000
+
+ESQUEMAS = {
+    'pedidos': {
+        'id_pedido': 'id', 'id_item_pedido': 'id', 'id_produto': 'id',
+        'status_pedido': 'categoria', 'nome_cliente': 'categoria', 'tipo_cliente': 'categoria',
+        'nome_produto': 'categoria', 'tipo_corte': 'categoria', 'unidade_medida': 'categoria',
+        'mes_ano_pedido': 'categoria',
+        'quantidade': 'inteiro', 'ano_pedido': 'inteiro',
+        'preco_unitario': 'moeda', 'valor_total': 'moeda', 'valor_item_calculado': 'moeda', 'lucro_item': 'moeda',
+    },
+    'clientes': {
+        'id_cliente': 'id', 'tipo_cliente': 'categoria',
+        'nome_cliente': 'texto', 'cnpj_cliente': 'texto', 'telefone_cliente': 'texto',
+        'email_cliente': 'texto', 'endereco_cliente': 'texto',
+    },
+    'produtos': {
+        'id_produto': 'id', 'id_fornecedor': 'id',
+        'nome_produto': 'texto', 'tipo_corte': 'categoria', 'unidade_medida': 'categoria',
+        'preco_compra': 'moeda', 'preco_venda': 'moeda',
+    },
+    'pagamentos': {
+        'id_pagamento': 'id', 'id_pedido': 'id',
+        'metodo_pagamento': 'categoria', 'status_pagamento': 'categoria', 'status_pedido': 'categoria',
+        'mes_ano_pagamento': 'categoria',
+        'valor_pago': 'moeda', 'valor_total_pedido': 'moeda',
+    },
+    'estoque': {
+        'id_estoque': 'id', 'quantidade_disponivel': 'inteiro',
+        'localizacao': 'categoria', 'lote': 'texto', 'nome_produto': 'categoria', 'tipo_corte': 'categoria',
+        'unidade_medida': 'categoria', 'preco_venda': 'moeda',
+    },
+}
+
+
+def _inteiro32(serie):
+    if serie.isna().any() or not pd.api.types.is_numeric_dtype(serie):
+        return serie
+    info = np.iinfo(np.int32)
+    if len(serie) and (serie.min() < info.min or serie.max() > info.max):
+        return serie
+    return serie.astype(np.int32)
+
+
+def _moeda(serie):
+    valores = pd.to_numeric(serie)
+    if len(valores) and valores.abs().max() >= LIMITE_MOEDA_FLOAT32:
+        return valores.astype(np.float64)
+    return valores.astype(np.float32)
+
+
+def _texto(serie):
+    if TIPO_TEXTO is None or isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    return serie.astype(TIPO_TEXTO)
+
+
+_CONVERSORES = {
+    'id': _inteiro32,
+    'inteiro': _inteiro32,
+    'moeda': _moeda,
+    'categoria': lambda serie: serie.astype('category'),
+    'texto': _texto,
+}
+
+
+def compactar(df, nome_esquema):
+    '''
+    Converte as colunas do DataFrame conforme o esquema (colunas fora do esquema ficam como estão).
+    Altera e devolve o próprio DataFrame.
+    '''
+    if df.empty:
+        return df
+    for coluna, tipo in ESQUEMAS[nome_esquema].items():
+        if coluna in df.columns:
+            df[coluna] = _CONVERSORES[tipo](df[coluna])
+    return df
+
+
+def relatorio_memoria(datasets):
+    '''
+    Memória ocupada por conjunto de dados: {nome: DataFrame} -> DataFrame (linhas, colunas, MB e
+    as três colunas que mais ocupam).
+    '''
+    linhas = []
+    for nome, df in datasets.items():
+        uso = df.memory_usage(deep=True, index=True)
+        maiores = uso.drop('Index', errors='ignore').nlargest(3)
+        linhas.append({
+            'dataset': nome,
+            'linhas': len(df),
+            'colunas': df.shape[1],
+            'memoria_mb': round(uso.sum() / 1024 ** 2, 2),
+            'maiores_colunas': ', '.join(f"{c} ({v / 1024 ** 2:.1f} MB)" for c, v in maiores.items()),
+        })
+    return pd.DataFrame(linhas)
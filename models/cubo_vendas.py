@@ -0,0 +1,316 @@
+# cubo_vendas.py
+# Cubo OLAP em memória para os KPIs e gráficos do dashboard.
+# Os itens de pedido são pré-agregados uma vez por versão dos dados em matrizes densas por dia:
+#   - itens:      dia x produto (nome, tipo de corte) -> quantidade, valor, lucro, nº de itens, nº de pedidos
+#   - pedidos:    dia x tipo de cliente x status      -> valor_total, nº de pedidos
+#   - pagamentos: dia x método x status do pagamento  -> nº de pagamentos, valor_pago
+# Cada matriz guarda também a soma acumulada (prefix sum) no eixo dos dias, então o total de
+# qualquer período sai de uma subtração (P[fim] - P[inicio]) e as séries temporais saem do
+# recorte diário reagregado em 'D', 'W-MON', 'ME' ou 'YE'.
+# O nº de pedidos distintos é aditivo entre dias, tipos de cliente e status (cada pedido tem um só),
+# mas não entre produtos: por isso os totais de pedidos vêm do cubo de pedidos.
+
+# Import Modulos
+from models.dashboard_agregacoes import AgregadorPandas, _validar_frequencia
+from models.filtro_temporal import mascara_categorias
+
+# Import Libs
+import numpy as np
+import pandas as pd
+
+def _codificar(serie):
+    '''Códigos inteiros e valores distintos da coluna (NaN vira uma categoria própria).'''
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Reaproveita os códigos já calculados da coluna categórica
+        codigos = serie.cat.codes.to_numpy().astype(np.int64)
+        valores = pd.Index(serie.cat.categories.astype(object))
+        if (codigos < 0).any():
+            codigos[codigos < 0] = len(valores)
+            valores = valores.append(pd.Index([np.nan], dtype=object))
+        return codigos, valores
+    codigos, valores = pd.factorize(serie, use_na_sentinel=False)
+    return codigos, pd.Index(valores)
+
+
+def _eixo_dias(datas):
+    '''Dias consecutivos da menor à maior data.'''
+    return pd.date_range(datas.min().normalize(), datas.max().normalize(), freq='D')
+
+
+def _posicoes(datas, dias):
+    '''Posição de cada data no eixo de dias.'''
+    dias_np = datas.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    return (dias_np - dias[0].to_datetime64().astype('datetime64[D]')).astype(np.int64)
+
+
+def _acumular(indice_plano, formato, pesos):
+    '''Soma os pesos em uma matriz densa (bincount no índice achatado) e devolve a soma acumulada nos dias.'''
+    tamanho = int(np.prod(formato))
+    matriz = np.bincount(indice_plano, weights=pesos, minlength=tamanho).reshape(formato)
+    acumulado = np.zeros((formato[0] + 1,) + tuple(formato[1:]))
+    np.cumsum(matriz, axis=0, out=acumulado[1:])
+    return acumulado
+
+
+class CuboVendas:
+    '''
+    Cubo pré-agregado dos pedidos e pagamentos, construído a partir dos DataFrames preparados.
+    Não depende do período: o recorte é feito nas consultas (ver AgregadorCubo).
+    '''
+
+    def __init__(self, df_pedidos_detalhes, df_pagamentos=None):
+        self.dias = pd.DatetimeIndex([])
+        self.dias_pagamento = pd.DatetimeIndex([])
+        if df_pedidos_detalhes is not None and not df_pedidos_detalhes.empty:
+            self._montar_itens(df_pedidos_detalhes)
+            self._montar_pedidos(df_pedidos_detalhes)
+        if df_pagamentos is not None and not df_pagamentos.empty:
+            self._montar_pagamentos(df_pagamentos)
+
+    def _montar_itens(self, df):
+        self.dias = _eixo_dias(df['data_pedido'])
+        dia = _posicoes(df['data_pedido'], self.dias)
+        cod_nome, nomes = _codificar(df['nome_produto'])
+        cod_corte, cortes = _codificar(df['tipo_corte'])
+        # Produto = par (nome, tipo de corte), o mesmo agrupamento do modo em memória
+        cod_produto, pares = pd.factorize(cod_nome.astype(np.int64) * len(cortes) + cod_corte)
+        self.produtos = pd.DataFrame({
+            'nome_produto': nomes[pares // len(cortes)],
+            'tipo_corte': cortes[pares % len(cortes)],
+        })
+
+        formato = (len(self.dias), len(self.produtos))
+        plano = dia * formato[1] + cod_produto
+        self.itens = {
+            'quantidade': _acumular(plano, formato, df['quantidade'].to_numpy(dtype=float)),
+            'valor_item_calculado': _acumular(plano, formato, df['valor_item_calculado'].to_numpy(dtype=float)),
+            'lucro_item': _acumular(plano, formato, df['lucro_item'].to_numpy(dtype=float)),
+            'num_itens': _acumular(plano, formato, None),
+        }
+        # Pedidos distintos por produto e dia (o pedido tem uma única data)
+        unicos = ~pd.DataFrame({'id_pedido': df['id_pedido'].to_numpy(), 'produto': cod_produto}).duplicated().to_numpy()
+        self.itens['num_pedidos'] = _acumular(plano[unicos], formato, None)
+
+    def _montar_pedidos(self, df):
+        pedidos = df.drop_duplicates(subset=['id_pedido'])
+        dia = _posicoes(pedidos['data_pedido'], self.dias)
+        cod_tipo, self.tipos_cliente = _codificar(pedidos['tipo_cliente'])
+        cod_status, self.status = _codificar(pedidos['status_pedido'])
+        formato = (len(self.dias), len(self.tipos_cliente), len(self.status))
+        plano = (dia * formato[1] + cod_tipo) * formato[2] + cod_status
+        self.pedidos = {
+            'valor_total': _acumular(plano, formato, pedidos['valor_total'].to_numpy(dtype=float)),
+            'num_pedidos': _acumular(plano, formato, None),
+        }
+
+    def _montar_pagamentos(self, df):
+        self.dias_pagamento = _eixo_dias(df['data_pagamento'])
+        dia = _posicoes(df['data_pagamento'], self.dias_pagamento)
+        cod_metodo, self.metodos_pagamento = _codificar(df['metodo_pagamento'])
+        cod_status, self.status_pagamento = _codificar(df['status_pagamento'])
+        formato = (len(self.dias_pagamento), len(self.metodos_pagamento), len(self.status_pagamento))
+        plano = (dia * formato[1] + cod_metodo) * formato[2] + cod_status
+        self.pagamentos = {
+            'num_pagamentos': _acumular(plano, formato, None),
+            'valor_pago': _acumular(plano, formato, df['valor_pago'].to_numpy(dtype=float)),
+        }
+
+    @staticmethod
+    def intervalo(dias, inicio, fim):
+        '''Posições [i, j) do período no eixo de dias (busca binária).'''
+        i = dias.searchsorted(pd.Timestamp(inicio), side='left')
+        j = dias.searchsorted(pd.Timestamp(fim), side='right')
+        return i, max(i, j)
+
+    @staticmethod
+    def total(acumulado, i, j):
+        '''Total do período pelas somas acumuladas.'''
+        return acumulado[j] - acumulado[i]
+
+    @staticmethod
+    def diario(acumulado, i, j):
+        '''Valores dia a dia do período (diferença das somas acumuladas).'''
+        return np.diff(acumulado[i:j + 1], axis=0)
+
+    @staticmethod
+    def por_periodo(valores_diarios, dias, freq, contagem_diaria):
+        '''
+        Reagrega valores diários na frequência pedida, do primeiro ao último dia com movimento
+        (mesmos rótulos e períodos vazios que o pd.Grouper sobre as linhas).
+        '''
+        _validar_frequencia(freq)
+        com_movimento = np.flatnonzero(contagem_diaria)
+        if len(com_movimento) == 0:
+            return None
+        recorte = slice(com_movimento[0], com_movimento[-1] + 1)
+        return pd.DataFrame(valores_diarios[recorte], index=dias[recorte]).resample(freq).sum()
+
+
+class AgregadorCubo(AgregadorPandas):
+    '''
+    Agregações respondidas pelo CuboVendas para o período [start_date, end_date].
+    O que depende do cliente individual (top clientes, clientes compradores, lista de pedidos)
+    continua vindo dos DataFrames filtrados, como no AgregadorPandas.
+    '''
+
+    def __init__(self, cubo, start_date, end_date, df_pedidos_detalhes, df_pagamentos=None):
+        super().__init__(df_pedidos_detalhes, df_pagamentos)
+        self.cubo = cubo
+        self.i, self.j = CuboVendas.intervalo(cubo.dias, start_date, end_date)
+        self.i_pag, self.j_pag = CuboVendas.intervalo(cubo.dias_pagamento, start_date, end_date)
+
+    def _total_itens(self, medida):
+        return CuboVendas.total(self.cubo.itens[medida], self.i, self.j)
+
+    def _total_pedidos(self, medida):
+        return CuboVendas.total(self.cubo.pedidos[medida], self.i, self.j)
+
+    def _total_pagamentos(self, medida):
+        return CuboVendas.total(self.cubo.pagamentos[medida], self.i_pag, self.j_pag)
+
+    def _produtos_no_periodo(self):
+        produtos = self.cubo.produtos.copy()
+        for medida in ('quantidade', 'valor_item_calculado', 'lucro_item', 'num_itens'):
+            produtos[medida] = self._total_itens(medida)
+        return produtos[produtos['num_itens'] > 0]
+
+    def possui_pedidos(self):
+        return self.j > self.i and self._total_itens('num_itens').sum() > 0
+
+    def possui_pagamentos(self):
+        return self.j_pag > self.i_pag and self._total_pagamentos('num_pagamentos').sum() > 0
+
+    def opcoes(self, coluna):
+        if not self.possui_pedidos():
+            return []
+        if coluna in ('nome_produto', 'tipo_corte'):
+            valores = self._produtos_no_periodo()[coluna]
+        elif coluna == 'tipo_cliente':
+            valores = self.cubo.tipos_cliente[self._total_pedidos('num_pedidos').sum(axis=1) > 0].to_series()
+        elif coluna == 'status_pedido':
+            valores = self.cubo.status[self._total_pedidos('num_pedidos').sum(axis=0) > 0].to_series()
+        else:
+            return super().opcoes(coluna)
+        return sorted(valores.dropna().unique())
+
+    def resumo_kpis(self, inicio_semana, fim_semana):
+        if not self.possui_pedidos():
+            return super().resumo_kpis(inicio_semana, fim_semana)
+        lucro = self.cubo.itens['lucro_item'].sum(axis=1)
+        # Semana limitada ao período selecionado
+        i_sem, j_sem = CuboVendas.intervalo(self.cubo.dias, inicio_semana, fim_semana)
+        i_sem, j_sem = max(i_sem, self.i), min(j_sem, self.j)
+        lucro_semanal = CuboVendas.total(lucro, i_sem, j_sem) if j_sem > i_sem else 0
+
+        lucro_diario = CuboVendas.diario(lucro, self.i, self.j)
+        itens_diarios = CuboVendas.diario(self.cubo.itens['num_itens'].sum(axis=1), self.i, self.j)
+        anos = self.cubo.dias[self.i:self.j].year
+        lucro_por_ano = pd.DataFrame({'ano_pedido': anos, 'lucro_item': lucro_diario, 'itens': itens_diarios})
+        lucro_por_ano = lucro_por_ano.groupby('ano_pedido', as_index=False).sum()
+        return {
+            'total_vendas': self._total_pedidos('valor_total').sum(),
+            'total_pedidos': int(self._total_pedidos('num_pedidos').sum()),
+            'lucro_semanal': lucro_semanal,
+            'lucro_por_ano': lucro_por_ano.loc[lucro_por_ano['itens'] > 0, ['ano_pedido', 'lucro_item']],
+        }
+
+    def _serie_pedidos(self, medida, freq):
+        contagem = CuboVendas.diario(self.cubo.pedidos['num_pedidos'].sum(axis=(1, 2)), self.i, self.j)
+        valores = CuboVendas.diario(self.cubo.pedidos[medida].sum(axis=(1, 2)), self.i, self.j)
+        return CuboVendas.por_periodo(valores, self.cubo.dias[self.i:self.j], freq, contagem)
+
+    def vendas_por_periodo(self, freq):
+        serie = self._serie_pedidos('valor_total', freq) if self.possui_pedidos() else None
+        if serie is None:
+            return super().vendas_por_periodo(freq)
+        return pd.DataFrame({'data_pedido': serie.index, 'valor_total': serie[0].to_numpy()})
+
+    def pedidos_por_periodo(self, freq):
+        serie = self._serie_pedidos('num_pedidos', freq) if self.possui_pedidos() else None
+        if serie is None:
+            return super().pedidos_por_periodo(freq)
+        return pd.DataFrame({'data_pedido': serie.index, 'num_pedidos': serie[0].to_numpy().astype(np.int64)})
+
+    def top_produtos(self, metrica, tipos_corte=None, limite=10):
+        produtos = self._produtos_no_periodo()
+        if tipos_corte:
+            produtos = produtos[mascara_categorias(produtos['tipo_corte'], tipos_corte)]
+        return produtos.groupby('nome_produto')[metrica].sum().nlargest(limite).reset_index()
+
+    def soma_por_corte(self, metrica):
+        return self._produtos_no_periodo().groupby('tipo_corte')[metrica].sum().reset_index()
+
+    def tendencia_produto(self, nome_produto, freq='ME'):
+        colunas = np.flatnonzero(self.cubo.produtos['nome_produto'].to_numpy() == nome_produto) \
+            if self.possui_pedidos() else []
+        if len(colunas) == 0:
+            return super().tendencia_produto(nome_produto, freq)
+        diarios = {
+            medida: CuboVendas.diario(self.cubo.itens[medida][:, colunas].sum(axis=1), self.i, self.j)
+            for medida in ('num_itens', 'quantidade', 'valor_item_calculado', 'lucro_item')
+        }
+        serie = CuboVendas.por_periodo(
+            np.column_stack([diarios['quantidade'], diarios['valor_item_calculado'], diarios['lucro_item']]),
+            self.cubo.dias[self.i:self.j], freq, diarios['num_itens']
+        )
+        if serie is None:
+            return super().tendencia_produto(nome_produto, freq)
+        serie.columns = ['Quantidade_Vendida', 'Valor_Vendido', 'Lucro_Gerado']
+        return serie.rename_axis('data_pedido').reset_index()
+
+    def vendas_por_tipo_cliente(self):
+        if not self.possui_pedidos():
+            return super().vendas_por_tipo_cliente()
+        df = pd.DataFrame({
+            'tipo_cliente': self.cubo.tipos_cliente,
+            'valor_total': self._total_pedidos('valor_total').sum(axis=1),
+            'num_pedidos': self._total_pedidos('num_pedidos').sum(axis=1),
+        })
+        df = df[(df['num_pedidos'] > 0) & df['tipo_cliente'].notna()]
+        return df.sort_values('tipo_cliente')[['tipo_cliente', 'valor_total']].reset_index(drop=True)
+
+    def resumo_status(self, status):
+        if not self.possui_pedidos():
+            return super().resumo_status(status)
+        df = pd.DataFrame({
+            'status_pedido': self.cubo.status,
+            'Total_Pedidos': self._total_pedidos('num_pedidos').sum(axis=0).astype(np.int64),
+            'Valor_Total': self._total_pedidos('valor_total').sum(axis=0),
+        })
+        df = self._filtrar(df[(df['Total_Pedidos'] > 0) & df['status_pedido'].notna()], 'status_pedido', status)
+        return df.sort_values('status_pedido').sort_values('Total_Pedidos', ascending=False)
+
+    def status_por_periodo(self, status, freq='ME'):
+        if not self.possui_pedidos():
+            return super().status_por_periodo(status, freq)
+        colunas = [k for k, s in enumerate(self.cubo.status) if pd.notna(s) and (not status or s in status)]
+        contagem = CuboVendas.diario(self.cubo.pedidos['num_pedidos'].sum(axis=1)[:, colunas], self.i, self.j)
+        serie = CuboVendas.por_periodo(contagem, self.cubo.dias[self.i:self.j], freq, contagem.sum(axis=1))
+        if serie is None:
+            return pd.DataFrame(columns=['data_pedido', 'status_pedido', 'Contagem'])
+        serie.columns = self.cubo.status[colunas]
+        df = serie.rename_axis('data_pedido').rename_axis('status_pedido', axis=1).stack().reset_index(name='Contagem')
+        df = df[df['Contagem'] > 0].sort_values(['data_pedido', 'status_pedido']).reset_index(drop=True)
+        df['Contagem'] = df['Contagem'].astype(np.int64)
+        return df
+
+    def pagamentos_por_metodo(self):
+        if not self.possui_pagamentos():
+            return super().pagamentos_por_metodo()
+        df = pd.DataFrame({
+            'metodo_pagamento': self.cubo.metodos_pagamento,
+            'Contagem': self._total_pagamentos('num_pagamentos').sum(axis=1).astype(np.int64),
+            'valor_pago': self._total_pagamentos('valor_pago').sum(axis=1),
+        })
+        df = df[(df['Contagem'] > 0) & df['metodo_pagamento'].notna()]
+        return df.sort_values('metodo_pagamento').sort_values('Contagem', ascending=False)
+
+    def pagamentos_por_status(self):
+        if not self.possui_pagamentos():
+            return super().pagamentos_por_status()
+        df = pd.DataFrame({
+            'status_pagamento': self.cubo.status_pagamento,
+            'Contagem': self._total_pagamentos('num_pagamentos').sum(axis=0).astype(np.int64),
+        })
+        df = df[(df['Contagem'] > 0) & df['status_pagamento'].notna()]
+        return df.sort_values('Contagem', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,36 @@
+# dados_compartilhados.py
+# DataFrames de uma versão dos dados compartilhados (somente leitura) por todas as sessões do processo.
+# Com st.cache_data cada sessão recebia sua própria cópia (pickle) do histórico; aqui o objeto fica
+# em st.cache_resource e cada sessão recebe uma visão: cópia rasa que aponta para os mesmos
+# buffers (numpy / Arrow nas colunas de texto). Com copy-on-write do pandas, escrever numa visão
+# copia só o bloco alterado daquela visão e nunca altera os dados das outras sessões.
+# O copy-on-write é padrão no pandas >= 3; no 2.x ele não é ligado aqui (seria uma opção global do
+# processo) e a visão vira uma cópia completa.
+
+# Import Libs
+import pandas as pd
+
+# Sem copy-on-write, uma cópia rasa escreveria nos dados compartilhados
+_VISAO_RASA = int(pd.__version__.split('.')[0]) >= 3
+
+
+class DadosCompartilhados:
+    '''
+    Conjuntos de dados ({nome: DataFrame}) de uma versão, mais o relatório da carga que os produziu.
+    Os DataFrames guardados não são entregues diretamente: use visao()/visoes().
+    '''
+
+    def __init__(self, frames, relatorio_carga):
+        self._frames = dict(frames)
+        self._relatorio_carga = relatorio_carga
+
+    def visao(self, nome):
+        '''Visão sem cópia (pandas >= 3) do conjunto `nome`; alterações nela não afetam o original.'''
+        return self._frames[nome].copy(deep=not _VISAO_RASA)
+
+    def visoes(self, nomes):
+        return tuple(self.visao(nome) for nome in nomes)
+
+    @property
+    def relatorio_carga(self):
+        return self._relatorio_carga.copy(deep=not _VISAO_RASA)
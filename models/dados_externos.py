@@ -0,0 +1,393 @@
+# dados_externos.py
+# Conjuntos de dados externos (CEPEA e agro.gov) publicados no MinIO pelo pipeline/capture_web_data.py.
+# Antes os quatro CSVs eram baixados no import do relatorio_externo (e o main.py importa a página
+# sempre): todo processo novo esperava o MinIO, mesmo sem ninguém abrir o relatório. Agora:
+#   - nada é baixado no import; cada conjunto é carregado no primeiro uso;
+#   - o conjunto é o Parquet particionado de models/parquet_externo.py (parquet_exports/<nome>/);
+#     a versão é o ETag do manifesto e só as partições e colunas pedidas são baixadas/lidas.
+#     Buckets publicados antes do Parquet continuam funcionando pelos CSVs (csv_exports/);
+#   - a versão em memória (uma por processo, compartilhada entre as sessões) e a cópia em disco
+#     (DIRETORIO_EXTERNO) são identificadas pelo ETag;
+#   - depois de INTERVALO_VERIFICACAO segundos, o próximo uso devolve a cópia atual na hora e uma
+#     thread confere o ETag (HEAD); se o objeto mudou, baixa a versão nova e troca a cópia;
+#   - com o MinIO fora do ar, a última cópia em disco é usada (marcada como desatualizada);
+#   - cópias locais de outras versões só são apagadas depois de RETENCAO_LOCAL segundos sem uso
+#     (outra sessão ou outro worker pode ainda estar lendo a versão anterior).
+
+# Import Modulos
+from models.parquet_externo import MANIFESTO, filtrar, ler_particoes, selecionar_particoes
+
+# Import Libs
+import glob
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (só para saber se dá para gravar/ler Parquet)
+    _parquet_ok = True
+except ImportError:  # sem pyarrow os dados ficam só em memória
+    _parquet_ok = False
+
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+BUCKET_EXTERNO = os.getenv("MINIO_BUCKET_EXTERNO", "fornecedor-dados")
+
+DIRETORIO_EXTERNO = os.getenv("RELATORIO_EXTERNO_CACHE_DIR", os.path.join(".cache", "externo"))
+# Segundos entre conferências do ETag no bucket
+INTERVALO_VERIFICACAO = int(os.getenv("RELATORIO_EXTERNO_VERIFICACAO", "300"))
+# Segundos sem uso (mtime) para apagar a cópia local de uma versão que não é a atual
+RETENCAO_LOCAL = int(os.getenv("RELATORIO_EXTERNO_RETENCAO", "3600"))
+
+# Nome do conjunto -> prefixo do Parquet particionado no bucket
+PREFIXOS_PARQUET = {
+    'df_cepea': 'parquet_exports/df_cepea',
+    'df1_agro_gov': 'parquet_exports/df1_agro_gov',
+    'df2_agro_gov': 'parquet_exports/df2_agro_gov',
+    'df3_agro_gov': 'parquet_exports/df3_agro_gov',
+}
+
+# Nome do conjunto -> CSV publicado antes do Parquet (usado quando não há manifesto)
+OBJETOS_EXTERNOS = {
+    'df_cepea': 'csv_exports/df_cepea.csv',
+    'df1_agro_gov': 'csv_exports/df1_agro_gov.csv',
+    'df2_agro_gov': 'csv_exports/df2_agro_gov.csv',
+    'df3_agro_gov': 'csv_exports/df3_agro_gov.csv',
+}
+
+# Códigos do S3 para objeto inexistente (os demais erros contam como MinIO indisponível)
+_NAO_EXISTE = ('NoSuchKey', 'NoSuchObject')
+
+
+def cliente_minio():
+    '''Cliente do MinIO (o import fica aqui: sem o pacote o resto do sistema continua funcionando).'''
+    from minio import Minio
+    return Minio(endpoint=MINIO_ENDPOINT, access_key=MINIO_ACCESS_KEY,
+                 secret_key=MINIO_SECRET_KEY, secure=False)
+
+
+def _etag(valor):
+    return (valor or '').strip('"')
+
+
+def _seguro(etag):
+    # ETag de upload multipart tem '-N' no fim; só caracteres seguros no nome do arquivo
+    return re.sub(r'[^0-9A-Za-z_-]', '_', etag)
+
+
+def _caminho_local(diretorio, nome, etag):
+    '''Cópia local do CSV (convertida para Parquet) da versão `etag`.'''
+    return os.path.join(diretorio, f"{nome}--{_seguro(etag)}.parquet")
+
+
+def _pasta_local(diretorio, nome, etag):
+    '''Pasta local do Parquet particionado da versão `etag` (manifesto + partições já baixadas).'''
+    return os.path.join(diretorio, f"{nome}--{_seguro(etag)}")
+
+
+def _marcar_uso(caminho):
+    '''Renova o mtime da cópia local: versões em uso (em qualquer processo) não são apagadas.'''
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+
+
+class VersaoExterna:
+    '''
+    Um conjunto carregado: ETag de origem, quando foi conferido e se está desatualizado.
+    Parquet: `manifesto` e `pasta` local; CSV antigo: `df` inteiro. `leituras` guarda os DataFrames
+    já lidos por (colunas, filtros).
+    '''
+
+    def __init__(self, etag, df=None, manifesto=None, pasta=None, desatualizado=False):
+        self.etag = etag
+        self.df = df
+        self.manifesto = manifesto
+        self.pasta = pasta
+        self.leituras = {}
+        self.verificado_em = time.monotonic()
+        self.desatualizado = desatualizado
+
+
+def _chave_leitura(colunas, filtros):
+    filtros = tuple(sorted((coluna, condicao if isinstance(condicao, tuple) else tuple(sorted(condicao)))
+                           for coluna, condicao in (filtros or {}).items()))
+    return (None if colunas is None else tuple(colunas)), filtros
+
+
+class CacheExterno:
+    '''
+    Conjuntos externos de um processo (st.cache_resource). obter() nunca espera o MinIO para conferir
+    a versão depois da primeira carga: a conferência do ETag e a troca de versão rodam em segundo plano.
+    '''
+
+    def __init__(self, bucket=BUCKET_EXTERNO, prefixos=PREFIXOS_PARQUET, objetos=OBJETOS_EXTERNOS,
+                 diretorio=DIRETORIO_EXTERNO, intervalo=INTERVALO_VERIFICACAO, retencao=RETENCAO_LOCAL,
+                 fabrica_cliente=cliente_minio):
+        self.bucket = bucket
+        self.prefixos = dict(prefixos)
+        self.objetos = dict(objetos)
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.retencao = retencao
+        self._fabrica_cliente = fabrica_cliente
+        self._cliente = None
+        self._versoes = {}
+        self._em_atualizacao = set()
+        self._locks = {nome: threading.Lock() for nome in set(self.prefixos) | set(self.objetos)}
+        self._lock = threading.Lock()
+
+    def _minio(self):
+        with self._lock:
+            if self._cliente is None:
+                self._cliente = self._fabrica_cliente()
+            return self._cliente
+
+    def _versao(self, nome):
+        '''Versão atual do conjunto (carrega na primeira chamada) ou None se não houver como carregar.'''
+        versao = self._versoes.get(nome)
+        if versao is None:
+            with self._locks[nome]:  # sessões simultâneas esperam uma única carga
+                versao = self._versoes.get(nome)
+                if versao is None:
+                    versao = self._carregar(nome)
+                    if versao is None:
+                        return None
+                    self._versoes[nome] = versao
+        elif time.monotonic() - versao.verificado_em >= self.intervalo:
+            self.atualizar_em_segundo_plano(nome)
+        return versao
+
+    def obter(self, nome, colunas=None, filtros=None):
+        '''
+        Visão (cópia rasa) do conjunto `nome` só com as `colunas` pedidas (None = todas) e as linhas
+        que passam em `filtros` ({coluna: (mínimo, máximo) ou lista de valores}); filtros nas colunas
+        de partição (ANO...) evitam baixar e ler as outras partições.
+        None se não houver nem o MinIO nem cópia local.
+        '''
+        versao = self._versao(nome)
+        if versao is None:
+            return None
+        chave = _chave_leitura(colunas, filtros)
+        df = versao.leituras.get(chave)
+        if df is None:
+            with self._locks[nome]:
+                df = versao.leituras.get(chave)
+                if df is None:
+                    df = self._ler(nome, versao, colunas, filtros)
+                    if df is None:
+                        return None
+                    versao.leituras[chave] = df
+        return df.copy(deep=False)
+
+    def valores_particao(self, nome, coluna):
+        '''Valores da coluna de partição no manifesto (sem ler dados) ou None se não for partição.'''
+        versao = self._versao(nome)
+        if versao is None or versao.manifesto is None or coluna not in versao.manifesto['particoes']:
+            return None
+        return sorted({item['valores'][coluna] for item in versao.manifesto['lista']})
+
+    def info(self, nome):
+        '''(ETag, segundos desde a última conferência, desatualizado) ou None se ainda não carregado.'''
+        versao = self._versoes.get(nome)
+        if versao is None:
+            return None
+        return versao.etag, time.monotonic() - versao.verificado_em, versao.desatualizado
+
+    def atualizar_em_segundo_plano(self, nome):
+        '''Confere o ETag numa thread (no máximo uma por conjunto) e troca a cópia se o objeto mudou.'''
+        with self._lock:
+            if nome in self._em_atualizacao:
+                return None
+            self._em_atualizacao.add(nome)
+        thread = threading.Thread(target=self._atualizar, args=(nome,),
+                                  name=f'externo_{nome}', daemon=True)
+        thread.start()
+        return thread
+
+    def _atualizar(self, nome):
+        try:
+            with self._locks[nome]:
+                atual = self._versoes.get(nome)
+                versao = self._carregar(nome, atual)
+                if versao is not None:
+                    self._versoes[nome] = versao
+        finally:
+            with self._lock:
+                self._em_atualizacao.discard(nome)
+
+    def _carregar(self, nome, atual=None):
+        '''
+        Versão do conjunto segundo o ETag atual do manifesto Parquet (ou do CSV, se não houver
+        manifesto): a própria `atual` (só renova a conferência) se não mudou, senão uma versão nova.
+        Sem acesso ao MinIO: `atual` ou a cópia em disco mais recente, marcadas como desatualizadas.
+        '''
+        prefixo = self.prefixos.get(nome)
+        objeto = f"{prefixo}/{MANIFESTO}" if prefixo else self.objetos[nome]
+        parquet = prefixo is not None
+        try:
+            try:
+                etag = _etag(self._minio().stat_object(self.bucket, objeto).etag)
+            except Exception as e:
+                if not parquet or getattr(e, 'code', None) not in _NAO_EXISTE or nome not in self.objetos:
+                    raise
+                objeto, parquet = self.objetos[nome], False  # publicado antes do Parquet
+                etag = _etag(self._minio().stat_object(self.bucket, objeto).etag)
+        except Exception as e:
+            print(f"Erro ao consultar {objeto} no bucket {self.bucket}: {e}")
+            if atual is not None:
+                atual.verificado_em = time.monotonic()
+                atual.desatualizado = True
+                return atual
+            return self._ultima_copia_local(nome)
+
+        if atual is not None and atual.etag == etag:
+            atual.verificado_em = time.monotonic()
+            atual.desatualizado = False
+            return atual
+        try:
+            return self._versao_parquet(nome, objeto, etag) if parquet else self._versao_csv(nome, objeto, etag)
+        except Exception as e:
+            print(f"Erro ao baixar {objeto} do bucket {self.bucket}: {e}")
+            return atual if atual is not None else self._ultima_copia_local(nome)
+
+    def _versao_parquet(self, nome, objeto, etag):
+        '''Baixa só o manifesto (as partições vêm sob demanda) e apaga as pastas de outras versões.'''
+        pasta = _pasta_local(self.diretorio, nome, etag)
+        caminho = os.path.join(pasta, MANIFESTO)
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                manifesto = json.load(arquivo)
+        else:
+            resposta = self._minio().get_object(self.bucket, objeto)
+            try:
+                conteudo = resposta.read()
+            finally:
+                resposta.close()
+                resposta.release_conn()
+            manifesto = json.loads(conteudo.decode('utf-8'))
+            self._gravar_arquivo(caminho, conteudo)
+            print(f"Manifesto {objeto} baixado do bucket {self.bucket} (ETag {etag}): "
+                  f"{manifesto['linhas']} linhas em {len(manifesto['lista'])} partição(ões).")
+        self._remover_outras_versoes(nome, pasta)
+        return VersaoExterna(etag, manifesto=manifesto, pasta=pasta)
+
+    def _versao_csv(self, nome, objeto, etag):
+        df = self._ler_local(_caminho_local(self.diretorio, nome, etag))
+        if df is None:
+            df, etag = self._baixar_csv(objeto)
+            self._salvar_local(nome, etag, df)
+        return VersaoExterna(etag, df=df)
+
+    def _ler(self, nome, versao, colunas, filtros):
+        '''Colunas/linhas pedidas da versão; no Parquet, baixa antes as partições que ainda não estão no disco.'''
+        if versao.manifesto is None:
+            df = filtrar(versao.df, filtros)
+            return df if colunas is None else df[list(colunas)]
+        _marcar_uso(versao.pasta)
+        arquivos = []
+        for item in selecionar_particoes(versao.manifesto, filtros):
+            caminho = os.path.join(versao.pasta, item['arquivo'])
+            if not os.path.exists(caminho):
+                objeto = f"{self.prefixos[nome]}/{item['arquivo']}"
+                try:
+                    resposta = self._minio().get_object(self.bucket, objeto)
+                    try:
+                        self._gravar_arquivo(caminho, resposta.read())
+                    finally:
+                        resposta.close()
+                        resposta.release_conn()
+                except Exception as e:
+                    print(f"Erro ao baixar a partição {objeto} do bucket {self.bucket}: {e}")
+                    # Publicação já apagada do bucket: confere o manifesto para o próximo uso
+                    self.atualizar_em_segundo_plano(nome)
+                    return None
+            arquivos.append((item, caminho))
+        return ler_particoes(arquivos, versao.manifesto, colunas, filtros)
+
+    @staticmethod
+    def _gravar_arquivo(caminho, conteudo):
+        '''Grava num temporário e troca com os.replace (leitores nunca veem um arquivo pela metade).'''
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
+
+    def _remover_outras_versoes(self, nome, atual):
+        '''Apaga as cópias de outras versões sem uso há mais de `retencao` segundos (ver _marcar_uso).'''
+        limite = time.time() - self.retencao
+        for antiga in glob.glob(os.path.join(self.diretorio, f"{nome}--*")):
+            try:
+                if antiga == atual or os.path.getmtime(antiga) > limite:
+                    continue
+                if os.path.isdir(antiga):
+                    shutil.rmtree(antiga, ignore_errors=True)
+                else:
+                    os.remove(antiga)
+            except OSError:
+                pass  # já apagada por outro processo
+
+    def _baixar_csv(self, objeto):
+        '''Download do CSV: (DataFrame, ETag da versão baixada).'''
+        resposta = self._minio().get_object(self.bucket, objeto)
+        try:
+            etag = _etag(resposta.headers.get('ETag'))
+            df = pd.read_csv(resposta, sep=',')
+        finally:
+            resposta.close()
+            resposta.release_conn()
+        print(f"Arquivo {objeto} baixado com sucesso do bucket {self.bucket} (ETag {etag}).")
+        return df, etag
+
+    def _ler_local(self, caminho):
+        if not _parquet_ok or not os.path.exists(caminho):
+            return None
+        try:
+            return pd.read_parquet(caminho)
+        except Exception as e:
+            print(f"Erro ao ler a cópia local {caminho}: {e}")
+            return None
+
+    def _salvar_local(self, nome, etag, df):
+        '''Grava a cópia do CSV como Parquet (temporário + os.replace) e apaga as de outros ETags.'''
+        if not _parquet_ok or not etag:
+            return
+        caminho = _caminho_local(self.diretorio, nome, etag)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            df.to_parquet(temporario, index=False, compression='zstd')
+            os.replace(temporario, caminho)
+        except Exception as e:
+            print(f"Erro ao gravar a cópia local de {nome}: {e}")
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return
+        self._remover_outras_versoes(nome, caminho)
+
+    def _ultima_copia_local(self, nome):
+        '''Cópia local mais recente (pasta Parquet com manifesto ou CSV convertido), marcada como desatualizada.'''
+        copias = [c for c in glob.glob(os.path.join(self.diretorio, f"{nome}--*"))
+                  if not c.endswith('.tmp') and (not os.path.isdir(c) or os.path.exists(os.path.join(c, MANIFESTO)))]
+        if not copias:
+            return None
+        caminho = max(copias, key=os.path.getmtime)
+        print(f"MinIO indisponível: usando a cópia local de {nome} ({caminho}).")
+        if os.path.isdir(caminho):
+            with open(os.path.join(caminho, MANIFESTO), encoding='utf-8') as arquivo:
+                manifesto = json.load(arquivo)
+            etag = os.path.basename(caminho)[len(nome) + 2:]
+            return VersaoExterna(etag, manifesto=manifesto, pasta=caminho, desatualizado=True)
+        df = self._ler_local(caminho)
+        if df is None:
+            return None
+        etag = os.path.basename(caminho)[len(nome) + 2:-len('.parquet')]
+        return VersaoExterna(etag, df=df, desatualizado=True)
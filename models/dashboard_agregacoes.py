@@ -0,0 +1,442 @@
+# dashboard_agregacoes.py
+# Agregações dos gráficos do dashboard.
+# Cada gráfico pede apenas o resultado já agregado (tamanho do gráfico) a um "agregador":
+#   - AgregadorPandas: calcula em memória sobre os DataFrames carregados (modo 'memoria')
+#   - AgregadorSQL: envia GROUP BY/date_trunc/LIMIT parametrizados ao PostgreSQL (modo 'sql')
+# Os dois expõem os mesmos métodos e retornam as mesmas colunas.
+
+# Import Modulos
+from driver.psycopg2_connect import PostgresConnect
+from models.filtro_temporal import FiltroTemporal, mascara_categorias
+from models.diagnostico_render import medir
+
+# Import Libs
+import pandas as pd
+import streamlit as st
+
+# Colunas da tabela de itens de pedido vendidos
+COLUNAS_ITENS_DETALHADOS = [
+    'data_pedido', 'nome_cliente', 'nome_produto', 'tipo_corte',
+    'quantidade', 'unidade_medida', 'preco_unitario', 'valor_item_calculado', 'lucro_item', 'status_pedido'
+]
+
+# Frequências aceitas pelos gráficos temporais (mesmos aliases do pandas)
+FREQUENCIAS = ('D', 'W-MON', 'ME', 'YE')
+
+# Rótulo do período no mesmo padrão do pd.Grouper (fim da semana/mês/ano)
+_PERIODOS_SQL = {
+    'D': "{col}",
+    'W-MON': "({col} + MOD(8 - EXTRACT(ISODOW FROM {col})::int, 7))",
+    'ME': "(date_trunc('month', {col}) + INTERVAL '1 month - 1 day')::date",
+    'YE': "make_date(EXTRACT(YEAR FROM {col})::int, 12, 31)",
+}
+
+# Colunas que podem ser usadas em filtros/opções (evita SQL dinâmico com texto do usuário)
+_COLUNAS_ITENS = {
+    'tipo_corte': 'prod.tipo_corte',
+    'status_pedido': 'p.status',
+    'nome_produto': 'prod.nome_produto',
+    'tipo_cliente': 'c.tipo_cliente',
+}
+
+_METRICAS_ITENS = {
+    'quantidade': 'ip.quantidade',
+    'valor_item_calculado': 'ip.quantidade * ip.preco_unitario',
+    'lucro_item': 'COALESCE(ip.lucro_item, 0)',  # coluna gerada com o custo gravado na venda
+}
+
+_SQL_ITENS = """
+    FROM tb_pedido p
+    JOIN tb_cliente c ON p.id_cliente = c.id_cliente
+    JOIN tb_item_pedido ip ON p.id_pedido = ip.id_pedido
+    JOIN tb_produto prod ON ip.id_produto = prod.id_produto
+    WHERE p.data_pedido BETWEEN %(inicio)s AND %(fim)s
+"""
+
+# Pedidos com ao menos um item válido (mesmo recorte do JOIN de itens)
+_SQL_PEDIDOS = """
+    FROM tb_pedido p
+    JOIN tb_cliente c ON p.id_cliente = c.id_cliente
+    WHERE p.data_pedido BETWEEN %(inicio)s AND %(fim)s
+      AND EXISTS (
+          SELECT 1
+          FROM tb_item_pedido ip
+          JOIN tb_produto prod ON ip.id_produto = prod.id_produto
+          WHERE ip.id_pedido = p.id_pedido
+      )
+"""
+
+_SQL_PAGAMENTOS = """
+    FROM tb_pagamento pa
+    JOIN tb_pedido ped ON pa.id_pedido = ped.id_pedido
+    WHERE pa.data_pagamento BETWEEN %(inicio)s AND %(fim)s
+"""
+
+
+def _validar_frequencia(freq):
+    if freq not in FREQUENCIAS:
+        raise ValueError(f"Frequência '{freq}' não suportada. Use uma de {FREQUENCIAS}.")
+
+
+def _completar_periodos(df, freq, coluna_data='data_pedido'):
+    """
+    Preenche com zero os períodos sem movimento, como o pd.Grouper faz no modo em memória.
+    """
+    if df.empty:
+        return df
+    df = df.copy()
+    df[coluna_data] = pd.to_datetime(df[coluna_data])
+    return df.set_index(coluna_data).sort_index().asfreq(freq, fill_value=0).reset_index()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def consultar_agregacao(query, params=None, table_name="agregação"):
+    """
+    Executa uma consulta agregada parametrizada no PostgreSQL com cache.
+    O cache é indexado pela query e pelos parâmetros (período e filtros).
+    """
+    db_connection = PostgresConnect()
+    if db_connection.conn is None or db_connection.conn.closed:
+        st.error(f"Erro ao conectar ao banco para carregar {table_name}. Verifique as credenciais e o status do DB.")
+        return pd.DataFrame()
+    try:
+        with medir('espera_dados'):  # modo diagnóstico do dashboard
+            return pd.read_sql(query, db_connection.conn, params=params)
+    except Exception as e:
+        st.error(f"Erro na consulta {table_name}: {e}")
+        return pd.DataFrame()
+    finally:
+        db_connection.close_connection()
+
+
+class AgregadorPandas:
+    '''
+    Agregações calculadas em memória sobre os DataFrames já preparados e filtrados pelo período.
+    '''
+
+    def __init__(self, df_pedidos_detalhes, df_pagamentos=None):
+        self.df_pedidos = df_pedidos_detalhes
+        self.df_pagamentos = df_pagamentos if df_pagamentos is not None else pd.DataFrame()
+
+    def _pedidos_unicos(self):
+        return self.df_pedidos.drop_duplicates(subset=['id_pedido'])
+
+    def _filtrar(self, df, coluna, valores):
+        if valores:
+            return df[mascara_categorias(df[coluna], valores)]
+        return df
+
+    def possui_pedidos(self):
+        return not self.df_pedidos.empty
+
+    def possui_pagamentos(self):
+        return not self.df_pagamentos.empty
+
+    def opcoes(self, coluna):
+        if self.df_pedidos.empty:
+            return []
+        return sorted(self.df_pedidos[coluna].dropna().unique())
+
+    def resumo_kpis(self, inicio_semana, fim_semana):
+        df = self.df_pedidos
+        if df.empty:
+            return {'total_vendas': 0, 'total_pedidos': 0, 'lucro_semanal': 0,
+                    'lucro_por_ano': pd.DataFrame(columns=['ano_pedido', 'lucro_item'])}
+        semana = FiltroTemporal(df, 'data_pedido').periodo(inicio_semana, fim_semana)
+        return {
+            'total_vendas': self._pedidos_unicos()['valor_total'].sum(),
+            'total_pedidos': df['id_pedido'].nunique(),
+            'lucro_semanal': semana['lucro_item'].sum(),
+            'lucro_por_ano': df.groupby('ano_pedido')['lucro_item'].sum().reset_index(),
+        }
+
+    def vendas_por_periodo(self, freq):
+        _validar_frequencia(freq)
+        return self._pedidos_unicos().groupby(
+            pd.Grouper(key='data_pedido', freq=freq)
+        )['valor_total'].sum().reset_index()
+
+    def pedidos_por_periodo(self, freq):
+        _validar_frequencia(freq)
+        return self.df_pedidos.groupby(
+            pd.Grouper(key='data_pedido', freq=freq)
+        )['id_pedido'].nunique().reset_index(name='num_pedidos')
+
+    def top_produtos(self, metrica, tipos_corte=None, limite=10):
+        df = self._filtrar(self.df_pedidos, 'tipo_corte', tipos_corte)
+        return df.groupby('nome_produto', observed=True)[metrica].sum().nlargest(limite).reset_index()
+
+    def soma_por_corte(self, metrica):
+        return self.df_pedidos.groupby('tipo_corte', observed=True)[metrica].sum().reset_index()
+
+    def tendencia_produto(self, nome_produto, freq='ME'):
+        _validar_frequencia(freq)
+        df = self.df_pedidos[self.df_pedidos['nome_produto'] == nome_produto]
+        return df.groupby(pd.Grouper(key='data_pedido', freq=freq)).agg(
+            Quantidade_Vendida=('quantidade', 'sum'),
+            Valor_Vendido=('valor_item_calculado', 'sum'),
+            Lucro_Gerado=('lucro_item', 'sum')
+        ).reset_index()
+
+    def total_clientes_compradores(self):
+        return self.df_pedidos['nome_cliente'].nunique() if not self.df_pedidos.empty else 0
+
+    def top_clientes(self, limite=10):
+        df = self.df_pedidos.drop_duplicates(subset=['id_pedido', 'nome_cliente'])
+        return df.groupby('nome_cliente', observed=True)['valor_total'].sum().nlargest(limite).reset_index()
+
+    def vendas_por_tipo_cliente(self):
+        df = self.df_pedidos.drop_duplicates(subset=['id_pedido', 'nome_cliente'])
+        return df.groupby('tipo_cliente', observed=True)['valor_total'].sum().reset_index()
+
+    def resumo_status(self, status):
+        df = self._filtrar(self._pedidos_unicos(), 'status_pedido', status)
+        return df.groupby('status_pedido', observed=True).agg(
+            Total_Pedidos=('id_pedido', 'nunique'),
+            Valor_Total=('valor_total', 'sum')
+        ).reset_index().sort_values('Total_Pedidos', ascending=False)
+
+    def status_por_periodo(self, status, freq='ME'):
+        _validar_frequencia(freq)
+        df = self._filtrar(self._pedidos_unicos(), 'status_pedido', status)
+        return df.groupby([
+            pd.Grouper(key='data_pedido', freq=freq),
+            'status_pedido'
+        ], observed=True)['id_pedido'].nunique().reset_index(name='Contagem')
+
+    def pedidos_por_status(self, status):
+        df = self._filtrar(self._pedidos_unicos(), 'status_pedido', status)
+        return df[['id_pedido', 'data_pedido', 'nome_cliente', 'valor_total', 'status_pedido']]
+
+    def pagamentos_por_metodo(self):
+        return self.df_pagamentos.groupby('metodo_pagamento').agg(
+            Contagem=('id_pagamento', 'size'),
+            valor_pago=('valor_pago', 'sum')
+        ).reset_index().sort_values('Contagem', ascending=False)
+
+    def pagamentos_por_status(self):
+        contagem = self.df_pagamentos['status_pagamento'].value_counts()
+        return contagem[contagem > 0].reset_index(name='Contagem')  # categorias sem pagamento no período ficam de fora
+
+
+class AgregadorSQL:
+    '''
+    Agregações executadas no PostgreSQL: só o resultado do tamanho do gráfico volta para o app.
+    O período da barra lateral e os filtros são sempre enviados como parâmetros.
+    '''
+
+    def __init__(self, start_date, end_date):
+        self.params = {'inicio': start_date, 'fim': end_date}
+
+    def _consultar(self, query, table_name, **params):
+        return consultar_agregacao(query, {**self.params, **params}, table_name)
+
+    def _filtro_lista(self, coluna, valores, nome_param, params):
+        if not valores:
+            return ""
+        params[nome_param] = list(valores)
+        return f" AND {_COLUNAS_ITENS[coluna]} = ANY(%({nome_param})s)"
+
+    @staticmethod
+    def intervalo_datas():
+        '''Menor e maior data de pedido (limites do filtro de período).'''
+        df = consultar_agregacao(
+            "SELECT MIN(data_pedido) AS min_data, MAX(data_pedido) AS max_data FROM tb_pedido",
+            None, "período dos pedidos"
+        )
+        if df.empty or pd.isna(df.loc[0, 'min_data']):
+            return None, None
+        return pd.to_datetime(df.loc[0, 'min_data']).date(), pd.to_datetime(df.loc[0, 'max_data']).date()
+
+    def possui_pedidos(self):
+        df = self._consultar(f"SELECT EXISTS (SELECT 1 {_SQL_ITENS}) AS existe", "pedidos")
+        return bool(not df.empty and df.loc[0, 'existe'])
+
+    def possui_pagamentos(self):
+        df = self._consultar(f"SELECT EXISTS (SELECT 1 {_SQL_PAGAMENTOS}) AS existe", "pagamentos")
+        return bool(not df.empty and df.loc[0, 'existe'])
+
+    def opcoes(self, coluna):
+        expr = _COLUNAS_ITENS[coluna]
+        df = self._consultar(
+            f"SELECT DISTINCT {expr} AS valor {_SQL_ITENS} AND {expr} IS NOT NULL ORDER BY 1",
+            f"opções de {coluna}"
+        )
+        return df['valor'].tolist() if not df.empty else []
+
+    def resumo_kpis(self, inicio_semana, fim_semana):
+        lucro = _METRICAS_ITENS['lucro_item']
+        totais = self._consultar(
+            f"""
+            WITH pedidos AS (SELECT p.valor_total {_SQL_PEDIDOS})
+            SELECT COALESCE(SUM(valor_total), 0) AS total_vendas, COUNT(*) AS total_pedidos
+            FROM pedidos
+            """,
+            "KPIs de vendas"
+        )
+        lucro_por_ano = self._consultar(
+            f"""
+            SELECT EXTRACT(YEAR FROM p.data_pedido)::int AS ano_pedido,
+                   SUM({lucro}) AS lucro_item,
+                   SUM({lucro}) FILTER (WHERE p.data_pedido BETWEEN %(inicio_semana)s AND %(fim_semana)s)
+                       AS lucro_semanal
+            {_SQL_ITENS}
+            GROUP BY 1
+            ORDER BY 1
+            """,
+            "KPIs de lucro", inicio_semana=inicio_semana, fim_semana=fim_semana
+        )
+        return {
+            'total_vendas': float(totais.loc[0, 'total_vendas']) if not totais.empty else 0,
+            'total_pedidos': int(totais.loc[0, 'total_pedidos']) if not totais.empty else 0,
+            'lucro_semanal': float(lucro_por_ano['lucro_semanal'].fillna(0).sum()) if not lucro_por_ano.empty else 0,
+            'lucro_por_ano': lucro_por_ano[['ano_pedido', 'lucro_item']] if not lucro_por_ano.empty
+            else pd.DataFrame(columns=['ano_pedido', 'lucro_item']),
+        }
+
+    def vendas_por_periodo(self, freq):
+        _validar_frequencia(freq)
+        periodo = _PERIODOS_SQL[freq].format(col='p.data_pedido')
+        df = self._consultar(
+            f"SELECT {periodo} AS data_pedido, SUM(p.valor_total) AS valor_total {_SQL_PEDIDOS} GROUP BY 1 ORDER BY 1",
+            "vendas por período"
+        )
+        return _completar_periodos(df, freq)
+
+    def pedidos_por_periodo(self, freq):
+        _validar_frequencia(freq)
+        periodo = _PERIODOS_SQL[freq].format(col='p.data_pedido')
+        df = self._consultar(
+            f"SELECT {periodo} AS data_pedido, COUNT(*) AS num_pedidos {_SQL_PEDIDOS} GROUP BY 1 ORDER BY 1",
+            "pedidos por período"
+        )
+        return _completar_periodos(df, freq)
+
+    def top_produtos(self, metrica, tipos_corte=None, limite=10):
+        params = {'limite': int(limite)}
+        filtro = self._filtro_lista('tipo_corte', tipos_corte, 'tipos_corte', params)
+        return self._consultar(
+            f"""
+            SELECT prod.nome_produto, SUM({_METRICAS_ITENS[metrica]}) AS {metrica}
+            {_SQL_ITENS}{filtro}
+            GROUP BY 1
+            ORDER BY 2 DESC
+            LIMIT %(limite)s
+            """,
+            "top produtos", **params
+        )
+
+    def soma_por_corte(self, metrica):
+        return self._consultar(
+            f"SELECT prod.tipo_corte, SUM({_METRICAS_ITENS[metrica]}) AS {metrica} {_SQL_ITENS} GROUP BY 1 ORDER BY 1",
+            "vendas por tipo de corte"
+        )
+
+    def tendencia_produto(self, nome_produto, freq='ME'):
+        _validar_frequencia(freq)
+        periodo = _PERIODOS_SQL[freq].format(col='p.data_pedido')
+        df = self._consultar(
+            f"""
+            SELECT {periodo} AS data_pedido,
+                   SUM({_METRICAS_ITENS['quantidade']}) AS "Quantidade_Vendida",
+                   SUM({_METRICAS_ITENS['valor_item_calculado']}) AS "Valor_Vendido",
+                   SUM({_METRICAS_ITENS['lucro_item']}) AS "Lucro_Gerado"
+            {_SQL_ITENS} AND prod.nome_produto = %(nome_produto)s
+            GROUP BY 1
+            ORDER BY 1
+            """,
+            "tendência do produto", nome_produto=nome_produto
+        )
+        return _completar_periodos(df, freq)
+
+    def total_clientes_compradores(self):
+        df = self._consultar(
+            f"SELECT COUNT(DISTINCT c.nome_cliente) AS total {_SQL_PEDIDOS}", "clientes compradores"
+        )
+        return int(df.loc[0, 'total']) if not df.empty else 0
+
+    def top_clientes(self, limite=10):
+        return self._consultar(
+            f"""
+            SELECT c.nome_cliente, SUM(p.valor_total) AS valor_total
+            {_SQL_PEDIDOS}
+            GROUP BY 1
+            ORDER BY 2 DESC
+            LIMIT %(limite)s
+            """,
+            "top clientes", limite=int(limite)
+        )
+
+    def vendas_por_tipo_cliente(self):
+        return self._consultar(
+            f"SELECT c.tipo_cliente, SUM(p.valor_total) AS valor_total {_SQL_PEDIDOS} GROUP BY 1 ORDER BY 1",
+            "vendas por tipo de cliente"
+        )
+
+    def resumo_status(self, status):
+        params = {}
+        filtro = self._filtro_lista('status_pedido', status, 'status', params)
+        return self._consultar(
+            f"""
+            SELECT p.status AS status_pedido, COUNT(*) AS "Total_Pedidos", SUM(p.valor_total) AS "Valor_Total"
+            {_SQL_PEDIDOS}{filtro}
+            GROUP BY 1
+            ORDER BY 2 DESC
+            """,
+            "resumo por status", **params
+        )
+
+    def status_por_periodo(self, status, freq='ME'):
+        _validar_frequencia(freq)
+        params = {}
+        filtro = self._filtro_lista('status_pedido', status, 'status', params)
+        periodo = _PERIODOS_SQL[freq].format(col='p.data_pedido')
+        df = self._consultar(
+            f"""
+            SELECT {periodo} AS data_pedido, p.status AS status_pedido, COUNT(*) AS "Contagem"
+            {_SQL_PEDIDOS}{filtro}
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            """,
+            "status por período", **params
+        )
+        if not df.empty:
+            df['data_pedido'] = pd.to_datetime(df['data_pedido'])
+        return df
+
+    def pedidos_por_status(self, status):
+        params = {}
+        filtro = self._filtro_lista('status_pedido', status, 'status', params)
+        df = self._consultar(
+            f"""
+            SELECT p.id_pedido, p.data_pedido, c.nome_cliente, p.valor_total, p.status AS status_pedido
+            {_SQL_PEDIDOS}{filtro}
+            ORDER BY p.data_pedido, p.id_pedido
+            """,
+            "pedidos por status", **params
+        )
+        if not df.empty:
+            df['data_pedido'] = pd.to_datetime(df['data_pedido'])
+        return df
+
+    def pagamentos_por_metodo(self):
+        return self._consultar(
+            f"""
+            SELECT pa.metodo_pagamento, COUNT(*) AS "Contagem", SUM(pa.valor_pago) AS valor_pago
+            {_SQL_PAGAMENTOS}
+            GROUP BY 1
+            ORDER BY 2 DESC
+            """,
+            "pagamentos por método"
+        )
+
+    def pagamentos_por_status(self):
+        return self._consultar(
+            f"""
+            SELECT pa.status AS status_pagamento, COUNT(*) AS "Contagem"
+            {_SQL_PAGAMENTOS}
+            GROUP BY 1
+            ORDER BY 2 DESC
+            """,
+            "pagamentos por status"
+        )
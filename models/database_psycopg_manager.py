@@ -52,6 +52,44 @@ class Manage_database(PostgresConnect): # Não precisa de 'as driver' aqui, já
             print(f"Erro ao ler a tabela {table_name}: {e}")
             return None
         
+    def read_page(self, table_name, id_column, columns=None, after_id=None, limit=50):
+        '''
+        Lê uma página da tabela ordenada pela chave primária (keyset: id > after_id, sem OFFSET).
+        Retorna (DataFrame da página, id para a próxima página ou None se for a última).
+        '''
+        if self.conn is None or self.conn.closed:
+            print("Erro: Conexão com o banco de dados não está ativa para leitura.")
+            return None, None
+
+        params = {'limite': int(limit) + 1}
+        where = ""
+        if after_id is not None:
+            params['apos'] = after_id
+            where = f" WHERE {id_column} > %(apos)s"
+        try:
+            df = pd.read_sql(
+                f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}{where} "
+                f"ORDER BY {id_column} LIMIT %(limite)s",
+                self.conn, params=params
+            )
+        except Exception as e:
+            print(f"Erro ao ler a página de {table_name}: {e}")
+            self.rollback()
+            return None, None
+
+        if len(df) <= int(limit):
+            return df, None
+        df = df.iloc[:int(limit)]
+        return df, df[id_column].iloc[-1].item()
+
+    def export_table_csv(self, table_name, id_column, columns=None):
+        '''
+        Tabela inteira em CSV (UTF-8), ordenada pela chave primária, num arquivo temporário (ver copy_to_csv).
+        '''
+        return self.copy_to_csv(
+            f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name} ORDER BY {id_column}"
+        )
+
     def insert_dataframe_batch(self, table_name, df_to_insert, id_column_to_exclude=None):
         if self.conn is None or self._cursor is None: # Usando self._cursor
             st.error("Conexão ou cursor do banco de dados não está ativa para inserção em lote.")
@@ -88,4 +126,137 @@ class Manage_database(PostgresConnect): # Não precisa de 'as driver' aqui, já
             st.error(f"Erro ao inserir dados em lote na tabela '{table_name}': {e}\n"
                      f"Verifique se as colunas do CSV correspondem às colunas da tabela: {columns}")
             return False
-    
\ No newline at end of file
+
+    def read_stock_balance(self, id_produto=None):
+        '''
+        Lê o saldo de estoque mantido por trigger (tb_saldo_estoque).
+        Com id_produto retorna apenas a quantidade disponível do produto (busca pela chave primária),
+        sem id_produto retorna o DataFrame completo por produto x localização x mês de validade.
+        '''
+        if self.conn is None or self.conn.closed:
+            print("Erro: Conexão com o banco de dados não está ativa para leitura do saldo.")
+            return None
+
+        try:
+            if id_produto is not None:
+                cur = self.get_cursor()
+                cur.execute("SELECT fn_saldo_disponivel(%s)", (int(id_produto),))
+                return cur.fetchone()[0]
+            return pd.read_sql(
+                "SELECT id_produto, localizacao, mes_validade, quantidade_disponivel "
+                "FROM tb_saldo_estoque ORDER BY id_produto, mes_validade, localizacao",
+                self.conn
+            )
+        except Exception as e:
+            print(f"Erro ao ler o saldo de estoque: {e}")
+            self.rollback()
+            return None
+
+    def check_stock_balance(self, rebuild=False):
+        '''
+        Compara tb_saldo_estoque com o saldo calculado a partir de tb_estoque/tb_produto_entrada.
+        Retorna um DataFrame com as divergências (vazio = consistente).
+        Com rebuild=True reconstrói a tabela do zero quando houver divergência.
+        '''
+        if self.conn is None or self.conn.closed:
+            print("Erro: Conexão com o banco de dados não está ativa para verificar o saldo.")
+            return None
+
+        try:
+            divergencias = pd.read_sql("SELECT * FROM fn_saldo_estoque_verificar()", self.conn)
+            if rebuild and not divergencias.empty:
+                cur = self.get_cursor()
+                cur.execute("SELECT fn_saldo_estoque_reconstruir()")
+                linhas = cur.fetchone()[0]
+                self.commit()
+                print(f"Saldo de estoque reconstruído: {linhas} faixas.")
+            return divergencias
+        except Exception as e:
+            print(f"Erro ao verificar o saldo de estoque: {e}")
+            self.rollback()
+            return None
+
+    def search_records(self, table_name, id_column, search_columns, termo, limite=20):
+        '''
+        Busca registros por texto (nome, CNPJ, e-mail) usando os índices de trigramas (adjustments_sql/busca_trgm.sql).
+        Retorna no máximo `limite` linhas (id + colunas de busca), da mais parecida para a menos parecida.
+        Um termo só com dígitos também encontra o registro pelo id; com menos de 3 dígitos a busca é
+        só pelo id (trigramas não atendem padrões tão curtos: cada coluna seria varrida inteira).
+        '''
+        if self.conn is None or self.conn.closed:
+            print("Erro: Conexão com o banco de dados não está ativa para busca.")
+            return None
+
+        termo = (termo or "").strip()
+        if not termo or not search_columns:
+            return pd.DataFrame(columns=[id_column] + list(search_columns))
+
+        if termo.isdigit() and len(termo) < 3:
+            # Só pela chave primária
+            try:
+                return pd.read_sql(
+                    f"SELECT {id_column}, {', '.join(search_columns)}, 1.0 AS relevancia "
+                    f"FROM {table_name} WHERE {id_column} = %(id)s",
+                    self.conn, params={'id': int(termo)}
+                )
+            except Exception as e:
+                print(f"Erro ao buscar em {table_name}: {e}")
+                self.rollback()
+                return None
+
+        # Escapa os curingas do LIKE digitados pelo usuário
+        termo_like = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        digitos = ''.join(ch for ch in termo if ch.isdigit())
+        params = {'termo': termo, 'padrao': f"%{termo_like}%", 'limite': int(limite)}
+
+        condicoes = []
+        relevancias = []
+        for col in search_columns:
+            condicoes.append(f"{col} ILIKE %(padrao)s")
+            condicoes.append(f"%(termo)s <%% {col}")
+            relevancias.append(f"COALESCE(word_similarity(%(termo)s, {col}), 0)")
+            if col.startswith('cnpj_') and len(digitos) >= 3:
+                # Mesma expressão do índice *_cnpj_digitos_trgm
+                params['digitos'] = digitos
+                params['padrao_digitos'] = f"%{digitos}%"
+                condicoes.append(f"regexp_replace({col}, '\\D', '', 'g') LIKE %(padrao_digitos)s")
+                relevancias.append(f"COALESCE(word_similarity(%(digitos)s, regexp_replace({col}, '\\D', '', 'g')), 0)")
+        ordem = ""
+        if termo.isdigit():
+            params['id'] = int(termo)
+            condicoes.append(f"{id_column} = %(id)s")
+            ordem = f"({id_column} = %(id)s) DESC, "  # id exato primeiro
+
+        query = (
+            f"SELECT {id_column}, {', '.join(search_columns)}, "
+            f"GREATEST({', '.join(relevancias)}) AS relevancia "
+            f"FROM {table_name} "
+            f"WHERE {' OR '.join(condicoes)} "
+            f"ORDER BY {ordem}relevancia DESC, {id_column} "
+            f"LIMIT %(limite)s"
+        )
+        try:
+            return pd.read_sql(query, self.conn, params=params)
+        except Exception as e:
+            print(f"Erro ao buscar em {table_name}: {e}")
+            self.rollback()
+            return None
+
+    def read_record(self, table_name, id_column, record_id, columns=None):
+        '''
+        Lê um único registro pela chave primária. Retorna uma Series (ou None se não existir).
+        '''
+        if self.conn is None or self.conn.closed:
+            print("Erro: Conexão com o banco de dados não está ativa para leitura.")
+            return None
+
+        try:
+            df = pd.read_sql(
+                f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name} WHERE {id_column} = %(id)s",
+                self.conn, params={'id': record_id}
+            )
+            return df.iloc[0] if not df.empty else None
+        except Exception as e:
+            print(f"Erro ao ler o registro {record_id} de {table_name}: {e}")
+            self.rollback()
+            return None
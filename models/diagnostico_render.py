@@ -0,0 +1,162 @@
+# diagnostico_render.py
+# Modo diagnóstico do dashboard: mede cada seção (display_*, carga dos dados) separando o tempo em
+#   - espera_dados: esperando o banco / a carga em cache (load_prepared_data, consultas agregadas);
+#   - figuras: montando as figuras do Plotly (px.*, grafico_linha);
+#   - envio: st.plotly_chart (serialização da figura e envio ao navegador);
+#   - calculo: o restante (agregações, pandas, widgets);
+# e soma o tamanho do JSON dos gráficos enviados (payload).
+# As medições são aninhadas: cada trecho conta só o próprio tempo (sem o dos trechos internos).
+# Cada seção medida é acrescentada ao log local (JSON Lines) para comparar sessões e dias.
+# Com o modo desligado (nenhuma seção ativa na thread) os wrappers só chamam a função original.
+
+# Import Libs
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+import inspect
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+ARQUIVO_LOG = os.getenv("DASHBOARD_DIAGNOSTICO_LOG", os.path.join(".cache", "dashboard", "diagnostico.jsonl"))
+COMPONENTES = ('espera_dados', 'calculo', 'figuras', 'envio')
+
+# Seção ativa da thread (cada sessão do Streamlit roda o script numa thread)
+_contexto = threading.local()
+_lock_log = threading.Lock()
+
+
+@contextmanager
+def medir(componente):
+    '''Soma o tempo do bloco ao `componente` da seção ativa (sem efeito fora de uma seção).'''
+    registro = getattr(_contexto, 'registro', None)
+    if registro is None:
+        yield
+        return
+    pilha = _contexto.pilha
+    pilha.append([0.0])  # tempo dos trechos internos
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        decorrido = time.perf_counter() - inicio
+        internos = pilha.pop()[0]
+        registro[f"{componente}_s"] += decorrido - internos
+        if pilha:
+            pilha[-1][0] += decorrido
+
+
+def medir_figuras(funcao):
+    '''Envolve uma função que monta figuras (px.bar, grafico_linha...): tempo vai para "figuras".'''
+    @wraps(funcao)
+    def executar(*args, **kwargs):
+        with medir('figuras'):
+            return funcao(*args, **kwargs)
+    return executar
+
+
+def medir_envio(exibir):
+    '''
+    Envolve st.plotly_chart: tempo vai para "envio" e o tamanho do JSON da figura para o payload.
+    O to_json extra do payload só roda no modo diagnóstico e é descontado do tempo da seção.
+    '''
+    @wraps(exibir)
+    def executar(fig, *args, **kwargs):
+        registro = getattr(_contexto, 'registro', None)
+        if registro is not None:
+            inicio = time.perf_counter()
+            registro['payload_kb'] += len(fig.to_json()) / 1024
+            registro['graficos'] += 1
+            registro['_sobrecarga'] += time.perf_counter() - inicio
+        with medir('envio'):
+            return exibir(fig, *args, **kwargs)
+    return executar
+
+
+class FigurasMedidas:
+    '''Módulo (plotly.express) com as funções envolvidas por medir_figuras; o resto é repassado.'''
+
+    def __init__(self, modulo):
+        self._modulo = modulo
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._modulo, nome)
+        return medir_figuras(atributo) if inspect.isfunction(atributo) else atributo
+
+
+class MedidorRender:
+    '''
+    Medições de uma execução do dashboard numa sessão.
+    `secoes` guarda os registros da execução; cada um também vai para o log em `arquivo_log`.
+    '''
+
+    def __init__(self, sessao, arquivo_log=ARQUIVO_LOG):
+        self.sessao = sessao
+        self.arquivo_log = arquivo_log
+        self.secoes = []
+
+    @contextmanager
+    def secao(self, nome):
+        '''Mede o bloco como a seção `nome` (o tempo não atribuído a outro componente é "calculo").'''
+        anterior = (getattr(_contexto, 'registro', None), getattr(_contexto, 'pilha', None))
+        registro = {'secao': nome, **{f"{c}_s": 0.0 for c in COMPONENTES},
+                    'graficos': 0, 'payload_kb': 0.0, '_sobrecarga': 0.0}
+        _contexto.registro, _contexto.pilha = registro, []
+        inicio = time.perf_counter()
+        try:
+            with medir('calculo'):
+                yield registro
+        finally:
+            sobrecarga = registro.pop('_sobrecarga')
+            registro['calculo_s'] = max(registro['calculo_s'] - sobrecarga, 0.0)
+            registro['total_s'] = time.perf_counter() - inicio - sobrecarga
+            _contexto.registro, _contexto.pilha = anterior
+            self.secoes.append(registro)
+            self._gravar(registro)
+
+    def _gravar(self, registro):
+        linha = {'data': datetime.now().isoformat(timespec='seconds'), 'sessao': self.sessao,
+                 **{k: round(v, 5) if isinstance(v, float) else v for k, v in registro.items()}}
+        try:
+            with _lock_log:
+                os.makedirs(os.path.dirname(self.arquivo_log) or '.', exist_ok=True)
+                with open(self.arquivo_log, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write(json.dumps(linha, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Erro ao gravar o log de diagnóstico do dashboard: {e}")
+
+    def tabela(self):
+        '''Registros da execução atual (uma linha por seção, na ordem em que rodaram).'''
+        colunas = ['secao', 'total_s', *(f"{c}_s" for c in COMPONENTES), 'graficos', 'payload_kb']
+        return pd.DataFrame(self.secoes, columns=colunas)
+
+
+def resumo_log(arquivo_log=ARQUIVO_LOG, ultimas=5000):
+    '''
+    Agrega as últimas `ultimas` medições do log por seção: execuções, sessões, mediana e p95 do
+    tempo total e mediana de cada componente e do payload. DataFrame vazio se não houver log.
+    '''
+    try:
+        with open(arquivo_log, encoding='utf-8') as arquivo:
+            linhas = arquivo.readlines()[-ultimas:]
+    except FileNotFoundError:
+        return pd.DataFrame()
+    registros = []
+    for linha in linhas:
+        try:
+            registros.append(json.loads(linha))
+        except ValueError:
+            continue  # linha incompleta (gravação interrompida)
+    if not registros:
+        return pd.DataFrame()
+    df = pd.DataFrame(registros)
+    grupos = df.groupby('secao', sort=False)
+    resumo = grupos.agg(execucoes=('total_s', 'size'), sessoes=('sessao', 'nunique'),
+                        total_mediana_s=('total_s', 'median'))
+    resumo['total_p95_s'] = grupos['total_s'].quantile(0.95)
+    for componente in COMPONENTES:
+        resumo[f"{componente}_mediana_s"] = grupos[f"{componente}_s"].median()
+    resumo['payload_mediana_kb'] = grupos['payload_kb'].median()
+    return resumo.sort_values('total_mediana_s', ascending=False).reset_index()
@@ -0,0 +1,58 @@
+# filtro_temporal.py
+# Filtros do dashboard sem conversão linha a linha.
+# Os DataFrames preparados ficam ordenados pela coluna de data; o período vira um par de
+# posições obtido por busca binária (searchsorted) no DatetimeIndex e o recorte é um slice
+# (.iloc[i:j]), que não copia os dados. Colunas categóricas são filtradas pelos códigos inteiros.
+
+# Import Libs
+import numpy as np
+import pandas as pd
+
+def ordenar_por_data(df, coluna_data):
+    '''Ordena o DataFrame pela coluna de data (só reordena se ainda não estiver ordenado).'''
+    if df.empty or df[coluna_data].is_monotonic_increasing:
+        return df
+    return df.sort_values(coluna_data, kind='stable', ignore_index=True)
+
+
+def mascara_categorias(serie, valores):
+    '''
+    Máscara booleana de `serie.isin(valores)`.
+    Em colunas categóricas compara só os códigos inteiros com os códigos dos valores selecionados.
+    '''
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.isin(valores).to_numpy()
+    categorias = serie.cat.categories
+    codigos = categorias.get_indexer(list(valores))
+    # Tabela código -> selecionado; a última posição atende o código -1 (NaN)
+    selecionados = np.zeros(len(categorias) + 1, dtype=bool)
+    selecionados[codigos[codigos >= 0]] = True
+    return selecionados[serie.cat.codes.to_numpy()]
+
+
+class FiltroTemporal:
+    '''
+    Recortes por período de um DataFrame ordenado por data.
+    '''
+
+    def __init__(self, df, coluna_data):
+        self.df = ordenar_por_data(df, coluna_data)
+        self.coluna_data = coluna_data
+        self.indice = pd.DatetimeIndex(self.df[coluna_data]) if not self.df.empty else pd.DatetimeIndex([])
+
+    def limites(self):
+        '''Primeira e última data (date) ou (None, None) se vazio.'''
+        if len(self.indice) == 0:
+            return None, None
+        return self.indice[0].date(), self.indice[-1].date()
+
+    def posicoes(self, inicio, fim):
+        '''Posições [i, j) das linhas com data entre `inicio` e `fim` (dias inteiros, inclusive).'''
+        i = self.indice.searchsorted(pd.Timestamp(inicio), side='left')
+        j = self.indice.searchsorted(pd.Timestamp(fim) + pd.Timedelta(days=1), side='left')
+        return i, max(i, j)
+
+    def periodo(self, inicio, fim):
+        '''Linhas do período como slice do DataFrame ordenado (sem cópia).'''
+        i, j = self.posicoes(inicio, fim)
+        return self.df.iloc[i:j]
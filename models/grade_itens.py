@@ -0,0 +1,116 @@
+# grade_itens.py
+# Grade paginada dos itens de pedido vendidos (tabela "Detalhes dos Itens de Pedido Vendidos").
+# Paginação por keyset: cada página continua a partir da chave de ordenação da última linha
+# da página anterior, então o banco nunca lê/descarta as linhas das páginas anteriores (sem OFFSET).
+
+# Import Modulos
+from driver.psycopg2_connect import PostgresConnect
+from models.dashboard_agregacoes import (
+    consultar_agregacao, _SQL_ITENS, _METRICAS_ITENS, _COLUNAS_ITENS, COLUNAS_ITENS_DETALHADOS
+)
+
+# Colunas que podem ordenar a grade. As expressões não podem ser nulas (comparação de linha do keyset)
+ORDENACOES = {
+    'data_pedido': 'p.data_pedido',
+    'nome_cliente': "COALESCE(c.nome_cliente, '')",
+    'nome_produto': "COALESCE(prod.nome_produto, '')",
+    'quantidade': 'COALESCE(ip.quantidade, 0)',
+    'valor_item_calculado': f"COALESCE({_METRICAS_ITENS['valor_item_calculado']}, 0)",
+    'lucro_item': _METRICAS_ITENS['lucro_item'],
+}
+
+_SELECT_ITENS = f"""
+    SELECT p.data_pedido, c.nome_cliente, prod.nome_produto, prod.tipo_corte,
+           ip.quantidade, ip.unidade_medida, ip.preco_unitario,
+           {_METRICAS_ITENS['valor_item_calculado']} AS valor_item_calculado,
+           {_METRICAS_ITENS['lucro_item']} AS lucro_item,
+           p.status AS status_pedido
+"""
+
+
+class GradeItensPedido:
+    '''
+    Consulta paginada (keyset) dos itens de pedido vendidos.
+    Período, tipo de corte, status e ordenação são resolvidos no banco; só uma página volta por vez.
+    '''
+
+    def __init__(self, start_date, end_date, tipos_corte=None, status=None,
+                 ordenar_por='data_pedido', decrescente=False, tamanho_pagina=100):
+        if ordenar_por not in ORDENACOES:
+            raise ValueError(f"Ordenação '{ordenar_por}' não suportada. Use uma de {list(ORDENACOES)}.")
+        self.params = {'inicio': start_date, 'fim': end_date}
+        self.filtros = ""
+        if tipos_corte:
+            self.params['tipos_corte'] = list(tipos_corte)
+            self.filtros += f" AND {_COLUNAS_ITENS['tipo_corte']} = ANY(%(tipos_corte)s)"
+        if status:
+            self.params['status'] = list(status)
+            self.filtros += f" AND {_COLUNAS_ITENS['status_pedido']} = ANY(%(status)s)"
+        self.chave = ORDENACOES[ordenar_por]
+        self.direcao = 'DESC' if decrescente else 'ASC'
+        self.tamanho_pagina = int(tamanho_pagina)
+
+    def pagina(self, apos=None):
+        '''
+        Retorna (DataFrame da página, cursor da próxima página ou None se for a última).
+        `apos` é o cursor (chave, id_item_pedido) devolvido pela página anterior.
+        '''
+        params = {**self.params, 'limite': self.tamanho_pagina + 1}
+        condicao_keyset = ""
+        if apos is not None:
+            params['apos_chave'], params['apos_id'] = apos
+            comparador = '<' if self.direcao == 'DESC' else '>'
+            condicao_keyset = f" AND ({self.chave}, ip.id_item_pedido) {comparador} (%(apos_chave)s, %(apos_id)s)"
+
+        df = consultar_agregacao(
+            f"""
+            {_SELECT_ITENS}, {self.chave} AS _chave, ip.id_item_pedido AS _id
+            {_SQL_ITENS}{self.filtros}{condicao_keyset}
+            ORDER BY {self.chave} {self.direcao}, ip.id_item_pedido {self.direcao}
+            LIMIT %(limite)s
+            """,
+            params, "página de itens de pedido"
+        )
+        if df.empty:
+            return df, None
+
+        proximo = None
+        if len(df) > self.tamanho_pagina:
+            df = df.iloc[:self.tamanho_pagina]
+            ultima = df.iloc[-1]
+            chave = ultima['_chave']
+            # Escalares numpy (ex.: int64) não são adaptados pelo psycopg2
+            if hasattr(chave, 'item') and not hasattr(chave, 'to_pydatetime'):
+                chave = chave.item()
+            proximo = (chave, int(ultima['_id']))
+        return df[COLUNAS_ITENS_DETALHADOS], proximo
+
+    def total_estimado(self):
+        '''Total de itens pelo estimador do planejador (EXPLAIN), sem varrer a tabela com COUNT(*).'''
+        df = consultar_agregacao(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 {_SQL_ITENS}{self.filtros}",
+            self.params, "estimativa de itens de pedido"
+        )
+        try:
+            return int(df.iloc[0, 0][0]['Plan']['Plan Rows'])
+        except Exception:
+            return None
+
+    def exportar_csv(self):
+        '''
+        Exporta o conjunto filtrado completo em CSV (UTF-8) via COPY ... TO STDOUT.
+        As linhas vão do banco direto para um arquivo temporário, sem montar DataFrame; o arquivo volta
+        aberto no início (ver PostgresConnect.copy_to_csv) ou None em caso de erro.
+        '''
+        db_connection = PostgresConnect()
+        try:
+            return db_connection.copy_to_csv(
+                f"""
+                {_SELECT_ITENS}
+                {_SQL_ITENS}{self.filtros}
+                ORDER BY {self.chave} {self.direcao}, ip.id_item_pedido {self.direcao}
+                """,
+                self.params
+            )
+        finally:
+            db_connection.close_connection()
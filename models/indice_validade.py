@@ -0,0 +1,129 @@
+# indice_validade.py
+# Índice de vencimento dos lotes em estoque (tb_estoque x tb_produto_entrada.validade).
+# O DataFrame de estoque preparado já vem ordenado pela validade (prepare_data); o índice guarda
+# a validade em dias (inteiros) e a soma acumulada das quantidades, então:
+#   - lotes e quantidade de qualquer faixa de validade saem de duas buscas binárias (O(log n));
+#   - a faixa em si é um slice contíguo do DataFrame (sem pd.cut sobre o estoque todo);
+#   - os próximos N lotes a vencer por produto ou localização saem da lista de posições do grupo
+#     (também ordenada pela validade): uma busca binária + N linhas.
+# É montado uma vez por versão dos dados e compartilhado (somente leitura) entre as sessões.
+# Lotes sem validade ficam no fim do DataFrame e não entram no índice (nunca vencem).
+
+# Import Modulos
+from models.filtro_temporal import ordenar_por_data
+
+# Import Libs
+import numpy as np
+import pandas as pd
+
+
+def _dia(data):
+    '''Data (date/datetime/Timestamp) como número de dias desde 1970-01-01.'''
+    return int(np.datetime64(pd.Timestamp(data).date(), 'D').astype(np.int64))
+
+
+class IndiceValidade:
+    '''
+    Consultas de vencimento sobre o estoque ordenado por `coluna_validade`.
+    Faixas são sempre [inicio, fim) em datas; None deixa o lado aberto.
+    '''
+
+    def __init__(self, df_estoque, coluna_validade='validade', coluna_quantidade='quantidade_disponivel'):
+        self.coluna_validade = coluna_validade
+        self.coluna_quantidade = coluna_quantidade
+        self.df = ordenar_por_data(df_estoque, coluna_validade)
+        validade = self.df[coluna_validade] if not self.df.empty else pd.Series(dtype='datetime64[s]')
+        self.tamanho = int(validade.notna().sum())  # NaT ficam no fim
+        self.dias = validade.iloc[:self.tamanho].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        quantidades = self.df[coluna_quantidade].iloc[:self.tamanho].to_numpy(dtype=np.int64) \
+            if self.tamanho else np.empty(0, dtype=np.int64)
+        self.quantidade_acumulada = np.concatenate(([0], np.cumsum(quantidades)))
+        self._grupos = {}
+
+    def _posicao(self, data, padrao):
+        return padrao if data is None else int(np.searchsorted(self.dias, _dia(data), side='left'))
+
+    def limites(self):
+        '''Primeira e última validade (date) ou (None, None) se nenhum lote tiver validade.'''
+        if self.tamanho == 0:
+            return None, None
+        validade = self.df[self.coluna_validade]
+        return validade.iloc[0].date(), validade.iloc[self.tamanho - 1].date()
+
+    def posicoes(self, inicio=None, fim=None, dentro=None):
+        '''
+        Posições [i, j) dos lotes com validade em [inicio, fim).
+        `dentro` = (inicio, fim) restringe a outra faixa (ex.: o período selecionado na tela).
+        '''
+        i = self._posicao(inicio, 0)
+        j = self._posicao(fim, self.tamanho)
+        if dentro is not None:
+            i = max(i, self._posicao(dentro[0], 0))
+            j = min(j, self._posicao(dentro[1], self.tamanho))
+        return i, max(i, j)
+
+    def contar(self, inicio=None, fim=None, dentro=None):
+        '''(número de lotes, quantidade total) com validade em [inicio, fim).'''
+        i, j = self.posicoes(inicio, fim, dentro)
+        return j - i, int(self.quantidade_acumulada[j] - self.quantidade_acumulada[i])
+
+    def faixa(self, inicio=None, fim=None, dentro=None):
+        '''Lotes com validade em [inicio, fim) como slice do DataFrame ordenado (sem cópia).'''
+        i, j = self.posicoes(inicio, fim, dentro)
+        return self.df.iloc[i:j]
+
+    @staticmethod
+    def bordas_faixas(hoje, limites_dias):
+        '''
+        [(inicio, fim)] das faixas de dias para vencer a partir de `hoje`: `limites_dias` são as bordas
+        internas (ex.: [30, 60] -> menos de 30 dias, de 30 a 60, 60 ou mais).
+        '''
+        hoje = pd.Timestamp(hoje).normalize()
+        bordas = [None, *(hoje + pd.Timedelta(days=d) for d in limites_dias), None]
+        return list(zip(bordas[:-1], bordas[1:]))
+
+    def resumo_faixas(self, hoje, limites_dias, rotulos, dentro=None):
+        '''
+        Lotes e quantidade por faixa de dias para vencer (ver bordas_faixas; `rotulos` tem uma entrada
+        por faixa), opcionalmente só dentro da faixa de validade `dentro` = (inicio, fim).
+        '''
+        linhas = []
+        for rotulo, (inicio, fim) in zip(rotulos, self.bordas_faixas(hoje, limites_dias)):
+            lotes, quantidade = self.contar(inicio, fim, dentro)
+            linhas.append({'status_validade': rotulo, 'lotes': lotes, self.coluna_quantidade: quantidade})
+        return pd.DataFrame(linhas)
+
+    def _posicoes_grupo(self, coluna):
+        '''
+        {valor: (posições, validades em dias)} da coluna, montado na primeira consulta (O(n)).
+        As posições são crescentes, ou seja, em ordem de validade dentro do grupo.
+        '''
+        if coluna not in self._grupos:
+            grupos = self.df.iloc[:self.tamanho].groupby(coluna, observed=True, sort=False).indices
+            self._grupos[coluna] = {valor: (posicoes, self.dias[posicoes]) for valor, posicoes in grupos.items()}
+        return self._grupos[coluna]
+
+    def proximos(self, hoje, n=5, por=None, valor=None):
+        '''
+        Próximos `n` lotes a vencer (validade >= hoje), mais cedo primeiro.
+        `por` agrupa (ex.: 'nome_produto', 'localizacao'): `n` por grupo, ou só do grupo `valor`.
+        Retorna as linhas do estoque (em ordem de validade) com a coluna dias_para_vencer.
+        '''
+        dia_hoje = _dia(hoje)
+        if por is None:
+            i = int(np.searchsorted(self.dias, dia_hoje, side='left'))
+            selecionadas = np.arange(i, min(i + n, self.tamanho))
+        else:
+            grupos = self._posicoes_grupo(por)
+            valores = grupos if valor is None else [valor]
+            partes = []
+            for v in valores:
+                if v not in grupos:
+                    continue
+                posicoes, dias = grupos[v]
+                inicio = int(np.searchsorted(dias, dia_hoje, side='left'))
+                partes.append(posicoes[inicio:inicio + n])
+            # Posições crescentes = ordem de validade entre todos os grupos
+            selecionadas = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.int64)
+        linhas = self.df.iloc[selecionadas]
+        return linhas.assign(dias_para_vencer=self.dias[selecionadas] - dia_hoje)
@@ -0,0 +1,147 @@
+# modelos_externos.py
+# Treinos do Relatório Externo (abates SIGSIF por ano/mês, UF e categoria), separados da página.
+# Cada função recebe os dados já agregados (e os hiperparâmetros como argumentos nomeados) e
+# devolve um dict só com o que a página desenha: o registro de modelos (models/registro_modelos.py)
+# guarda esse dict por impressão digital dos dados + parâmetros. Não usam Streamlit.
+
+# Import Libs
+import numpy as np
+import pandas as pd
+
+from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import (
+    davies_bouldin_score, mean_absolute_error, mean_squared_error, r2_score, silhouette_score,
+)
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+# Prophet pode não estar instalado em todos os ambientes
+try:
+    from prophet import Prophet
+    prophet_ok = True
+except ImportError:
+    prophet_ok = False
+
+
+def metricas_regressao(y_real, y_previsto):
+    return {
+        'MAE': float(mean_absolute_error(y_real, y_previsto)),
+        'RMSE': float(np.sqrt(mean_squared_error(y_real, y_previsto))),
+        'R2': float(r2_score(y_real, y_previsto)),
+    }
+
+
+def treinar_regressao_anual(df_ano, ano_final=2030):
+    '''Regressão linear (índice de tempo normalizado) do total anual, projetada até `ano_final`.'''
+    df_ano = df_ano.reset_index(drop=True)
+    X = np.arange(len(df_ano)).reshape(-1, 1)
+    y = df_ano['QUANTIDADE']
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    modelo = LinearRegression()
+    modelo.fit(X_scaled, y)
+    anos_futuros = np.arange(df_ano['ANO'].max() + 1, ano_final + 1)
+    time_index_futuro = np.arange(len(df_ano), len(df_ano) + len(anos_futuros)).reshape(-1, 1)
+    y_pred_futuro = modelo.predict(scaler.transform(time_index_futuro))
+    return {
+        'modelo': modelo,
+        'scaler': scaler,
+        'projecao': pd.DataFrame({'ANO': anos_futuros, 'QUANTIDADE_PREDITA': y_pred_futuro.astype(int)}),
+        'metricas': metricas_regressao(y, modelo.predict(X_scaled)),
+    }
+
+
+def preparar_random_forest(df_agg):
+    '''Variáveis do Random Forest: ano, mês e dummies de UF/categoria (QUANTIDADE é o alvo).'''
+    df_ml = df_agg.copy()
+    df_ml["ANO"] = df_ml["DATA"].dt.year
+    df_ml["MES"] = df_ml["DATA"].dt.month
+    df_ml = pd.get_dummies(df_ml, columns=["UF_PROCEDENCIA", "CATEGORIA"], drop_first=True)
+    return df_ml.drop(columns=["QUANTIDADE", "DATA"]), df_ml["QUANTIDADE"]
+
+
+def treinar_random_forest(df_agg, n_estimators=100, max_depth=None, random_state=42):
+    '''Random Forest de QUANTIDADE; os últimos 20% (ordem temporal) ficam para o teste.'''
+    X, y = preparar_random_forest(df_agg)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
+    modelo = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                   random_state=random_state)
+    modelo.fit(X_train, y_train)
+    return {'modelo': modelo, 'metricas': metricas_regressao(y_test, modelo.predict(X_test))}
+
+
+def treinar_prophet_previsao(df_prophet, periodos=12, yearly_seasonality='auto',
+                             seasonality_mode='additive'):
+    '''Prophet sobre a série mensal (ds, y) com previsão de `periodos` meses.'''
+    modelo = Prophet(yearly_seasonality=yearly_seasonality, seasonality_mode=seasonality_mode)
+    modelo.fit(df_prophet)
+    futuro = modelo.make_future_dataframe(periods=periodos, freq="MS")
+    return {'modelo': modelo, 'previsao': modelo.predict(futuro)}
+
+
+def treinar_prophet_anomalias(df_prophet, desvios=2):
+    '''Pontos da série cujo erro do Prophet passa de `desvios` desvios-padrão do erro.'''
+    modelo = Prophet()
+    modelo.fit(df_prophet)
+    previsao = modelo.predict(modelo.make_future_dataframe(periods=0))
+    serie = df_prophet.reset_index(drop=True).copy()
+    serie["previsto"] = previsao["yhat"].to_numpy()
+    serie["erro"] = (serie["y"] - serie["previsto"]).abs()
+    limite = desvios * serie["erro"].std()
+    return {'serie': serie, 'anomalias': serie[serie["erro"] > limite]}
+
+
+def treinar_clusters_pca(df_cluster, n_clusters=3, random_state=42):
+    '''KMeans das UFs (linhas) pelo volume por categoria (colunas) e projeção PCA em 3 dimensões.'''
+    df_scaled = StandardScaler().fit_transform(df_cluster)
+    resultado = pd.DataFrame(index=df_cluster.index)
+    resultado["CLUSTER"] = KMeans(n_clusters=n_clusters, random_state=random_state).fit_predict(df_scaled)
+    pca_result = PCA(n_components=3).fit_transform(df_scaled)
+    resultado["PCA1"] = pca_result[:, 0]
+    resultado["PCA2"] = pca_result[:, 1]
+    resultado["PCA3"] = pca_result[:, 2]
+    return {'clusters': resultado}
+
+
+def treinar_cluster_volume(df_volume, n_clusters=3, random_state=42):
+    '''KMeans das UFs pelo total de abates (colunas UF, TOTAL_ABATES).'''
+    X = StandardScaler().fit_transform(df_volume[["TOTAL_ABATES"]])
+    resultado = df_volume.copy()
+    resultado["CLUSTER"] = KMeans(n_clusters=n_clusters, random_state=random_state).fit_predict(X)
+    return {'clusters': resultado}
+
+
+def treinar_tendencia_linear(serie):
+    '''Regressão linear da série mensal (DATA, QUANTIDADE) pelos dias desde o início.'''
+    serie = serie.copy()
+    serie["DATA_NUM"] = (serie["DATA"] - serie["DATA"].min()).dt.days
+    modelo = LinearRegression()
+    modelo.fit(serie[["DATA_NUM"]], serie["QUANTIDADE"])
+    serie["TREND"] = modelo.predict(serie[["DATA_NUM"]])
+    return {'modelo': modelo, 'serie': serie}
+
+
+def avaliar_kmeans(df_cluster, k, random_state=42):
+    '''Davies-Bouldin (quanto menor, melhor) e silhueta do KMeans com `k` grupos sobre os dados normalizados.'''
+    X = StandardScaler().fit_transform(df_cluster)
+    labels = KMeans(n_clusters=k, random_state=random_state).fit_predict(X)
+    return {'db_score': float(davies_bouldin_score(X, labels)), 'silhueta': float(silhouette_score(X, labels))}
+
+
+def avaliar_random_forest(df_agg, n_estimators=100, max_depth=None, random_state=42):
+    '''Métricas de teste do Random Forest (ver treinar_random_forest), sem guardar o modelo.'''
+    return treinar_random_forest(df_agg, n_estimators, max_depth, random_state)['metricas']
+
+
+def avaliar_prophet(df_prophet, meses_teste=12, yearly_seasonality='auto', seasonality_mode='additive',
+                    changepoint_prior_scale=0.05):
+    '''Métricas do Prophet nos últimos `meses_teste` meses da série (ds, y), treinado com os anteriores.'''
+    treino, teste = df_prophet.iloc[:-meses_teste], df_prophet.iloc[-meses_teste:]
+    modelo = Prophet(yearly_seasonality=yearly_seasonality, seasonality_mode=seasonality_mode,
+                     changepoint_prior_scale=changepoint_prior_scale)
+    modelo.fit(treino)
+    previsao = modelo.predict(teste[['ds']])
+    return metricas_regressao(teste['y'], previsao['yhat'])
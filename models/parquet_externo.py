@@ -0,0 +1,200 @@
+# parquet_externo.py
+# Formato dos conjuntos externos (SIGSIF/agro.gov e CEPEA) no MinIO: Parquet (zstd) particionado.
+# Um conjunto publicado em <prefixo>/ tem:
+#   _manifesto.json                      -> colunas e tipos, colunas de partição, a lista de partições
+#                                           (valores, arquivo, linhas) e as publicações mantidas;
+#                                           gravado por último
+#   <publicação>/ANO=2020/parte.parquet  -> uma partição por valor de ANO (e de UF_PROCEDENCIA, se pedido)
+# Cada publicação grava numa pasta nova (<publicação> = data/hora UTC + sufixo aleatório) e nunca
+# sobrescreve arquivos: um manifesto antigo continua apontando para partições que não mudaram.
+# As PUBLICACOES_MANTIDAS mais recentes ficam no bucket (quem leu o manifesto anterior ainda baixa
+# partições dele sob demanda); as mais antigas são apagadas depois que o manifesto novo é enviado.
+# Conjuntos sem as colunas de partição (ex.: CEPEA) viram um único <publicação>/parte.parquet.
+# As colunas de partição não são gravadas nos arquivos (o valor está no manifesto) e voltam na leitura.
+# Quem lê (models/dados_externos.py) consulta o manifesto, baixa só as partições que passam nos
+# filtros e lê só as colunas pedidas.
+
+# Import Libs
+from datetime import datetime, timezone
+from io import BytesIO
+import json
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow só dá para ler os CSVs antigos
+    pa = pq = None
+
+MANIFESTO = "_manifesto.json"
+COMPRESSAO = "zstd"
+PARTICOES_PADRAO = ('ANO',)
+# Texto com até esta fração de valores distintos vira categoria (dicionário no Parquet)
+FRACAO_CATEGORIA = 0.5
+# Publicações mantidas no bucket (a atual + as anteriores que leitores ainda podem estar usando)
+PUBLICACOES_MANTIDAS = 3
+
+
+def tipar_colunas(df):
+    '''
+    Tipos compactos para o Parquet: texto numérico vira número, inteiros que cabem viram int32
+    e texto repetitivo (UF, categoria, município...) vira categoria.
+    '''
+    df = df.copy()
+    for coluna in df.columns:
+        serie = df[coluna]
+        if pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            numeros = pd.to_numeric(serie, errors='coerce')
+            if serie.notna().any() and numeros.notna().sum() == serie.notna().sum():
+                serie = numeros
+            elif serie.nunique(dropna=True) <= FRACAO_CATEGORIA * max(len(serie), 1):
+                df[coluna] = serie.astype('category')
+                continue
+            else:
+                continue
+        if pd.api.types.is_float_dtype(serie) and serie.notna().all() and (serie % 1 == 0).all():
+            serie = serie.astype('int64')
+        if pd.api.types.is_integer_dtype(serie) and serie.between(-2**31, 2**31 - 1).all():
+            serie = serie.astype('int32')  # menor que isso o Parquet já comprime; somas não estouram
+        df[coluna] = serie
+    return df
+
+
+def _valor_json(valor):
+    return valor.item() if hasattr(valor, 'item') else valor
+
+
+def _nome_particao(valores):
+    return "/".join(f"{coluna}={valor}" for coluna, valor in valores.items())
+
+
+def _parquet(df):
+    buffer = BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer, compression=COMPRESSAO)
+    buffer.seek(0)
+    return buffer
+
+
+def _enviar(minio_client, bucket, objeto, buffer, content_type):
+    minio_client.put_object(bucket_name=bucket, object_name=objeto, data=buffer,
+                            length=buffer.getbuffer().nbytes, content_type=content_type)
+
+
+def _nova_publicacao():
+    # Ordenável pela data; o sufixo separa publicações no mesmo segundo
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+
+def publicar_parquet(df, prefixo, minio_client, bucket, particoes=PARTICOES_PADRAO):
+    '''
+    Publica o DataFrame em <prefixo>/<publicação nova>/ no formato acima, particionado pelas colunas
+    de `particoes` que existirem nele. O manifesto é enviado por último: quem lê nunca vê uma
+    publicação pela metade. Depois são apagadas as publicações além das PUBLICACOES_MANTIDAS mais
+    recentes. Retorna o manifesto.
+    '''
+    df = tipar_colunas(df)
+    particoes = [coluna for coluna in particoes if coluna in df.columns and df[coluna].notna().all()]
+    colunas = [coluna for coluna in df.columns if coluna not in particoes]
+    anterior = ler_manifesto(minio_client, bucket, prefixo)
+    publicacao = _nova_publicacao()
+
+    grupos = df.groupby(particoes, observed=True, sort=True) if particoes else [((), df)]
+    lista = []
+    for chave, parte in grupos:
+        chave = chave if isinstance(chave, tuple) else (chave,)
+        valores = {coluna: _valor_json(valor) for coluna, valor in zip(particoes, chave)}
+        arquivo = f"{publicacao}/{_nome_particao(valores)}/parte.parquet" if valores else f"{publicacao}/parte.parquet"
+        _enviar(minio_client, bucket, f"{prefixo}/{arquivo}", _parquet(parte[colunas]),
+                "application/vnd.apache.parquet")
+        lista.append({'valores': valores, 'arquivo': arquivo, 'linhas': len(parte)})
+
+    publicacoes = [publicacao] + list((anterior or {}).get('publicacoes', []))
+    manifesto = {
+        'publicacao': publicacao,
+        'colunas': {coluna: str(tipo) for coluna, tipo in df.dtypes.items()},
+        'particoes': particoes,
+        'lista': lista,
+        'linhas': len(df),
+        'publicacoes': publicacoes[:PUBLICACOES_MANTIDAS],
+    }
+    _enviar(minio_client, bucket, f"{prefixo}/{MANIFESTO}",
+            BytesIO(json.dumps(manifesto, ensure_ascii=False).encode('utf-8')), "application/json")
+
+    for antiga in publicacoes[PUBLICACOES_MANTIDAS:]:
+        for objeto in minio_client.list_objects(bucket, prefix=f"{prefixo}/{antiga}/", recursive=True):
+            minio_client.remove_object(bucket, objeto.object_name)
+    print(f"[SUCESSO] {prefixo}/{publicacao}/ publicado no bucket '{bucket}': {len(df)} linhas em "
+          f"{len(lista)} partição(ões) Parquet")
+    return manifesto
+
+
+def ler_manifesto(minio_client, bucket, prefixo):
+    '''Manifesto publicado em <prefixo>/ ou None se não existir.'''
+    try:
+        resposta = minio_client.get_object(bucket, f"{prefixo}/{MANIFESTO}")
+    except Exception:
+        return None
+    try:
+        return json.loads(resposta.read().decode('utf-8'))
+    finally:
+        resposta.close()
+        resposta.release_conn()
+
+
+def _passa(valor, condicao):
+    '''`condicao`: (mínimo, máximo) inclusivos (None = aberto) ou lista/conjunto de valores aceitos.'''
+    if isinstance(condicao, tuple):
+        minimo, maximo = condicao
+        return (minimo is None or valor >= minimo) and (maximo is None or valor <= maximo)
+    return valor in condicao
+
+
+def selecionar_particoes(manifesto, filtros=None):
+    '''Partições do manifesto cujos valores passam nos filtros ({coluna: condição}) das colunas de partição.'''
+    filtros = filtros or {}
+    return [item for item in manifesto['lista']
+            if all(_passa(valor, filtros[coluna]) for coluna, valor in item['valores'].items()
+                   if coluna in filtros)]
+
+
+def filtrar(df, filtros=None):
+    '''Aplica os filtros ({coluna: condição}) às linhas do DataFrame (colunas que não são partição).'''
+    for coluna, condicao in (filtros or {}).items():
+        if coluna not in df.columns:
+            continue
+        if isinstance(condicao, tuple):
+            minimo, maximo = condicao
+            if minimo is not None:
+                df = df[df[coluna] >= minimo]
+            if maximo is not None:
+                df = df[df[coluna] <= maximo]
+        else:
+            df = df[df[coluna].isin(list(condicao))]
+    return df
+
+
+def ler_particoes(arquivos, manifesto, colunas=None, filtros=None):
+    '''
+    Lê as partições já baixadas ([(item do manifesto, caminho local)]) só com as `colunas` pedidas
+    (None = todas) e devolve um DataFrame com as colunas de partição restauradas.
+    '''
+    particoes = manifesto['particoes']
+    colunas = list(manifesto['colunas']) if colunas is None else list(colunas)
+    colunas_arquivo = [coluna for coluna in colunas if coluna not in particoes]
+    partes = []
+    for item, caminho in arquivos:
+        df = pq.read_table(caminho, columns=colunas_arquivo, memory_map=True).to_pandas()
+        for coluna in particoes:
+            if coluna in colunas:
+                df[coluna] = pd.Series(item['valores'][coluna], index=df.index).astype(manifesto['colunas'][coluna])
+        partes.append(filtrar(df, {c: f for c, f in (filtros or {}).items() if c not in particoes}))
+    if not partes:
+        return pd.DataFrame({coluna: pd.Series(dtype=manifesto['colunas'][coluna]) for coluna in colunas})
+    # Categorias com valores diferentes entre partições viram texto no concat: volta para categoria
+    df = pd.concat(partes, ignore_index=True)
+    for coluna in colunas:
+        if manifesto['colunas'][coluna] == 'category' and df[coluna].dtype != 'category':
+            df[coluna] = df[coluna].astype('category')
+    return df[colunas]
@@ -0,0 +1,86 @@
+# reducao_pontos.py
+# Redução de pontos das séries temporais antes de montar os gráficos de linha.
+# Com granularidade diária em vários anos cada traço levaria milhares de pontos ao navegador;
+# a série é reduzida no servidor para no máximo ORCAMENTO_PONTOS pontos com o LTTB
+# (Largest-Triangle-Three-Buckets: em cada faixa mantém o ponto que forma o maior triângulo com
+# o ponto escolhido antes e a média da faixa seguinte, preservando picos e vales).
+# Traços com mais de LIMITE_WEBGL pontos usam WebGL (scattergl) e os marcadores só aparecem
+# em séries curtas.
+
+# Import Libs
+import numpy as np
+import plotly.express as px
+import plotly.io as pio
+
+ORCAMENTO_PONTOS = 1000
+LIMITE_WEBGL = 500
+LIMITE_MARCADORES = 200
+
+
+def indices_lttb(x, y, n):
+    '''Posições dos `n` pontos escolhidos pelo LTTB (sempre inclui o primeiro e o último).'''
+    tamanho = len(x)
+    if n >= tamanho or n < 3:
+        return np.arange(tamanho)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n - 2 faixas entre o primeiro e o último ponto: faixa i = [bordas[i], bordas[i + 1])
+    bordas = (np.arange(n - 1) * ((tamanho - 2) / (n - 2))).astype(np.int64) + 1
+    bordas[-1] = tamanho - 1
+    indices = np.empty(n, dtype=np.int64)
+    indices[0], indices[-1] = 0, tamanho - 1
+    a = 0
+    for i in range(n - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        seguinte = slice(bordas[i + 1], bordas[i + 2]) if i + 2 < len(bordas) else slice(tamanho - 1, tamanho)
+        media_x, media_y = x[seguinte].mean(), y[seguinte].mean()
+        areas = np.abs((x[a] - media_x) * (y[inicio:fim] - y[a]) - (x[a] - x[inicio:fim]) * (media_y - y[a]))
+        a = inicio + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def reduzir_serie(df, x, y, orcamento=ORCAMENTO_PONTOS):
+    '''Linhas de `df` (ordenado por `x`) escolhidas pelo LTTB; o próprio df se já couber no orçamento.'''
+    if len(df) <= orcamento:
+        return df
+    eixo_x = df[x]
+    valores_x = eixo_x.to_numpy(dtype='datetime64[ns]').astype(np.int64) if eixo_x.dtype.kind == 'M' \
+        else eixo_x.to_numpy(dtype=np.float64)
+    return df.iloc[indices_lttb(valores_x, df[y].to_numpy(dtype=np.float64), orcamento)]
+
+
+def _bytes_dados(df, x, y):
+    return len(pio.to_json({'x': df[x], 'y': df[y]}, validate=False))
+
+
+def grafico_linha(df, x, y, orcamento=ORCAMENTO_PONTOS, **kwargs):
+    '''
+    px.line de uma série temporal com redução de pontos.
+    Retorna (figura, relatório) com pontos e bytes (JSON da figura) antes e depois da redução;
+    os bytes "antes" trocam só os dados do traço pelos da série completa.
+    '''
+    reduzido = reduzir_serie(df, x, y, orcamento)
+    webgl = len(reduzido) > LIMITE_WEBGL
+    fig = px.line(reduzido, x=x, y=y, render_mode='webgl' if webgl else 'svg', **kwargs)
+    fig.update_traces(mode='lines+markers' if len(reduzido) <= LIMITE_MARCADORES else 'lines')
+    bytes_enviados = len(fig.to_json())
+    relatorio = {
+        'pontos_originais': len(df),
+        'pontos_enviados': len(reduzido),
+        'bytes_originais': bytes_enviados + _bytes_dados(df, x, y) - _bytes_dados(reduzido, x, y),
+        'bytes_enviados': bytes_enviados,
+        'webgl': webgl,
+    }
+    return fig, relatorio
+
+
+def descrever_reducao(relatorio):
+    '''Texto curto com a economia de pontos/bytes (vazio se a série não foi reduzida).'''
+    if relatorio['pontos_enviados'] >= relatorio['pontos_originais']:
+        return ""
+    economia = 1 - relatorio['bytes_enviados'] / relatorio['bytes_originais']
+    return (f"{relatorio['pontos_originais']:n} pontos reduzidos para {relatorio['pontos_enviados']:n} (LTTB)"
+            f"{' · WebGL' if relatorio['webgl'] else ''} · payload "
+            f"{relatorio['bytes_originais'] / 1024:.0f} KB → {relatorio['bytes_enviados'] / 1024:.0f} KB "
+            f"(-{economia:.0%})")
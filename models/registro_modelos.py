@@ -0,0 +1,230 @@
+# registro_modelos.py
+# Registro de modelos treinados do Relatório Externo.
+# Cada treino é identificado pela impressão digital (sha256) de: nome do modelo, dados de entrada
+# (conteúdo, colunas e tipos), hiperparâmetros e VERSAO_MODELOS. Se nada disso mudou, o modelo
+# ajustado e os resultados (previsões, métricas, rótulos) voltam do registro e a página só desenha.
+# Camadas, da mais rápida para a mais lenta:
+#   1. memória do processo (poucas entradas, as mais recentes);
+#   2. disco local: <DIRETORIO_MODELOS>/<nome>/<impressão>.joblib;
+#   3. MinIO (opcional, REGISTRO_MODELOS_BUCKET): compartilha os modelos entre workers/máquinas.
+# Uma entrada achada numa camada mais lenta é copiada para as mais rápidas.
+
+# Import Libs
+from collections import OrderedDict
+from datetime import datetime
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Aumentar quando mudar o código de treino (os modelos registrados antes deixam de valer)
+VERSAO_MODELOS = 1
+
+DIRETORIO_MODELOS = os.getenv("REGISTRO_MODELOS_DIR", os.path.join(".cache", "modelos"))
+BUCKET_MODELOS = os.getenv("REGISTRO_MODELOS_BUCKET", "")
+PREFIXO_MINIO = "modelos"
+# Entradas mantidas em memória por processo
+MAXIMO_MEMORIA = 32
+
+
+def _atualizar_hash(h, valor):
+    if isinstance(valor, pd.DataFrame):
+        h.update(b'DataFrame')
+        h.update(json.dumps([str(c) for c in valor.columns]).encode())
+        h.update(json.dumps([str(t) for t in valor.dtypes]).encode())
+        _atualizar_hash(h, list(valor.index.names))
+        h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+    elif isinstance(valor, pd.Series):
+        h.update(f'Series:{valor.name}:{valor.dtype}'.encode())
+        h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+    elif isinstance(valor, np.ndarray):
+        h.update(f'ndarray:{valor.dtype}:{valor.shape}'.encode())
+        h.update(np.ascontiguousarray(valor).tobytes())
+    elif isinstance(valor, dict):
+        h.update(b'dict')
+        for chave in sorted(valor, key=str):
+            _atualizar_hash(h, str(chave))
+            _atualizar_hash(h, valor[chave])
+    elif isinstance(valor, (list, tuple)):
+        h.update(f'{type(valor).__name__}:{len(valor)}'.encode())
+        for item in valor:
+            _atualizar_hash(h, item)
+    elif callable(valor):
+        # Funções pelo nome (o repr tem o endereço, que muda a cada processo)
+        h.update(f'callable:{valor.__module__}.{valor.__qualname__}'.encode())
+    else:
+        h.update(f'{type(valor).__name__}:{valor!r}'.encode())
+
+
+def impressao_digital(*partes):
+    '''sha256 (hex) de DataFrames, Series, arrays, dicts, listas, funções e escalares, em ordem.'''
+    h = hashlib.sha256()
+    for parte in partes:
+        _atualizar_hash(h, parte)
+    return h.hexdigest()
+
+
+class RegistroModelos:
+    '''
+    Modelos ajustados e seus resultados, por (nome, impressão digital). Uma instância por processo
+    (st.cache_resource). As funções de treino recebem (dados, **parametros) e devolvem um dict com o
+    que a página precisa (modelo, previsões, métricas...); o dict inteiro é o que fica registrado.
+    '''
+
+    def __init__(self, diretorio=DIRETORIO_MODELOS, bucket=BUCKET_MODELOS, fabrica_cliente=None,
+                 maximo_memoria=MAXIMO_MEMORIA):
+        self.diretorio = diretorio
+        self.bucket = bucket
+        self.maximo_memoria = maximo_memoria
+        self._fabrica_cliente = fabrica_cliente
+        self._cliente = None
+        self._memoria = OrderedDict()
+        self._ultimos = {}
+        self._lock = threading.Lock()
+
+    def chave(self, nome, dados, parametros=None):
+        return impressao_digital(nome, VERSAO_MODELOS, dados, parametros or {})
+
+    def obter(self, nome, chave):
+        '''Entrada registrada ({'resultado', 'parametros', 'treinado_em', 'segundos', ...}) ou None.'''
+        with self._lock:
+            entrada = self._memoria.get((nome, chave))
+            if entrada is not None:
+                self._memoria.move_to_end((nome, chave))
+                return entrada
+        entrada = self._ler_local(nome, chave)
+        if entrada is None:
+            entrada = self._ler_minio(nome, chave)
+            if entrada is not None:
+                self._gravar_local(nome, chave, entrada)
+        if entrada is not None:
+            self._guardar_memoria(nome, chave, entrada)
+        return entrada
+
+    def registrar(self, nome, chave, resultado, parametros=None, segundos=None):
+        entrada = {
+            'nome': nome,
+            'impressao': chave,
+            'versao': VERSAO_MODELOS,
+            'parametros': dict(parametros or {}),
+            'resultado': resultado,
+            'treinado_em': datetime.now().isoformat(timespec='seconds'),
+            'segundos': segundos,
+        }
+        self._guardar_memoria(nome, chave, entrada)
+        self._gravar_local(nome, chave, entrada)
+        self._gravar_minio(nome, chave, entrada)
+        return entrada
+
+    def obter_ou_treinar(self, nome, funcao, dados, parametros=None):
+        '''
+        Resultado de funcao(dados, **parametros): do registro se os dados e parâmetros são os mesmos
+        de um treino anterior, senão treina agora e registra.
+        '''
+        parametros = parametros or {}
+        chave = self.chave(nome, dados, parametros)
+        entrada = self.obter(nome, chave)
+        if entrada is None:
+            inicio = time.perf_counter()
+            resultado = funcao(dados, **parametros)
+            entrada = self.registrar(nome, chave, resultado, parametros, time.perf_counter() - inicio)
+            print(f"Modelo {nome} treinado em {entrada['segundos']:.2f} s ({chave[:12]}).")
+        return entrada['resultado']
+
+    def ultimo(self, nome):
+        '''
+        Última entrada de `nome` (mesmo que de outros dados): a mais recente usada neste processo
+        ou, num processo novo, a gravada por último no disco local. None se não houver nenhuma.
+        '''
+        chave = self._ultimos.get(nome)
+        if chave is None:
+            pasta = os.path.join(self.diretorio, nome)
+            arquivos = glob.glob(os.path.join(pasta, "*.joblib")) if os.path.isdir(pasta) else []
+            if not arquivos:
+                return None
+            chave = os.path.basename(max(arquivos, key=os.path.getmtime))[:-len(".joblib")]
+        return self.obter(nome, chave)
+
+    def _guardar_memoria(self, nome, chave, entrada):
+        with self._lock:
+            self._memoria[(nome, chave)] = entrada
+            self._memoria.move_to_end((nome, chave))
+            self._ultimos[nome] = chave
+            while len(self._memoria) > self.maximo_memoria:
+                self._memoria.popitem(last=False)
+
+    def _caminho(self, nome, chave):
+        return os.path.join(self.diretorio, nome, f"{chave}.joblib")
+
+    def _ler_local(self, nome, chave):
+        caminho = self._caminho(nome, chave)
+        if not os.path.exists(caminho):
+            return None
+        try:
+            return joblib.load(caminho)
+        except Exception as e:
+            print(f"Erro ao ler o modelo {caminho}: {e}")
+            return None
+
+    def _gravar_local(self, nome, chave, entrada):
+        '''Grava num temporário e troca com os.replace (quem lê nunca vê um arquivo pela metade).'''
+        caminho = self._caminho(nome, chave)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            joblib.dump(entrada, temporario, compress=3)
+            os.replace(temporario, caminho)
+        except Exception as e:
+            print(f"Erro ao gravar o modelo {caminho}: {e}")
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def _minio(self):
+        if not self.bucket:
+            return None
+        with self._lock:
+            if self._cliente is None:
+                if self._fabrica_cliente is None:
+                    from models.dados_externos import cliente_minio
+                    self._fabrica_cliente = cliente_minio
+                self._cliente = self._fabrica_cliente()
+            return self._cliente
+
+    def _objeto(self, nome, chave):
+        return f"{PREFIXO_MINIO}/{nome}/{chave}.joblib"
+
+    def _ler_minio(self, nome, chave):
+        if not self.bucket:
+            return None
+        try:
+            resposta = self._minio().get_object(self.bucket, self._objeto(nome, chave))
+        except Exception:
+            return None  # não existe no bucket (ou MinIO fora do ar): treina
+        try:
+            return joblib.load(io.BytesIO(resposta.read()))
+        except Exception as e:
+            print(f"Erro ao ler o modelo {self._objeto(nome, chave)} do MinIO: {e}")
+            return None
+        finally:
+            resposta.close()
+            resposta.release_conn()
+
+    def _gravar_minio(self, nome, chave, entrada):
+        if not self.bucket:
+            return
+        try:
+            buffer = io.BytesIO()
+            joblib.dump(entrada, buffer, compress=3)
+            buffer.seek(0)
+            self._minio().put_object(self.bucket, self._objeto(nome, chave), buffer,
+                                     length=buffer.getbuffer().nbytes,
+                                     content_type="application/octet-stream")
+        except Exception as e:
+            print(f"Erro ao enviar o modelo {self._objeto(nome, chave)} para o MinIO: {e}")
@@ -0,0 +1,136 @@
+# snapshot_parquet.py
+# Snapshot em disco do histórico do dashboard (pedidos/itens e pagamentos já preparados e compactados).
+# Um processo novo (restart, deploy, outro worker) começa a partir do último snapshot em vez de
+# reler todo o histórico: os arquivos Parquet (zstd) são lidos com memory map e a carga
+# incremental (models/carga_incremental.py) busca só o que mudou desde o watermark do snapshot.
+#
+# Estrutura de DIRETORIO_SNAPSHOT:
+#   manifesto.json          -> snapshot atual: pasta, formato, banco, watermark e versão dos dados
+#   snapshot_<instante>/    -> um .parquet por conjunto de dados
+# O manifesto é trocado de forma atômica (os.replace) só depois que a pasta nova está completa;
+# o snapshot anterior é mantido até o próximo e os mais antigos são apagados.
+
+# Import Libs
+from datetime import datetime
+import json
+import os
+import shutil
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow o dashboard funciona, só não grava/lê snapshots
+    pa = pq = None
+
+# Aumentar quando mudar o preparo/compactação dos DataFrames (snapshots antigos são ignorados)
+FORMATO_SNAPSHOT = 1
+
+DIRETORIO_SNAPSHOT = os.getenv("DASHBOARD_SNAPSHOT_DIR", os.path.join(".cache", "dashboard"))
+MANIFESTO = "manifesto.json"
+COMPRESSAO = "zstd"
+
+_lock_gravacao = threading.Lock()
+
+
+def _identificacao_banco():
+    '''Banco de origem dos dados: um snapshot de outro banco nunca é reaproveitado.'''
+    return f"{os.getenv('HOST_BD')}:{os.getenv('PORT_BD')}/{os.getenv('NAME_BD')}"
+
+
+def salvar_snapshot(frames, watermark, versao, diretorio=DIRETORIO_SNAPSHOT):
+    '''
+    Grava os DataFrames ({nome: DataFrame}) como um novo snapshot e o torna o atual.
+    Retorna o caminho da pasta gravada ou None em caso de erro.
+    '''
+    if pq is None or watermark is None or versao is None:
+        return None
+    with _lock_gravacao:
+        pasta = f"snapshot_{datetime.now():%Y%m%d%H%M%S%f}"
+        caminho = os.path.join(diretorio, pasta)
+        try:
+            os.makedirs(caminho, exist_ok=True)
+            for nome, df in frames.items():
+                tabela = pa.Table.from_pandas(df, preserve_index=False)
+                pq.write_table(tabela, os.path.join(caminho, f"{nome}.parquet"), compression=COMPRESSAO)
+            manifesto = {
+                'formato': FORMATO_SNAPSHOT,
+                'banco': _identificacao_banco(),
+                'pasta': pasta,
+                'conjuntos': list(frames),
+                'watermark': watermark.isoformat(),
+                'versao': [list(linha) for linha in versao],
+                'criado_em': datetime.now().isoformat(),
+            }
+            temporario = os.path.join(diretorio, MANIFESTO + ".tmp")
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(manifesto, arquivo)
+            os.replace(temporario, os.path.join(diretorio, MANIFESTO))
+        except Exception as e:
+            print(f"Erro ao gravar o snapshot do dashboard: {e}")
+            shutil.rmtree(caminho, ignore_errors=True)
+            return None
+        _remover_antigos(diretorio, manter=2)
+        return caminho
+
+
+def salvar_snapshot_em_segundo_plano(frames, watermark, versao, diretorio=DIRETORIO_SNAPSHOT):
+    '''Grava o snapshot numa thread separada (a página não espera a escrita).'''
+    thread = threading.Thread(target=salvar_snapshot, args=(frames, watermark, versao, diretorio),
+                              name='snapshot_dashboard', daemon=True)
+    thread.start()
+    return thread
+
+
+def _remover_antigos(diretorio, manter):
+    pastas = sorted(p for p in os.listdir(diretorio)
+                    if p.startswith('snapshot_') and os.path.isdir(os.path.join(diretorio, p)))
+    for pasta in pastas[:-manter]:
+        shutil.rmtree(os.path.join(diretorio, pasta), ignore_errors=True)
+
+
+def _ler_parquet(caminho):
+    '''
+    Lê o arquivo com memory map e volta ao DataFrame original (categorias e tipos vêm dos metadados
+    do pandas; o Parquet não tem datas em segundos, então a unidade das datas é restaurada).
+    '''
+    tabela = pq.read_table(caminho, memory_map=True)
+    df = tabela.to_pandas()
+    tipos_datas = {
+        coluna['name']: coluna['numpy_type']
+        for coluna in (tabela.schema.pandas_metadata or {}).get('columns', [])
+        if str(coluna.get('numpy_type')).startswith('datetime64') and coluna['name'] in df.columns
+    }
+    return df.astype({c: t for c, t in tipos_datas.items() if str(df[c].dtype) != t})
+
+
+def carregar_snapshot(conjuntos, diretorio=DIRETORIO_SNAPSHOT):
+    '''
+    Lê o snapshot atual (Parquet com memory map).
+    Retorna (frames {nome: DataFrame}, watermark, versao) ou None se não houver snapshot válido
+    para este formato, este banco e estes conjuntos.
+    '''
+    if pq is None:
+        return None
+    try:
+        with open(os.path.join(diretorio, MANIFESTO), encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Manifesto do snapshot do dashboard inválido: {e}")
+        return None
+    if (manifesto.get('formato') != FORMATO_SNAPSHOT or manifesto.get('banco') != _identificacao_banco()
+            or manifesto.get('conjuntos') != list(conjuntos)):
+        return None
+    try:
+        frames = {
+            nome: _ler_parquet(os.path.join(diretorio, manifesto['pasta'], f"{nome}.parquet"))
+            for nome in conjuntos
+        }
+    except Exception as e:
+        print(f"Erro ao ler o snapshot do dashboard: {e}")
+        return None
+    watermark = datetime.fromisoformat(manifesto['watermark'])
+    versao = tuple(tuple(linha) for linha in manifesto['versao'])
+    return frames, watermark, versao
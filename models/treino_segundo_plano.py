@@ -0,0 +1,217 @@
+# treino_segundo_plano.py
+# Treinos pesados do Relatório Externo (Random Forest, Prophet, varredura do DB score) fora da
+# thread do script do Streamlit. Cada treino vira um job, identificado pelo nome do modelo e pela
+# impressão digital do registro (models/registro_modelos.py), e roda num processo separado
+# (python -m models.treino_segundo_plano <arquivo do job>):
+#   - no máximo MAXIMO_TREINOS processos por worker; o resto espera na fila (FIFO);
+#   - um job que passa de TIMEOUT_TREINO segundos é encerrado (terminate) e marcado como expirado;
+#   - a função, os dados e os parâmetros vão num arquivo joblib; o processo filho grava o resultado
+#     direto no registro (disco/MinIO) e o pai o lê de lá quando o processo termina com código 0;
+#   - sessões que pedem o mesmo treino compartilham o job (mesmo id).
+# Não usa multiprocessing: com 'spawn'/'forkserver' o filho reimporta o __main__, que no Streamlit
+# é o próprio script da aplicação, e 'fork' de um processo com as threads do servidor não é seguro.
+# A página mostra na hora o resultado registrado ou o anterior (outros dados) e consulta os jobs
+# de tempos em tempos até o resultado novo ficar pronto.
+
+# Import Modulos
+from models.registro_modelos import RegistroModelos
+
+# Import Libs
+from collections import deque
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import joblib
+
+MAXIMO_TREINOS = int(os.getenv("RELATORIO_EXTERNO_MAX_TREINOS", "2"))
+TIMEOUT_TREINO = int(os.getenv("RELATORIO_EXTERNO_TIMEOUT_TREINO", "600"))
+# Intervalo (s) da thread que acompanha os processos
+INTERVALO_MONITOR = 0.2
+# Raiz do projeto: diretório de trabalho dos processos de treino (python -m models...)
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Estados de um job
+NA_FILA, EXECUTANDO, PRONTO, ERRO, EXPIRADO = 'na fila', 'executando', 'pronto', 'erro', 'expirado'
+ESTADOS_FINAIS = (PRONTO, ERRO, EXPIRADO)
+
+
+def _executar_treino(arquivo_job):
+    '''Corpo do processo filho: treina, grava no registro e sai com 0 (erro: exceção e código 1).'''
+    job = joblib.load(arquivo_job)
+    inicio = time.perf_counter()
+    resultado = job['funcao'](job['dados'], **job['parametros'])
+    RegistroModelos(diretorio=job['diretorio'], bucket=job['bucket']).registrar(
+        job['nome'], job['chave'], resultado, job['parametros'], time.perf_counter() - inicio)
+
+
+class Job:
+    def __init__(self, id_job, nome, chave, funcao, dados, parametros):
+        self.id = id_job
+        self.nome = nome
+        self.chave = chave
+        self.funcao = funcao
+        self.dados = dados
+        self.parametros = parametros
+        self.estado = NA_FILA
+        self.erro = None
+        self.submetido_em = time.monotonic()
+        self.iniciado_em = None
+        self.segundos = None
+        self.processo = None
+        self.arquivo = None
+
+
+class FilaTreinos:
+    '''
+    Jobs de treino de um worker (st.cache_resource). Os arquivos dos jobs (entrada e log do processo)
+    ficam em <diretório do registro>/_jobs; o log só é mantido quando o job falha ou expira.
+    '''
+
+    def __init__(self, registro, maximo=MAXIMO_TREINOS, timeout=TIMEOUT_TREINO):
+        self.registro = registro
+        self.maximo = maximo
+        self.timeout = timeout
+        self.diretorio_jobs = os.path.join(os.path.abspath(registro.diretorio), '_jobs')
+        self._jobs = {}
+        self._fila = deque()
+        self._executando = []
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    def submeter(self, nome, funcao, dados, parametros=None):
+        '''
+        Id do job que treina funcao(dados, **parametros). Se o resultado já está no registro o job
+        nasce pronto; se o mesmo treino já está na fila ou executando, devolve o job existente.
+        Um job com erro/expirado só é submetido de novo quando os dados ou parâmetros mudam.
+        '''
+        parametros = dict(parametros or {})
+        chave = self.registro.chave(nome, dados, parametros)
+        id_job = f"{nome}-{chave[:16]}"
+        with self._lock:
+            job = self._jobs.get(id_job)
+            if job is not None:
+                return id_job
+            job = Job(id_job, nome, chave, funcao, dados, parametros)
+            self._jobs[id_job] = job
+        if self.registro.obter(nome, chave) is not None:
+            job.estado = PRONTO
+            job.dados = None
+            return id_job
+        with self._lock:
+            self._fila.append(job)
+        self._iniciar_monitor()
+        return id_job
+
+    def job(self, id_job):
+        return self._jobs.get(id_job)
+
+    def estado(self, id_job):
+        job = self._jobs.get(id_job)
+        return None if job is None else job.estado
+
+    def resultado(self, nome, funcao, dados, parametros=None):
+        '''
+        (resultado, job) para a página: o resultado destes dados/parâmetros se já está registrado;
+        senão submete o treino e devolve o último resultado registrado do modelo (ou None).
+        '''
+        id_job = self.submeter(nome, funcao, dados, parametros)
+        job = self._jobs[id_job]
+        if job.estado == PRONTO:
+            entrada = self.registro.obter(nome, job.chave)
+            if entrada is not None:
+                return entrada['resultado'], job
+        anterior = self.registro.ultimo(nome)
+        return (None if anterior is None else anterior['resultado']), job
+
+    def pendentes(self, ids=None):
+        '''Jobs (dentre `ids`, se informado) ainda na fila ou executando.'''
+        with self._lock:
+            jobs = [self._jobs[i] for i in ids if i in self._jobs] if ids is not None else list(self._jobs.values())
+        return [job for job in jobs if job.estado not in ESTADOS_FINAIS]
+
+    def _iniciar_monitor(self):
+        with self._lock:
+            if self._monitor is not None and self._monitor.is_alive():
+                return
+            self._monitor = threading.Thread(target=self._monitorar, name='fila_treinos', daemon=True)
+            self._monitor.start()
+
+    def _monitorar(self):
+        '''Inicia jobs da fila até o limite, recolhe os que terminaram e encerra os que expiraram.'''
+        while True:
+            with self._lock:
+                if not self._fila and not self._executando:
+                    self._monitor = None
+                    return
+                while self._fila and len(self._executando) < self.maximo:
+                    self._iniciar(self._fila.popleft())
+                executando = list(self._executando)
+            for job in executando:
+                self._acompanhar(job)
+            time.sleep(INTERVALO_MONITOR)
+
+    def _iniciar(self, job):
+        os.makedirs(self.diretorio_jobs, exist_ok=True)
+        job.arquivo = os.path.join(self.diretorio_jobs, f"{job.id}.joblib")
+        joblib.dump({
+            'nome': job.nome, 'chave': job.chave, 'funcao': job.funcao, 'dados': job.dados,
+            'parametros': job.parametros, 'diretorio': os.path.abspath(self.registro.diretorio),
+            'bucket': self.registro.bucket,
+        }, job.arquivo)
+        with open(f"{job.arquivo}.log", 'w') as log:
+            job.processo = subprocess.Popen(
+                [sys.executable, '-m', 'models.treino_segundo_plano', job.arquivo],
+                cwd=RAIZ_PROJETO, stdout=log, stderr=subprocess.STDOUT,
+                # Registro padrão do filho = o deste worker (varreduras guardam cada ponto nele)
+                env={**os.environ, 'REGISTRO_MODELOS_DIR': os.path.abspath(self.registro.diretorio),
+                     'REGISTRO_MODELOS_BUCKET': self.registro.bucket or ''},
+            )
+        job.iniciado_em = time.monotonic()
+        job.estado = EXECUTANDO
+        job.dados = None  # já estão no arquivo do job
+        self._executando.append(job)
+
+    def _acompanhar(self, job):
+        codigo = job.processo.poll()
+        if codigo is None:
+            if time.monotonic() - job.iniciado_em <= self.timeout:
+                return
+            job.processo.terminate()
+            try:
+                job.processo.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                job.processo.kill()
+                job.processo.wait()
+            job.estado, job.erro = EXPIRADO, f"passou de {self.timeout} s"
+        elif codigo == 0 and self.registro.obter(job.nome, job.chave) is not None:
+            job.estado = PRONTO
+        else:
+            job.estado, job.erro = ERRO, self._fim_do_log(job) or f"processo encerrado (código {codigo})"
+
+        job.segundos = time.monotonic() - job.iniciado_em
+        if os.path.exists(job.arquivo):
+            os.remove(job.arquivo)
+        if job.estado == PRONTO:
+            print(f"Treino {job.id} concluído em {job.segundos:.1f} s.")
+            os.remove(f"{job.arquivo}.log")
+        else:
+            print(f"Treino {job.id} {job.estado}: {job.erro} (log em {job.arquivo}.log)")
+        with self._lock:
+            self._executando.remove(job)
+
+    @staticmethod
+    def _fim_do_log(job, linhas=1):
+        '''Última linha do log do processo (a mensagem da exceção, quando o treino falhou).'''
+        try:
+            with open(f"{job.arquivo}.log", errors='replace') as log:
+                fim = [linha.strip() for linha in log.readlines()[-linhas:] if linha.strip()]
+        except OSError:
+            return None
+        return " ".join(fim) or None
+
+
+if __name__ == '__main__':
+    _executar_treino(sys.argv[1])
@@ -0,0 +1,71 @@
+# varredura_modelos.py
+# Varredura de hiperparâmetros dos modelos do Relatório Externo (k do KMeans, n_estimators/max_depth
+# do Random Forest, sazonalidade do Prophet).
+# Cada ponto da grade é avaliado uma vez por dados: o resultado fica no registro de modelos
+# (models/registro_modelos.py) com a impressão digital de (função de avaliação, dados, parâmetros).
+# Numa nova varredura só os pontos que ainda não estão no registro são calculados, em paralelo
+# (joblib, um processo por núcleo); aumentar a grade custa só os pontos novos.
+# A página submete a varredura inteira como um job de treino (models/treino_segundo_plano.py):
+# no processo do job o registro padrão é o mesmo do worker que submeteu.
+
+# Import Modulos
+from models.registro_modelos import RegistroModelos
+
+# Import Libs
+from itertools import product
+import os
+import time
+
+from joblib import Parallel, delayed
+import pandas as pd
+
+# Processos da varredura (-1 = todos os núcleos)
+N_JOBS = int(os.getenv("RELATORIO_EXTERNO_NJOBS", "-1"))
+
+
+def grade(**opcoes):
+    '''Produto cartesiano das opções: grade(k=[2, 3], n=[1]) -> [{'k': 2, 'n': 1}, {'k': 3, 'n': 1}].'''
+    nomes = list(opcoes)
+    return [dict(zip(nomes, valores)) for valores in product(*(opcoes[nome] for nome in nomes))]
+
+
+def _avaliar_ponto(avaliar, dados, parametros):
+    inicio = time.perf_counter()
+    resultado = avaliar(dados, **parametros)
+    return resultado, time.perf_counter() - inicio
+
+
+def varrer(dados, avaliar, pontos, ordenar_por, crescente=True, registro=None, n_jobs=N_JOBS):
+    '''
+    Avalia avaliar(dados, **parametros) para cada dict de `pontos` (ver grade()) e devolve
+    {'ranking': DataFrame, 'melhor': parâmetros do 1º lugar}. `avaliar` devolve um dict de métricas;
+    o ranking tem uma linha por ponto (parâmetros, métricas, segundos, em_cache), ordenado pela
+    métrica `ordenar_por` (crescente=True: menor é melhor), com a coluna posicao.
+    '''
+    registro = registro or RegistroModelos()
+    nome = avaliar.__name__
+    chaves = [registro.chave(nome, dados, parametros) for parametros in pontos]
+    entradas = [registro.obter(nome, chave) for chave in chaves]
+    faltantes = [i for i, entrada in enumerate(entradas) if entrada is None]
+
+    if faltantes:
+        inicio = time.perf_counter()
+        calculados = Parallel(n_jobs=min(n_jobs, len(faltantes)) if n_jobs > 0 else n_jobs)(
+            delayed(_avaliar_ponto)(avaliar, dados, pontos[i]) for i in faltantes
+        )
+        for i, (resultado, segundos) in zip(faltantes, calculados):
+            entradas[i] = registro.registrar(nome, chaves[i], resultado, pontos[i], segundos)
+        print(f"Varredura {nome}: {len(faltantes)} de {len(pontos)} pontos calculados em "
+              f"{time.perf_counter() - inicio:.1f} s")
+
+    linhas = [{'ponto': i, **entrada['resultado'], 'segundos': entrada['segundos'], 'em_cache': i not in faltantes}
+              for i, entrada in enumerate(entradas)]
+    ranking = pd.DataFrame(linhas)
+    # Parâmetros como object: None (ex.: max_depth) não vira NaN numa coluna numérica
+    for posicao, coluna in enumerate(pontos[0] if pontos else []):
+        ranking.insert(1 + posicao, coluna, pd.Series([p[coluna] for p in pontos], dtype=object))
+    ranking = ranking.sort_values(ordenar_por, ascending=crescente, kind='stable', ignore_index=True)
+    melhor = pontos[int(ranking['ponto'].iloc[0])] if len(ranking) else None
+    ranking = ranking.drop(columns='ponto')
+    ranking.insert(0, 'posicao', range(1, len(ranking) + 1))
+    return {'ranking': ranking, 'melhor': melhor}
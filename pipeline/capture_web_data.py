@@ -6,25 +6,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import subprocess
 import pandas as pd
-from io import BytesIO
 from datetime import datetime
 from pipeline.capture_cepea import get_cepea_dataframe
 from pipeline.capture_agro_gov import get_agro_gov_dataframes
+from models.parquet_externo import publicar_parquet
 from minio import Minio
 
-def upload_df_to_minio(df, object_name, minio_client, bucket):
-    buffer = BytesIO()
-    df.to_csv(buffer, index=False, encoding='utf-8')
-    buffer.seek(0)
-    minio_client.put_object(
-        bucket_name=bucket,
-        object_name=object_name,
-        data=buffer,
-        length=buffer.getbuffer().nbytes,
-        content_type="text/csv"
-    )
-    print(f"[SUCESSO] {object_name} enviado para o bucket '{bucket}'")
-
 minio_client = Minio(
     endpoint='localhost:9000',
     access_key='minioadmin',
@@ -79,9 +66,9 @@ if not minio_client.bucket_exists(bucket):
 
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-# Envia DataFrames para o MinIO
+# Envia DataFrames para o MinIO (Parquet zstd particionado por ANO, ver models/parquet_externo.py)
 if df is not None:
-    upload_df_to_minio(df, f"csv_exports/df_cepea.csv", minio_client, bucket)
-upload_df_to_minio(df1_agro_gov, f"csv_exports/df1_agro_gov.csv", minio_client, bucket)
-upload_df_to_minio(df2_agro_gov, f"csv_exports/df2_agro_gov.csv", minio_client, bucket)
-upload_df_to_minio(df3_agro_gov, f"csv_exports/df3_agro_gov.csv", minio_client, bucket)
\ No newline at end of file
+    publicar_parquet(df, "parquet_exports/df_cepea", minio_client, bucket)
+for nome, df_agro_gov in (("df1_agro_gov", df1_agro_gov), ("df2_agro_gov", df2_agro_gov), ("df3_agro_gov", df3_agro_gov)):
+    if df_agro_gov is not None:
+        publicar_parquet(df_agro_gov, f"parquet_exports/{nome}", minio_client, bucket)